@@ -1,13 +1,76 @@
 import unittest
 import pickle
+import io
 from typing import Dict, List, Tuple
 from datetime import datetime
 from datetime import datetime
+from datetime import date
+from datetime import timedelta
 from typing import List
+import atexit
+import gc
+import bisect
+import marshal
+import mmap
 import os  
+import struct
+import threading
+import sqlite3
+import hashlib
+import heapq
+import itertools
+import hmac
+import secrets
+import sys
+import time
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Callable, Iterator, NamedTuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _Slotted:
+    """
+    Pickle support for the __slots__-based domain classes.
+
+    State is saved as a plain dict of slot values, and both that and the
+    __dict__ state of records pickled before the classes had slots can be
+    restored. Fields missing from older records take their _DEFAULTS value.
+    """
+    __slots__ = ()
+    _DEFAULTS: Dict[str, object] = {}
+
+    def __getstate__(self) -> dict:
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):  # (dict state, slot state)
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for name, value in {**self._DEFAULTS, **state}.items():
+            try:
+                setattr(self, name, value)
+            except AttributeError:
+                pass  # Field no longer exists on the class
+
+
+class Ticket(_Slotted):
+    __slots__ = ("_ticket_type", "_price", "_validity", "_description", "_restrictions", "_discount", "_version")
+    _DEFAULTS = {"_version": 0}
 
-
-class Ticket:
     def __init__(self, ticket_type: str, price: float, validity: str, description: str, restrictions: str, discount: float = 0.0):
     
         self._ticket_type = ticket_type
@@ -16,6 +79,7 @@ class Ticket:
         self._description = description
         self._restrictions = restrictions
         self._discount = discount  # Default discount is 0.0
+        self._version = 0  # Bumped by every setter, so cached prices know when to rebuild
 
     # Getters
     def get_ticket_type(self) -> str:
@@ -36,34 +100,74 @@ class Ticket:
     def get_discount(self) -> float:
         return self._discount
 
+    def get_version(self) -> int:
+        return self._version
+
     # Setters
     def set_ticket_type(self, ticket_type: str):
         self._ticket_type = ticket_type
+        self._version += 1
 
     def set_price(self, price: float):
         if price < 0:
             raise ValueError("Price cannot be negative.")
         self._price = price
+        self._version += 1
 
     def set_validity(self, validity: str):
         self._validity = validity
+        self._version += 1
 
     def set_description(self, description: str):
         self._description = description
+        self._version += 1
 
     def set_restrictions(self, restrictions: str):
         self._restrictions = restrictions
+        self._version += 1
 
     def set_discount(self, discount: float):
         if discount < 0 or discount > 100:
             raise ValueError("Discount must be between 0 and 100.")
         self._discount = discount
+        self._version += 1
 
     # Calculate discounted price
     def calculate_discounted_price(self) -> float:
         return self._price * (1 - self._discount / 100)
 
-class User:
+PBKDF2_ITERATIONS = 260_000  # Cost of one password hash; raise it as hardware gets faster
+_HASH_PREFIX = "pbkdf2_sha256"
+
+
+# Salted password hash, stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>"
+def hash_password(password: str, iterations: int = None, salt: bytes = None) -> str:
+    iterations = iterations or PBKDF2_ITERATIONS
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{_HASH_PREFIX}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def _hash_iterations(stored: str) -> int:
+    if not stored or not stored.startswith(_HASH_PREFIX + "$"):
+        return 0  # Plaintext from before passwords were hashed
+    return int(stored.split("$")[1])
+
+
+# Check a password against a stored hash, or against a legacy plaintext password
+def verify_password(password: str, stored: str) -> bool:
+    if not stored:
+        return False
+    if not _hash_iterations(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, iterations, salt, digest = stored.split("$")
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+class User(_Slotted):
+    __slots__ = ("_user_id", "_name", "_email", "_user_type", "_password")
+
     def __init__(self, user_id: str, name: str, email: str, user_type: str, password: str):
         self._user_id = user_id
         self._name = name
@@ -84,6 +188,7 @@ class User:
     def get_user_type(self) -> str:
         return self._user_type
 
+    # The stored password hash (plaintext for users saved before hashing, until their next login)
     def get_password(self) -> str:
         if self._password is None:
             raise ValueError("Password has not been set")
@@ -104,7 +209,11 @@ class User:
     def set_password(self, password: str):
         if not password or len(password) < 6:  # Basic password validation
             raise ValueError("Password must be at least 6 characters long")
-        self._password = password
+        self._password = hash_password(password)
+
+    # Store an already hashed password, as made by hash_password
+    def set_password_hash(self, password_hash: str):
+        self._password = password_hash
 
     def set_user_type(self, user_type: str):
         if user_type not in ["Customer", "Admin"]:
@@ -116,38 +225,56 @@ class User:
         return f"User ID: {self._user_id}, Name: {self._name}, Email: {self._email}, User Type: {self._user_type}"
 
 
+# One shared tuple per distinct permission set, so users with the same
+# permissions (nearly all of them) do not each hold their own list
+_PERMISSION_SETS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern_permissions(permissions) -> Tuple[str, ...]:
+    permissions = tuple(permissions)
+    return _PERMISSION_SETS.setdefault(permissions, permissions)
+
+
 class Customer(User):
+    __slots__ = ("_permissions",)
+
+    DEFAULT_PERMISSIONS = _intern_permissions([
+        "View own account", 
+        "Update account info", 
+        "Place ticket orders", 
+        "Cancel orders", 
+        "View booking history", 
+        "Browse available tickets",
+        "View events and attractions"
+    ])
+
     def __init__(self, user_id: str, name: str, email: str, password: str, permissions: list[str] = None):
         super().__init__(user_id, name, email, user_type="Customer", password=password)
         # Set default permissions if not provided
-        self._permissions = permissions if permissions else [
-            "View own account", 
-            "Update account info", 
-            "Place ticket orders", 
-            "Cancel orders", 
-            "View booking history", 
-            "Browse available tickets",
-            "View events and attractions"
-        ]
+        self._permissions = _intern_permissions(permissions) if permissions else self.DEFAULT_PERMISSIONS
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._permissions = _intern_permissions(self._permissions)
 
     # Getter and Setter for permissions
     def get_permissions(self) -> list[str]:
-        return self._permissions
+        return list(self._permissions)
 
     def set_permissions(self, permissions: list[str]):
         if not isinstance(permissions, list):
             raise ValueError("Permissions must be a list of strings.")
-        self._permissions = permissions
+        self._permissions = _intern_permissions(permissions)
 
     # Method to add a permission
     def add_permission(self, permission: str):
         if permission not in self._permissions:
-            self._permissions.append(permission)
+            self._permissions = _intern_permissions(self._permissions + (permission,))
 
     # Method to remove a permission
     def remove_permission(self, permission: str):
         if permission in self._permissions:
-            self._permissions.remove(permission)
+            self._permissions = _intern_permissions(p for p in self._permissions if p != permission)
 
     # Override display_info
     def display_info(self):
@@ -157,39 +284,47 @@ class Customer(User):
 
 
 class Admin(User):
+    __slots__ = ("_permissions",)
+
+    DEFAULT_PERMISSIONS = _intern_permissions([
+        "Create, Update, Delete users", 
+        "Manage ticket bookings", 
+        "Modify booking statuses", 
+        "View all transactions", 
+        "Generate booking reports", 
+        "Manage system settings", 
+        "Modify user permissions", 
+        "Audit trail", 
+        "Manage content"
+    ])
+
     def __init__(self, user_id: str, name: str, email: str, password: str, permissions: list[str] = None):
         super().__init__(user_id, name, email, user_type="Admin", password=password)
         # Set default permissions if not provided
-        self._permissions = permissions if permissions else [
-            "Create, Update, Delete users", 
-            "Manage ticket bookings", 
-            "Modify booking statuses", 
-            "View all transactions", 
-            "Generate booking reports", 
-            "Manage system settings", 
-            "Modify user permissions", 
-            "Audit trail", 
-            "Manage content"
-        ]
+        self._permissions = _intern_permissions(permissions) if permissions else self.DEFAULT_PERMISSIONS
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._permissions = _intern_permissions(self._permissions)
 
     # Getter and Setter for permissions
     def get_permissions(self) -> list[str]:
-        return self._permissions
+        return list(self._permissions)
 
     def set_permissions(self, permissions: list[str]):
         if not isinstance(permissions, list):
             raise ValueError("Permissions must be a list of strings.")
-        self._permissions = permissions
+        self._permissions = _intern_permissions(permissions)
 
     # Method to add a permission
     def add_permission(self, permission: str):
         if permission not in self._permissions:
-            self._permissions.append(permission)
+            self._permissions = _intern_permissions(self._permissions + (permission,))
 
     # Method to remove a permission
     def remove_permission(self, permission: str):
         if permission in self._permissions:
-            self._permissions.remove(permission)
+            self._permissions = _intern_permissions(p for p in self._permissions if p != permission)
 
     # Override display_info
     def display_info(self):
@@ -197,15 +332,54 @@ class Admin(User):
         permissions = ", ".join(self._permissions)
         return f"{base_info}, Permissions: [{permissions}]"
 
-class Order:
+class OrderLine(NamedTuple):
+    ticket_type: str
+    quantity: int
+    unit_price: float  # Discounted price of one ticket when the order was placed
+
+    @classmethod
+    def for_ticket(cls, ticket: Ticket, quantity: int) -> "OrderLine":
+        return cls(ticket.get_ticket_type(), quantity, ticket.calculate_discounted_price())
+
+    def get_total_price(self) -> float:
+        return self.quantity * self.unit_price
+
+
+# Collapse one-Ticket-per-seat lists into lines, keeping first-seen order
+def _lines_from_tickets(tickets: List[Ticket]) -> List[OrderLine]:
+    quantities: Dict[Tuple[str, float], int] = {}
+    for ticket in tickets:
+        key = (ticket.get_ticket_type(), ticket.calculate_discounted_price())
+        quantities[key] = quantities.get(key, 0) + 1
+    return [OrderLine(ticket_type, quantity, unit_price) for (ticket_type, unit_price), quantity in quantities.items()]
+
+
+class Order(_Slotted):
+    __slots__ = ("_order_id", "_user_id", "_lines", "_order_date", "_status", "_version", "_visit_date", "_total")
+    _DEFAULTS = {"_version": 0, "_visit_date": None, "_total": None}
+
     VALID_STATUSES = ["Pending", "Confirmed", "Cancelled"]  # Ensure "Confirmed" is included
 
-    def __init__(self, order_id: str, user_id: str, tickets: List[Ticket]):
+    # Pass either a ticket per seat or ready-made lines
+    def __init__(self, order_id: str, user_id: str, tickets: List[Ticket] = None, lines: List[OrderLine] = None,
+                 visit_date: date = None):
         self._order_id = order_id
         self._user_id = user_id
-        self._tickets = tickets
+        self._lines = list(lines) if lines is not None else _lines_from_tickets(tickets or [])
         self._order_date = datetime.now()  # Automatically sets the order date
         self._status = "Pending"
+        self._version = 0  # Bumped on every change, for optimistic locking
+        self._visit_date = visit_date  # Day the tickets are for; None if not tied to a day
+        self._total = self.calculate_total_price()  # Frozen with the line prices at booking time
+
+    # Orders pickled before line items stored one Ticket per seat; convert them.
+    # Orders saved before totals were stored take the sum of their lines.
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if isinstance(state, dict) and "_tickets" in state:
+            self._lines = _lines_from_tickets(state["_tickets"])
+        if self._total is None:
+            self._total = self.calculate_total_price()
 
     # Getters
     def get_order_id(self) -> str:
@@ -214,44 +388,64 @@ class Order:
     def get_user_id(self) -> str:
         return self._user_id
 
-    def get_tickets(self) -> List[Ticket]:
-        return self._tickets
+    def get_lines(self) -> List[OrderLine]:
+        return self._lines
+
+    def get_ticket_count(self) -> int:
+        return sum(line.quantity for line in self._lines)
 
     def get_order_date(self) -> datetime:
         return self._order_date
 
+    def get_visit_date(self) -> date:
+        return self._visit_date
+
     def get_status(self) -> str:
         return self._status
 
+    def get_version(self) -> int:
+        return self._version
+
+    # Total stored when the order was placed; never re-evaluated from tickets
+    def get_total_price(self) -> float:
+        return self._total
+
     # Setters
     def set_status(self, status: str):
         if status not in self.VALID_STATUSES:
             raise ValueError("Invalid order status.")
         self._status = status
+        self._version += 1
 
-    # Method to calculate the total price of the order
+    # Sum of the line prices; get_total_price() returns the stored copy
     def calculate_total_price(self) -> float:
-        total = sum(ticket.calculate_discounted_price() for ticket in self._tickets)
-        return total
+        return sum(line.get_total_price() for line in self._lines)
 
     # Method to display order details
     def display_order_details(self) -> str:
         ticket_details = "\n".join(
             [
-                f"Ticket Type: {ticket.get_ticket_type()}, Price: {ticket.calculate_discounted_price():.2f}"
-                for ticket in self._tickets
+                f"Ticket Type: {line.ticket_type}, Quantity: {line.quantity}, Price: {line.unit_price:.2f}"
+                for line in self._lines
             ]
         )
         return (
             f"Order ID: {self._order_id}\n"
             f"User ID: {self._user_id}\n"
             f"Order Date: {self._order_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Visit Date: {self._visit_date or 'Any'}\n"
             f"Status: {self._status}\n"
             f"Tickets:\n{ticket_details}\n"
-            f"Total Price: {self.calculate_total_price():.2f}"
+            f"Total Price: {self._total:.2f}"
         )
 
-class Payment:
+class Payment(_Slotted):
+    __slots__ = ("_payment_id", "_order_id", "_user_id", "_amount", "_payment_method", "_status", "_version",
+                 "_payment_date")
+    _DEFAULTS = {"_version": 0, "_payment_date": None}  # Payments saved before dates were kept have None
+
+    PAYMENT_STATUSES = ("Pending", "Completed", "Failed")
+
     def __init__(self, payment_id: str, order_id: str, user_id: str, amount: float, payment_method: str):
         self._payment_id = payment_id
         self._order_id = order_id
@@ -259,6 +453,8 @@ class Payment:
         self._amount = amount
         self._payment_method = payment_method  # e.g., "Credit Card", "PayPal", "M-PESA"
         self._status = "Pending"  # Default payment status
+        self._version = 0  # Bumped on every change, for optimistic locking
+        self._payment_date = datetime.now()
 
     # Getters
     def get_payment_id(self) -> str:
@@ -279,11 +475,18 @@ class Payment:
     def get_status(self) -> str:
         return self._status
 
+    def get_version(self) -> int:
+        return self._version
+
+    def get_payment_date(self) -> datetime:
+        return self._payment_date
+
     # Setters
     def set_status(self, status: str):
-        if status not in ["Pending", "Completed", "Failed"]:
+        if status not in self.PAYMENT_STATUSES:
             raise ValueError("Invalid payment status.")
         self._status = status
+        self._version += 1
 
     # Method to display payment details
     def display_payment_details(self) -> str:
@@ -297,27 +500,1601 @@ class Payment:
         )
 
 
-class AccountManagement:
+class _Codes:
+    # Maps a small set of repeated strings (methods, statuses, ticket types) to integer codes
+    def __init__(self, values=()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class PaymentColumns:
+    """
+    Column-oriented container for bulk payment data.
+
+    Each field is stored in its own list or typed array rather than as one
+    Payment object per record. Repeated strings (methods and statuses) are kept
+    as small integer codes.
+    """
+
+    def __init__(self, payments=()):
+        self._payment_ids: List[str] = []
+        self._order_ids: List[str] = []
+        self._user_ids: List[str] = []
+        self._amounts = array("d")
+        self._payment_dates = array("d")  # POSIX timestamps, NaN when unknown
+        self._methods = _Codes()
+        self._method_codes = array("H")
+        self._statuses = _Codes(Payment.PAYMENT_STATUSES)
+        self._status_codes = array("B")
+        self.extend(payments)
+
+    def append(self, payment: Payment):
+        self._payment_ids.append(payment.get_payment_id())
+        self._order_ids.append(payment.get_order_id())
+        self._user_ids.append(payment.get_user_id())
+        self._amounts.append(payment.get_amount())
+        payment_date = payment.get_payment_date()
+        self._payment_dates.append(payment_date.timestamp() if payment_date else float("nan"))
+        self._method_codes.append(self._methods.code(payment.get_payment_method()))
+        self._status_codes.append(self._statuses.code(payment.get_status()))
+
+    def extend(self, payments):
+        for payment in payments:
+            self.append(payment)
+
+    def __len__(self) -> int:
+        return len(self._payment_ids)
+
+    # Rebuild the Payment object for one row
+    def __getitem__(self, index: int) -> Payment:
+        payment = Payment(
+            self._payment_ids[index],
+            self._order_ids[index],
+            self._user_ids[index],
+            self._amounts[index],
+            self._methods.values[self._method_codes[index]],
+        )
+        payment.set_status(self._statuses.values[self._status_codes[index]])
+        timestamp = self._payment_dates[index]
+        payment._payment_date = None if timestamp != timestamp else datetime.fromtimestamp(timestamp)
+        return payment
+
+    def __iter__(self) -> Iterator[Payment]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_amounts(self) -> array:
+        return self._amounts
+
+    def total_amount(self) -> float:
+        return sum(self._amounts)
+
+    # The raw columns, for bulk consumers such as reporting.py
+    def columns(self) -> dict:
+        return {
+            "payment_ids": self._payment_ids,
+            "order_ids": self._order_ids,
+            "user_ids": self._user_ids,
+            "amounts": self._amounts,
+            "payment_dates": self._payment_dates,
+            "methods": self._methods.values,
+            "method_codes": self._method_codes,
+            "statuses": self._statuses.values,
+            "status_codes": self._status_codes,
+        }
+
+
+class OrderColumns:
+    """
+    Column-oriented container for bulk order data.
+
+    Order fields are stored one typed array or list per field. Line items are
+    flattened into shared line arrays, and each order's lines start at
+    _line_starts[index].
+    """
+
+    def __init__(self, orders=()):
+        self._order_ids: List[str] = []
+        self._user_ids: List[str] = []
+        self._order_dates = array("d")  # POSIX timestamps
+        self._visit_days = array("l")  # date.toordinal(), 0 when there is no visit date
+        self._statuses = _Codes(Order.VALID_STATUSES)
+        self._status_codes = array("B")
+        self._line_starts = array("L", [0])
+        self._ticket_types = _Codes()
+        self._line_type_codes = array("H")
+        self._line_quantities = array("L")
+        self._line_unit_prices = array("d")
+        self.extend(orders)
+
+    def append(self, order: Order):
+        self._order_ids.append(order.get_order_id())
+        self._user_ids.append(order.get_user_id())
+        self._order_dates.append(order.get_order_date().timestamp())
+        visit_date = order.get_visit_date()
+        self._visit_days.append(visit_date.toordinal() if visit_date else 0)
+        self._status_codes.append(self._statuses.code(order.get_status()))
+        for line in order.get_lines():
+            self._line_type_codes.append(self._ticket_types.code(line.ticket_type))
+            self._line_quantities.append(line.quantity)
+            self._line_unit_prices.append(line.unit_price)
+        self._line_starts.append(len(self._line_quantities))
+
+    def extend(self, orders):
+        for order in orders:
+            self.append(order)
+
+    def __len__(self) -> int:
+        return len(self._order_ids)
+
+    # Rebuild the Order object for one row
+    def __getitem__(self, index: int) -> Order:
+        lines = [
+            OrderLine(self._ticket_types.values[self._line_type_codes[i]], self._line_quantities[i], self._line_unit_prices[i])
+            for i in range(self._line_starts[index], self._line_starts[index + 1])
+        ]
+        visit_day = self._visit_days[index]
+        order = Order(self._order_ids[index], self._user_ids[index], lines=lines,
+                      visit_date=date.fromordinal(visit_day) if visit_day else None)
+        order._order_date = datetime.fromtimestamp(self._order_dates[index])
+        order.set_status(self._statuses.values[self._status_codes[index]])
+        return order
+
+    def __iter__(self) -> Iterator[Order]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def total_price(self) -> float:
+        return sum(q * p for q, p in zip(self._line_quantities, self._line_unit_prices))
+
+    # The raw columns, for bulk consumers such as reporting.py
+    def columns(self) -> dict:
+        return {
+            "order_ids": self._order_ids,
+            "user_ids": self._user_ids,
+            "order_dates": self._order_dates,
+            "visit_days": self._visit_days,
+            "statuses": self._statuses.values,
+            "status_codes": self._status_codes,
+            "line_starts": self._line_starts,
+            "ticket_types": self._ticket_types.values,
+            "line_type_codes": self._line_type_codes,
+            "line_quantities": self._line_quantities,
+            "line_unit_prices": self._line_unit_prices,
+        }
+
+
+class _CompatUnpickler(pickle.Unpickler):
+    # The .pkl files are written when this module runs as a script, so their
+    # classes are recorded under "__main__"; resolve those names here as well.
+    def find_class(self, module, name):
+        if module == "__main__" and name in globals():
+            return globals()[name]
+        return super().find_class(module, name)
+
+
+def _unpickle_record(data: bytes):
+    return _CompatUnpickler(io.BytesIO(data)).load()
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode_datetime(value: datetime):
+    return None if value is None else (value - _EPOCH) // _MICROSECOND
+
+
+def _decode_datetime(value) -> datetime:
+    return None if value is None else _EPOCH + timedelta(microseconds=value)
+
+
+def _encode_date(value: date):
+    return None if value is None else value.toordinal()
+
+
+def _decode_date(value) -> date:
+    return None if value is None else date.fromordinal(value)
+
+
+class UnencodableRecord(TypeError):
+    """Raised by RecordCodec for a record of a class it has no schema for."""
+
+
+class RecordCodec:
+    """
+    Versioned binary format for the record stores, replacing pickle.
+
+    A snapshot is MAGIC, a format version byte and a marshal body holding a
+    schema table, one tag byte per record, the keys and one tuple of plain
+    values (str, int, float, None, tuples) per record. The schema table lists
+    each record class in the file by name with its field names, so loading
+    only ever builds the known classes and never runs code named by the file,
+    and records carry no per-field overhead. Fields are matched by name on
+    load: fields added to a class since the file was written take their
+    _DEFAULTS value (through the class's __setstate__, which also upgrades
+    old records), and fields that no longer exist are skipped. Journal entries
+    are single records in length-prefixed FRAME frames.
+
+    marshal is used at format version 4, which every Python 3 since 3.4 reads.
+    """
+
+    MAGIC = b"APRK"
+    VERSION = 1
+    FRAME = b"R"  # First byte of a journal entry; pickled entries start with b"\x80"
+    CLASSES = (Ticket, User, Customer, Admin, Order, Payment)
+    # Fields whose values are not plain: name -> (encode, decode)
+    FIELD_CODECS = {
+        "_order_date": (_encode_datetime, _decode_datetime),
+        "_payment_date": (_encode_datetime, _decode_datetime),
+        "_visit_date": (_encode_date, _decode_date),
+        "_lines": (lambda lines: tuple(map(tuple, lines)), lambda rows: [OrderLine._make(row) for row in rows]),
+        "_permissions": (tuple, _intern_permissions),
+    }
+    _HEADER = struct.Struct("<4sB")
+    _FRAME_HEADER = struct.Struct("<I")
+
     def __init__(self):
+        self._classes = {cls.__name__: cls for cls in self.CLASSES}
+        self._fields: Dict[type, Tuple[str, ...]] = {}
+        self._decoders: Dict[Tuple[str, Tuple[str, ...]], Callable[[tuple], object]] = {}
+
+    # Snapshots
+    def dumps(self, records: dict) -> bytes:
+        schemas, tags, keys, rows = [], bytearray(), [], []
+        tag_of: Dict[type, int] = {}
+        for key, record in records.items():
+            cls = type(record)
+            tag = tag_of.get(cls)
+            if tag is None:
+                tag = tag_of[cls] = len(schemas)
+                schemas.append((cls.__name__, self._fields_of(cls)))
+            tags.append(tag)
+            keys.append(key)
+            rows.append(self._encode(record))
+        body = marshal.dumps((tuple(schemas), bytes(tags), tuple(keys), tuple(rows)), 4)
+        return self._HEADER.pack(self.MAGIC, self.VERSION) + body
+
+    def loads(self, data: bytes) -> dict:
+        schemas, tags, keys, rows = marshal.loads(self._body(data))
+        decoders = [self._decoder(name, tuple(fields)) for name, fields in schemas]
+        # Nothing built here can form a reference cycle, so skip the collector
+        # passes that millions of new objects would otherwise trigger
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            if len(decoders) == 1:
+                return dict(zip(keys, map(decoders[0], rows)))
+            return {key: decoders[tag](row) for key, tag, row in zip(keys, tags, rows)}
+        finally:
+            if collecting:
+                gc.enable()
+
+    @classmethod
+    def is_encoded(cls, data: bytes) -> bool:
+        return data[:len(cls.MAGIC)] == cls.MAGIC
+
+    # Journal entries
+    def dumps_entry(self, op: str, key, value) -> bytes:
+        record = None
+        if value is not None:
+            record = (type(value).__name__, self._fields_of(type(value)), self._encode(value))
+        payload = marshal.dumps((op, key, record), 4)
+        return self.FRAME + self._FRAME_HEADER.pack(len(payload)) + payload
+
+    # Read the entry after a FRAME byte; raises EOFError if it was cut short
+    def read_entry(self, f) -> Tuple:
+        size = f.read(self._FRAME_HEADER.size)
+        if len(size) < self._FRAME_HEADER.size:
+            raise EOFError
+        (length,) = self._FRAME_HEADER.unpack(size)
+        payload = f.read(length)
+        if len(payload) < length:
+            raise EOFError
+        op, key, record = marshal.loads(payload)
+        if record is None:
+            return op, key, None
+        name, fields, row = record
+        return op, key, self._decoder(name, tuple(fields))(row)
+
+    def _body(self, data: bytes) -> memoryview:
+        magic, version = self._HEADER.unpack_from(data)
+        if magic != self.MAGIC:
+            raise ValueError("Not a record file.")
+        if version > self.VERSION:
+            raise ValueError(f"Record format version {version} is newer than this program supports.")
+        return memoryview(data)[self._HEADER.size:]
+
+    def _fields_of(self, cls: type) -> Tuple[str, ...]:
+        fields = self._fields.get(cls)
+        if fields is None:
+            if self._classes.get(cls.__name__) is not cls:
+                raise UnencodableRecord(f"No record schema for {cls.__name__}.")
+            fields = tuple(name for klass in reversed(cls.__mro__) for name in getattr(klass, "__slots__", ()))
+            self._fields[cls] = fields
+        return fields
+
+    def _encode(self, record) -> tuple:
+        row = []
+        for name in self._fields_of(type(record)):
+            value = getattr(record, name, None)
+            codec = self.FIELD_CODECS.get(name)
+            row.append(value if codec is None or value is None else codec[0](value))
+        return tuple(row)
+
+    # Function turning a row written with `fields` into a record of class `name`
+    def _decoder(self, name: str, fields: Tuple[str, ...]) -> Callable[[tuple], object]:
+        decoder = self._decoders.get((name, fields))
+        if decoder is not None:
+            return decoder
+        cls = self._classes.get(name)
+        if cls is None:
+            raise ValueError(f"Unknown record class {name}.")
+        plan = [(i, field, self.FIELD_CODECS.get(field, (None, None))[1]) for i, field in enumerate(fields)]
+        new = cls.__new__
+
+        if fields == self._fields_of(cls):
+            # Set the slots through their descriptors, then redo the few fields that need converting
+            setters = [getattr(cls, field).__set__ for field in fields]
+            converted = [(i, setters[i], decode) for i, field, decode in plan if decode is not None]
+
+            def decoder(row: tuple):
+                record = new(cls)
+                for set_field, value in zip(setters, row):
+                    set_field(record, value)
+                for i, set_field, decode in converted:
+                    value = row[i]
+                    if value is not None:
+                        set_field(record, decode(value))
+                return record
+        else:
+            # Written by an older or newer class layout; let __setstate__ fill the gaps
+            def decoder(row: tuple):
+                record = new(cls)
+                record.__setstate__({
+                    field: row[i] if decode is None or row[i] is None else decode(row[i]) for i, field, decode in plan
+                })
+                return record
+        self._decoders[(name, fields)] = decoder
+        return decoder
+
+
+_RECORD_CODEC = RecordCodec()
+
+
+class LazyRecords(MutableMapping):
+    """
+    Dictionary of records that is only read from disk on first access.
+
+    Managers share one instance, so each store is deserialized at most once no
+    matter how many of them hold it.
+    """
+
+    def __init__(self, loader: Callable[[], dict], on_load: Callable[[float], None] = None):
+        self._loader = loader
+        self._on_load = on_load  # Called with the load time in seconds
+        self._records: dict = None
+        self._lock = threading.Lock()
+
+    def is_loaded(self) -> bool:
+        return self._records is not None
+
+    # Load the records now if that has not happened yet
+    def materialize(self) -> dict:
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    started = time.perf_counter()
+                    records = self._loader()
+                    if self._on_load:
+                        self._on_load(time.perf_counter() - started)
+                    self._records = records
+        return self._records
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self.materialize()[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.materialize()
+
+    def __iter__(self) -> Iterator:
+        return iter(self.materialize())
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+    def keys(self):
+        return self.materialize().keys()
+
+    def values(self):
+        return self.materialize().values()
+
+    def items(self):
+        return self.materialize().items()
+
+
+def _materialize(records) -> dict:
+    # Resolve a LazyRecords wrapper to the dictionary it holds
+    return records.materialize() if isinstance(records, LazyRecords) else records
+
+
+class ConcurrentModificationError(ValueError):
+    """Raised when a record was changed by someone else since the caller read it."""
+
+
+class AuthenticationError(ValueError):
+    """Raised when a login fails or a session is unknown or has expired."""
+
+
+class NotFoundError(ValueError):
+    """Raised when a user, order or payment asked for does not exist."""
+
+
+class _FileLock:
+    """
+    Exclusive lock shared between processes and threads, taken on "<path>.lock".
+
+    The operating system releases it if the holding process dies, so a crash
+    never leaves the store locked.
+    """
+
+    def __init__(self, path: str):
+        self.lock_path = path + ".lock"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.lock_path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ten seconds; keep waiting
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+        return False
+
+
+def _version_of(record) -> int:
+    get_version = getattr(record, "get_version", None)
+    return get_version() if get_version else 0
+
+
+def iter_pages(records: dict, where: Callable = None, sort_key: Callable = None, descending: bool = False,
+               page_size: int = 50) -> Iterator[List]:
+    """
+    Yield the records matching `where` a page at a time, ordered by sort_key
+    and then by record key.
+
+    One pass collects the (sort value, key) pair of every match; records are
+    only looked up page by page. The first page is picked with a partial
+    selection, so a caller that stops there never pays for a full sort; the
+    rest are sorted once, when the second page is asked for. Ordering is as
+    of that pass, and records deleted since are skipped.
+    """
+    rows = []
+    for key in list(records):  # Copy the keys once, so other threads may add records meanwhile
+        record = records.get(key)
+        if record is not None and (where is None or where(record)):
+            rows.append((sort_key(record) if sort_key else None, key))
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page_rows = select(page_size, rows)
+    start = len(page_rows)
+    while page_rows:
+        page = [record for record in (records.get(key) for _, key in page_rows) if record is not None]
+        if page:
+            yield page
+        if start == page_size and len(rows) > page_size:
+            rows.sort(reverse=descending)  # Only once, the first time a second page is wanted
+        page_rows = rows[start:start + page_size]
+        start += page_size
+
+
+# Print pages from iter_pages, asking before each further page; stops producing
+# rows as soon as the user quits. Returns the number of rows shown.
+def print_pages(pages: Iterator[List], render: Callable[[object], str]) -> int:
+    shown = 0
+    page = next(pages, None)
+    while page:
+        for record in page:
+            print(render(record))
+        shown += len(page)
+        page = next(pages, None)  # Only ask when there is more to show
+        if page and input("-- Enter for more, q to quit: ").strip().lower() == "q":
+            pages.close()
+            break
+    return shown
+
+
+# Combine record predicates into one, or None when there are none
+def _all_of(conditions: List[Callable]) -> Callable:
+    if not conditions:
+        return None
+    return lambda record: all(condition(record) for condition in conditions)
+
+
+# Predicate for a datetime getter falling in [since, until); unknown dates never match
+def _in_range(get_date: Callable, since: datetime = None, until: datetime = None) -> Callable:
+    def check(record) -> bool:
+        value = get_date(record)
+        return value is not None and (since is None or value >= since) and (until is None or value < until)
+    return check
+
+
+class CorruptSnapshotError(ValueError):
+    """A snapshot file failed its checksum or could not be decoded."""
+
+
+def _fsync_directory(path: str):
+    # Make a rename in the directory durable; not possible on Windows
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Replace path with data so that after a crash it holds either the old or the
+# new contents in full. With keep_previous the old file stays at
+# "<path>.prev" (as a hard link where the filesystem allows).
+def _write_atomically(path: str, data: bytes, keep_previous: bool = False):
+    _replace_with_staged(path, _stage_file(path, data), keep_previous)
+
+
+# The two halves of _write_atomically: writing and syncing "<path>.tmp" is
+# the slow part that can fail; swapping it in is a rename
+def _stage_file(path: str, data: bytes) -> str:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def _replace_with_staged(path: str, tmp_path: str, keep_previous: bool = False):
+    if keep_previous and os.path.exists(path):
+        previous = path + ".prev"
+        try:
+            os.remove(previous)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(path, previous)
+        except OSError:  # No hard links here; fall back to a copy
+            with open(path, "rb") as source, open(previous, "wb") as target:
+                target.write(source.read())
+    os.replace(tmp_path, path)
+    _fsync_directory(path)
+
+
+class PickleStore:
+    """
+    Persists one dictionary of records (users, orders, ...) as a snapshot file.
+
+    Snapshots and journal records are written in RecordCodec's format; files
+    still holding pickles are read as before and converted on the next write.
+    Records of classes the codec has no schema for are pickled instead.
+
+    With journal=True a mutation appends a single record to "<path>.log" instead
+    of rewriting the snapshot. The log is replayed on load, and once it holds
+    COMPACT_THRESHOLD records a background thread folds it into a new snapshot.
+
+    Several threads and processes may share the files. Every file change is made
+    under a lock file. Before writing, a store first picks up what other
+    processes wrote since it last looked; of two copies of a record, the one
+    with the higher version wins. Deletions made elsewhere are only seen on the
+    next load.
+
+    Snapshots are written to a temporary file, fsynced and renamed over the
+    old one, which is kept as "<path>.prev". Each ends in a trailer holding
+    the body's length and CRC-32, checked on every read. If the snapshot
+    fails the check or cannot be decoded, the previous generation is read
+    instead (with the journal replayed over it), so a crash mid-save costs
+    at most the last save. Files from before the trailer are read unchecked.
+    """
+    COMPACT_THRESHOLD = 1000
+    TRAILER = struct.Struct("<4sQI")  # Magic, body length, CRC-32 of the body
+    TRAILER_MAGIC = b"APCK"
+
+    def __init__(self, path: str, journal: bool = False, codec: RecordCodec = None,
+                 scheduler: "PersistenceScheduler" = None):
+        self.path = path
+        self.journal = journal
+        self.codec = codec or _RECORD_CODEC
+        self.scheduler = scheduler  # If set, changes are written when it flushes instead of at once
+        self._pending_records: dict = None  # Records with changes the scheduler has yet to flush
+        self._changed = set()  # Their keys, put or deleted since the last flush
+        self._deleted = set()
+        self.log_path = path + ".log"
+        self._lock = threading.RLock()  # Serialises this process's threads
+        self._file_lock: _FileLock = None  # Held while _lock_depth > 0
+        self._lock_depth = 0
+        self._seen = None  # Signature of the snapshot as of our last read or write
+        self._log_offset = 0  # How far into the log our records are up to date
+        self._log_records = 0
+        self._compaction: threading.Thread = None
+        self._listeners: List[Callable] = []  # Called with (key, record or None) for changes read from disk
+
+    # Call listener(key, record) for every record refresh() picks up from
+    # another process, with record None if it was deleted. Returns True, as
+    # this store can tell; it runs on the refreshing thread, under the lock.
+    def subscribe(self, listener: Callable) -> bool:
+        self._listeners.append(listener)
+        return True
+
+    # Load the snapshot and replay any journal records written after it. With
+    # lazy=True this is deferred until the returned records are first used.
+    def load(self, lazy: bool = False, on_load: Callable[[float], None] = None) -> dict:
+        if lazy:
+            return LazyRecords(self.load, on_load)
+        with self._locked():
+            if not self.journal and os.path.exists(self.log_path):
+                # Fold a log left behind by journal mode into the snapshot
+                self._fold_log()
+            records = self._read_snapshot()
+            self._seen = self._signature()
+            self._log_records, self._log_offset = self._replay(records, 0)
+        return records
+
+    # Hold the store's locks and bring `records` up to date with the files, so
+    # a check-then-write sequence inside is atomic across threads and processes
+    @contextmanager
+    def locked(self, records: dict):
+        with self._locked():
+            self.refresh(records)
+            yield
+
+    # Pick up records written by other processes since we last looked
+    def refresh(self, records: dict):
+        if isinstance(records, LazyRecords) and not records.is_loaded():
+            return  # Will be read fresh when first used
+        records = _materialize(records)
+        with self._locked():
+            if self._signature() != self._seen:
+                # The snapshot was rewritten elsewhere (a save or a compaction).
+                # On a version tie keep ours, which may hold unsaved changes.
+                for key, value in self._read_snapshot().items():
+                    if key not in records or _version_of(value) > _version_of(records[key]):
+                        records[key] = value
+                        self._notify(key, value)
+                self._seen = self._signature()
+                self._log_offset = 0
+            if self.journal:
+                self._log_records, self._log_offset = self._replay(records, self._log_offset, self._log_records,
+                                                                   notify=True)
+
+    # Rewrite the whole snapshot
+    def save(self, records: dict):
+        if isinstance(records, LazyRecords) and not records.is_loaded():
+            return  # Never read, so nothing can have changed
+        records = _materialize(records)
+        with self._locked():
+            self.refresh(records)
+            for key in self._deleted:
+                records.pop(key, None)  # The refresh may have brought back a deferred deletion
+            self._write_snapshot(records)
+            self._pending_records = None  # The snapshot includes every deferred change
+            self._changed, self._deleted = set(), set()
+            if self.journal:
+                self._remove_log()
+
+    # Persist records[key] = value
+    def put(self, records: dict, key, value):
+        self._persist(records, {key: value}, ())
+
+    # Persist several records with a single write
+    def put_many(self, records: dict, items: dict):
+        if items:
+            self._persist(records, items, ())
+
+    # Persist the removal of records[key]
+    def delete(self, records: dict, key):
+        self._persist(records, {}, (key,))
+
+    # Persist the removal of several records in one write
+    def delete_many(self, records: dict, keys):
+        self._persist(records, {}, list(keys))
+
+    # put_many in two steps, for writes that must land together with another
+    # store's: this does the part that can fail (encoding, and in snapshot
+    # mode writing and syncing the new file) and returns a commit function
+    # that only appends or renames. Nothing changes, in memory or on disk,
+    # until commit is called. Caller must hold the lock until then.
+    def stage_many(self, records: dict, items: dict) -> Callable[[], None]:
+        records = _materialize(records)
+        if not items:
+            return lambda: None
+        if self.scheduler is not None:
+            return lambda: self._persist(records, items, ())  # Deferred writes are never durable at once
+        with self._locked():
+            self.refresh(records)
+            if not self.journal:
+                tmp_path = _stage_file(self.path, self._encode_snapshot({**records, **items}))
+
+                def commit():
+                    records.update(items)
+                    self._commit_snapshot(tmp_path)
+                return commit
+            data = b"".join(self._encode_entry(("put", key, value)) for key, value in items.items())
+
+            def commit():
+                records.update(items)
+                self._append_data(data, len(items))
+                self._compact_if_due(records)
+            return commit
+
+    def _persist(self, records: dict, items: dict, keys):
+        records = _materialize(records)
+        if self.scheduler is not None:
+            with self._lock:
+                records.update(items)
+                for key in keys:
+                    records.pop(key, None)
+                self._changed.update(items)
+                self._changed.update(keys)
+                self._deleted.difference_update(items)
+                self._deleted.update(keys)
+                self._pending_records = records
+            self.scheduler.mark(self, len(items) + len(keys))
+            return
+        with self._locked():
+            self.refresh(records)
+            records.update(items)
+            for key in keys:
+                records.pop(key, None)
+            if not self.journal:
+                self._write_snapshot(records)
+                return
+            self._append(*[("put", key, value) for key, value in items.items()],
+                         *[("delete", key, None) for key in keys])
+        self._compact_if_due(records)
+
+    # Write out the changes deferred since the last flush: one snapshot, or
+    # one journal append holding the latest copy of each changed record
+    def flush(self):
+        with self._locked():
+            records = self._pending_records
+            if records is None:
+                return
+            changed, deleted = self._changed, self._deleted
+            self._pending_records = None
+            self._changed, self._deleted = set(), set()
+            self.refresh(records)
+            for key in deleted:
+                records.pop(key, None)  # The refresh may have brought it back
+            if not self.journal:
+                self._write_snapshot(records)
+                return
+            self._append(*[("delete", key, None) if key in deleted else ("put", key, records[key])
+                           for key in changed if key in deleted or key in records])
+        self._compact_if_due(records)
+
+    # Fold the journal into a fresh snapshot, waiting for it to be written
+    def compact(self, records: dict = None):
+        if self._compaction is not None and self._compaction is not threading.current_thread():
+            self._compaction.join()
+        with self._locked():
+            self._fold_log(records)
+
+    def close(self):
+        self.flush()
+        if self._compaction is not None:
+            self._compaction.join()
+
+    # Up to `limit` records whose key sorts after `after`, in key order
+    def page(self, records: dict, after=None, limit: int = 50) -> List:
+        keys = heapq.nsmallest(limit, (key for key in records if after is None or key > after))
+        return [records[key] for key in keys]
+
+    # Records whose getters match every filter, e.g. find(orders, user_id="cust01")
+    def find(self, records: dict, **filters) -> Iterator:
+        for record in list(records.values()):
+            if all(getattr(record, "get_" + name)() == value for name, value in filters.items()):
+                yield record
+
+    def pages(self, records: dict, where: Callable = None, sort_key: Callable = None, descending: bool = False,
+              page_size: int = 50) -> Iterator[List]:
+        return iter_pages(records, where, sort_key, descending, page_size)
+
+    # Thread lock plus the cross-process file lock; re-entrant within a thread
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._lock_depth == 0:
+                self._file_lock = _FileLock(self.path)
+                self._file_lock.__enter__()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._file_lock.__exit__(None, None, None)
+                    self._file_lock = None
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read_snapshot(self) -> dict:
+        try:
+            return self._decode_snapshot(self.path)
+        except FileNotFoundError:
+            return {}
+        except CorruptSnapshotError as error:
+            previous = self.path + ".prev"
+            try:
+                records = self._decode_snapshot(previous)
+            except (FileNotFoundError, CorruptSnapshotError):
+                raise error from None
+            print(f"{error} Using the previous snapshot, {previous}.")
+            return records
+
+    def _decode_snapshot(self, path: str) -> dict:
+        with open(path, "rb") as f:
+            data = f.read()
+        body = self._checked_body(path, data)
+        try:
+            if self.codec.is_encoded(body):
+                return self.codec.loads(body)
+            return _CompatUnpickler(io.BytesIO(body)).load()  # Written before the record format
+        except (EOFError, ValueError, TypeError, struct.error, pickle.UnpicklingError) as error:
+            raise CorruptSnapshotError(f"{path} could not be decoded: {error}.") from error
+
+    # The snapshot without its trailer, after checking the trailer's checksum
+    def _checked_body(self, path: str, data: bytes):
+        if not data:
+            raise CorruptSnapshotError(f"{path} is empty.")  # Only a missing file means no records
+        size = len(data) - self.TRAILER.size
+        if size < 0:
+            return data
+        magic, length, checksum = self.TRAILER.unpack_from(data, size)
+        if magic != self.TRAILER_MAGIC:
+            return data  # Written before snapshots carried a checksum
+        body = memoryview(data)[:size]
+        if length != size or zlib.crc32(body) != checksum:
+            raise CorruptSnapshotError(f"{path} failed its checksum.")
+        return body
+
+    # Check the snapshot and its previous generation without decoding them.
+    # Returns the problems found; empty if both are sound.
+    def verify(self) -> List[str]:
+        problems = []
+        for path in (self.path, self.path + ".prev"):
+            try:
+                with open(path, "rb") as f:
+                    self._checked_body(path, f.read())
+            except FileNotFoundError:
+                pass
+            except CorruptSnapshotError as error:
+                problems.append(str(error))
+        return problems
+
+    # Caller must hold the file lock
+    def _write_snapshot(self, records: dict):
+        self._commit_snapshot(_stage_file(self.path, self._encode_snapshot(records)))
+
+    def _encode_snapshot(self, records: dict) -> bytes:
+        try:
+            data = self.codec.dumps(records)
+        except UnencodableRecord:
+            data = pickle.dumps(dict(records), protocol=pickle.HIGHEST_PROTOCOL)
+        return data + self.TRAILER.pack(self.TRAILER_MAGIC, len(data), zlib.crc32(data))
+
+    def _commit_snapshot(self, tmp_path: str):
+        _replace_with_staged(self.path, tmp_path, keep_previous=True)
+        self._seen = self._signature()
+
+    def _notify(self, key, value):
+        for listener in self._listeners:
+            listener(key, value)
+
+    # Returns whether the entry changed records
+    @staticmethod
+    def _apply(records: dict, op: str, key, value) -> bool:
+        if op == "delete":
+            return records.pop(key, None) is not None
+        current = records.get(key)
+        if current is None or _version_of(value) >= _version_of(current):
+            records[key] = value
+            return True
+        return False
+
+    # Apply log records from `offset` on; returns the new record count and offset.
+    # A record torn at the end of the log is dropped; damage before the end raises
+    def _replay(self, records: dict, offset: int, count: int = 0, notify: bool = False) -> Tuple[int, int]:
+        try:
+            f = open(self.log_path, "r+b")
+        except FileNotFoundError:
+            return count, 0
+        with f:
+            f.seek(offset)
+            good_offset = offset
+            while True:
+                try:
+                    head = f.read(1)
+                    if head == self.codec.FRAME:
+                        op, key, value = self.codec.read_entry(f)
+                    elif head:
+                        f.seek(-1, os.SEEK_CUR)  # Pickled by an older version
+                        op, key, value = _CompatUnpickler(f).load()
+                    else:
+                        break
+                except (EOFError, ValueError, TypeError, pickle.UnpicklingError) as error:
+                    if not isinstance(error, EOFError) and f.read(1) and self._damaged_after(f, good_offset):
+                        # Records follow the bad one, so this is damage rather
+                        # than a torn append; leave the log for inspection
+                        raise CorruptSnapshotError(f"{self.log_path} is damaged at byte {good_offset}: {error}.") from error
+                    break
+                good_offset = f.tell()
+                if self._apply(records, op, key, value) and notify:
+                    self._notify(key, records.get(key))
+                count += 1
+            if f.seek(0, os.SEEK_END) > good_offset:
+                # A record torn by a crash mid-append; drop it so new records
+                # are not appended after the garbage
+                f.truncate(good_offset)
+        return count, good_offset
+
+    # Whether anything but zeros (as a crash can leave past the last write)
+    # follows `offset`
+    @staticmethod
+    def _damaged_after(f, offset: int) -> bool:
+        f.seek(offset)
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                return False
+            if chunk.strip(b"\0"):
+                return True
+
+    # Caller must hold the locks and have refreshed, so the log ends at _log_offset
+    def _append(self, *entries: Tuple):
+        self._append_data(b"".join(self._encode_entry(entry) for entry in entries), len(entries))
+
+    def _append_data(self, data: bytes, count: int):
+        with open(self.log_path, "ab") as f:
+            f.write(data)
+            self._log_offset = f.tell()
+        self._log_records += count
+
+    def _encode_entry(self, entry: Tuple) -> bytes:
+        try:
+            return self.codec.dumps_entry(*entry)
+        except UnencodableRecord:
+            return pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _compact_if_due(self, records: dict):
+        if self._log_records < self.COMPACT_THRESHOLD:
+            return
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, args=(records,), daemon=True)
+            self._compaction.start()
+
+    # Rewrite the snapshot as snapshot + log, from the files alone. Caller must
+    # hold the locks. Replaying the log again after a crash part-way through
+    # gives the same result, so no extra bookkeeping is needed.
+    def _fold_log(self, records: dict = None):
+        if not os.path.exists(self.log_path):
+            return
+        up_to_date = records is not None and not (isinstance(records, LazyRecords) and not records.is_loaded())
+        if up_to_date:
+            # Catch our records up with the log first, so they match the new snapshot
+            self.refresh(records)
+        folded = self._read_snapshot()
+        self._replay(folded, 0)
+        self._write_snapshot(folded)
+        self._remove_log()
+        if not up_to_date:
+            self._seen = None  # Our records may lag the new snapshot; merge it on the next refresh
+
+    def _remove_log(self):
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        self._log_offset = 0
+        self._log_records = 0
+
+
+_SCHEDULERS = weakref.WeakSet()  # Live PersistenceSchedulers, flushed at interpreter exit
+
+
+@atexit.register
+def _flush_schedulers():
+    for scheduler in list(_SCHEDULERS):
+        scheduler.flush()
+
+
+class PersistenceScheduler:
+    """
+    Coalesces the writes of PickleStores opened with deferred durability.
+
+    Such a store applies each change in memory and marks itself dirty here
+    instead of writing. Dirty stores are flushed `interval` seconds after the
+    first unflushed change, or as soon as `max_dirty` changes are waiting,
+    whichever comes first. A burst of updates then costs one snapshot rewrite
+    (or journal append) per store instead of one per change. A crash loses
+    at most the changes not yet flushed, and other processes see changes
+    only after the flush. flush() writes everything out at once; it also
+    runs at interpreter exit.
+    """
+
+    def __init__(self, interval: float = 1.0, max_dirty: int = 500):
+        if interval <= 0 or max_dirty < 1:
+            raise ValueError("The flush interval and dirty-change threshold must be positive.")
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.flushes = 0  # Flushes that wrote something
+        self._dirty: Dict[PickleStore, None] = {}  # Ordered set of stores waiting to be flushed
+        self._dirty_count = 0
+        self._timer: threading.Timer = None
+        self._lock = threading.Lock()
+        _SCHEDULERS.add(self)
+
+    def mark(self, store: PickleStore, changes: int = 1):
+        with self._lock:
+            self._dirty[store] = None
+            self._dirty_count += changes
+            due = self._dirty_count >= self.max_dirty
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            stores = list(self._dirty)
+            self._dirty.clear()
+            self._dirty_count = 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for store in stores:
+            store.flush()
+        if stores:
+            self.flushes += 1
+
+    # Flush and stop watching; nothing is left for the exit hook
+    def close(self):
+        self.flush()
+        _SCHEDULERS.discard(self)
+
+
+class PickleBackend:
+    """Storage backend keeping each record type in its own pickle file."""
+
+    def __init__(self, journal: bool = False, scheduler: PersistenceScheduler = None):
+        self.journal = journal
+        self.scheduler = scheduler
+
+    def open_store(self, name: str, path: str) -> PickleStore:
+        return PickleStore(path, self.journal, scheduler=self.scheduler)
+
+
+# Indexed columns stored next to each pickled record, keyed by table name.
+# The first entry is the primary key.
+_SQLITE_COLUMNS = {
+    "users": [
+        ("user_id", lambda u: u.get_user_id()),
+        ("user_type", lambda u: u.get_user_type()),
+        ("name", lambda u: u.get_name()),
+        ("email", lambda u: u.get_email()),
+    ],
+    "orders": [
+        ("order_id", lambda o: o.get_order_id()),
+        ("user_id", lambda o: o.get_user_id()),
+        ("status", lambda o: o.get_status()),
+        ("order_date", lambda o: o.get_order_date().isoformat()),
+    ],
+    "payments": [
+        ("payment_id", lambda p: p.get_payment_id()),
+        ("order_id", lambda p: p.get_order_id()),
+        ("user_id", lambda p: p.get_user_id()),
+        ("amount", lambda p: p.get_amount()),
+        ("payment_method", lambda p: p.get_payment_method()),
+        ("status", lambda p: p.get_status()),
+    ],
+    "tickets": [
+        ("ticket_type", lambda t: t.get_ticket_type()),
+        ("price", lambda t: t.get_price()),
+        ("discount", lambda t: t.get_discount()),
+    ],
+}
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY, user_type TEXT, name TEXT, email TEXT, record BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_users_type ON users (user_type);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY, user_id TEXT, status TEXT, order_date TEXT, record BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (order_date);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id TEXT NOT NULL, line_no INTEGER NOT NULL, ticket_type TEXT, quantity INTEGER, unit_price REAL,
+    PRIMARY KEY (order_id, line_no));
+CREATE INDEX IF NOT EXISTS idx_order_lines_type ON order_lines (ticket_type);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY, order_id TEXT, user_id TEXT, amount REAL, payment_method TEXT,
+    status TEXT, record BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_payments_order ON payments (order_id);
+CREATE INDEX IF NOT EXISTS idx_payments_user ON payments (user_id);
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_type TEXT PRIMARY KEY, price REAL, discount REAL, record BLOB NOT NULL);
+"""
+
+
+class SQLiteTable(MutableMapping):
+    """
+    Dictionary-like view of one SQLite table.
+
+    Lookups, membership tests and writes each run a single indexed statement,
+    and iteration streams rows from a cursor, so the table is never loaded into
+    memory as a whole. The SQL text is fixed per table, so sqlite3's statement
+    cache reuses the prepared statements.
+    """
+
+    def __init__(self, backend: "SQLiteBackend", table: str):
+        self._backend = backend
+        self._table = table
+        self._columns = [name for name, _ in _SQLITE_COLUMNS[table]]
+        self._getters = [getter for _, getter in _SQLITE_COLUMNS[table]]
+        key = self._columns[0]
+        self._key = key
+        self._select_sql = f"SELECT record FROM {table} WHERE {key} = ?"
+        self._exists_sql = f"SELECT 1 FROM {table} WHERE {key} = ?"
+        self._insert_sql = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(self._columns)}, record) "
+            f"VALUES ({', '.join('?' * (len(self._columns) + 1))})"
+        )
+        self._delete_sql = f"DELETE FROM {table} WHERE {key} = ?"
+
+    def _key_of(self, record):
+        return self._getters[0](record)
+
+    def __getitem__(self, key):
+        row = self._backend.execute(self._select_sql, (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return _unpickle_record(row[0])
+
+    def __contains__(self, key) -> bool:
+        return self._backend.execute(self._exists_sql, (key,)).fetchone() is not None
+
+    def __setitem__(self, key, value):
+        with self._backend.transaction():
+            self._write(key, value)
+
+    def __delitem__(self, key):
+        with self._backend.transaction():
+            if self._backend.execute(self._delete_sql, (key,)).rowcount == 0:
+                raise KeyError(key)
+            if self._table == "orders":
+                self._backend.execute("DELETE FROM order_lines WHERE order_id = ?", (key,))
+
+    def __iter__(self) -> Iterator:
+        for (key,) in self._backend.execute(f"SELECT {self._key} FROM {self._table} ORDER BY {self._key}"):
+            yield key
+
+    def __len__(self) -> int:
+        return self._backend.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    # Stream every record with one query rather than a lookup per key
+    def values(self) -> Iterator:
+        for (record,) in self._backend.execute(f"SELECT record FROM {self._table} ORDER BY {self._key}"):
+            yield _unpickle_record(record)
+
+    def items(self) -> Iterator:
+        for record in self.values():
+            yield self._getters[0](record), record
+
+    # Up to `limit` records whose key sorts after `after`, in key order
+    def page(self, after=None, limit: int = 50) -> List:
+        sql = f"SELECT record FROM {self._table}"
+        params: Tuple = ()
+        if after is not None:
+            sql += f" WHERE {self._key} > ?"
+            params = (after,)
+        rows = self._backend.execute(sql + f" ORDER BY {self._key} LIMIT ?", params + (limit,))
+        return [_unpickle_record(record) for (record,) in rows.fetchall()]
+
+    # Records matching every filter on the indexed columns
+    def find(self, **filters) -> Iterator:
+        for name in filters:
+            if name not in self._columns:
+                raise ValueError(f"Cannot filter {self._table} by {name}.")
+        where = " AND ".join(f"{name} = ?" for name in filters) or "1"
+        sql = f"SELECT record FROM {self._table} WHERE {where} ORDER BY {self._key}"
+        for (record,) in self._backend.execute(sql, tuple(filters.values())).fetchall():
+            yield _unpickle_record(record)
+
+    # Replace the table contents with `records` in one transaction
+    def replace_all(self, records: dict):
+        with self._backend.transaction():
+            self._backend.execute(f"DELETE FROM {self._table}")
+            if self._table == "orders":
+                self._backend.execute("DELETE FROM order_lines")
+            for key, value in records.items():
+                self._write(key, value)
+
+    # Caller must hold a transaction
+    def _write(self, key, value):
+        row = [getter(value) for getter in self._getters]
+        row[0] = key
+        row.append(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self._backend.execute(self._insert_sql, row)
+        if self._table == "orders":
+            self._backend.execute("DELETE FROM order_lines WHERE order_id = ?", (key,))
+            self._backend.executemany(
+                "INSERT INTO order_lines (order_id, line_no, ticket_type, quantity, unit_price) VALUES (?, ?, ?, ?, ?)",
+                [(key, line_no, *line) for line_no, line in enumerate(value.get_lines())],
+            )
+
+
+class SQLiteStore:
+    """Record store backed by one table of an SQLiteBackend; writes go straight to the database."""
+
+    def __init__(self, backend: "SQLiteBackend", table: str):
+        self._table = SQLiteTable(backend, table)
+
+    # Returns the live table view; nothing is read until it is used
+    def load(self, lazy: bool = False, on_load: Callable[[float], None] = None) -> SQLiteTable:
+        return self._table
+
+    def save(self, records):
+        if records is not self._table:
+            self._table.replace_all(records)
+
+    def put(self, records, key, value):
+        records[key] = value
+        if records is not self._table:
+            self._table[key] = value
+
+    def put_many(self, records, items: dict):
+        with self._table._backend.transaction():
+            for key, value in items.items():
+                self.put(records, key, value)
+
+    def delete(self, records, key):
+        records.pop(key, None)
+        if records is not self._table:
+            self._table.pop(key, None)
+
+    # Written at once; the caller's transaction() makes it land or roll back with the rest
+    def stage_many(self, records, items: dict) -> Callable[[], None]:
+        self.put_many(records, items)
+        return lambda: None
+
+    def delete_many(self, records, keys):
+        with self._table._backend.transaction():
+            for key in keys:
+                self.delete(records, key)
+
+    def locked(self, records):
+        return self._table._backend.transaction()
+
+    def refresh(self, records):
+        pass  # The table is always current
+
+    def subscribe(self, listener: Callable) -> bool:
+        return False  # Other processes write straight to the tables; query them instead
+
+    def compact(self, records=None):
+        pass  # Nothing to fold; writes go straight to the tables
+
+    def verify(self) -> List[str]:
+        return []  # SQLite's own journal keeps each commit whole
+
+    def close(self):
+        pass
+
+    def page(self, records, after=None, limit: int = 50) -> List:
+        return self._table.page(after, limit)
+
+    def find(self, records, **filters) -> Iterator:
+        return self._table.find(**filters)
+
+    # In key order the table pages itself, reading only what is shown; other
+    # orders need every row, so they go through iter_pages
+    def pages(self, records, where: Callable = None, sort_key: Callable = None, descending: bool = False,
+              page_size: int = 50) -> Iterator[List]:
+        if sort_key is not None or descending:
+            return iter_pages(records, where, sort_key, descending, page_size)
+        return self._key_pages(where, page_size)
+
+    def _key_pages(self, where, page_size: int) -> Iterator[List]:
+        after, page = None, []
+        while True:
+            batch = self._table.page(after, page_size)
+            for record in batch:
+                if where is None or where(record):
+                    page.append(record)
+                if len(page) == page_size:
+                    yield page
+                    page = []
+            if len(batch) < page_size:
+                break
+            after = self._table._key_of(batch[-1])
+        if page:
+            yield page
+
+
+class SQLiteBackend:
+    """
+    Storage backend keeping users, orders, order lines, payments and tickets as
+    indexed tables in one SQLite database.
+    """
+
+    def __init__(self, db_path: str = "aparksystem.db"):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    def open_store(self, name: str, path: str) -> SQLiteStore:
+        return SQLiteStore(self, name)
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.executemany(sql, rows)
+
+    # Group statements into one transaction; nested uses join the outer one
+    def transaction(self):
+        return _SQLiteTransaction(self)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _SQLiteTransaction:
+    def __init__(self, backend: SQLiteBackend):
+        self._backend = backend
+
+    def __enter__(self):
+        backend = self._backend
+        backend._lock.acquire()
+        if backend._depth == 0:
+            backend._conn.execute("BEGIN IMMEDIATE")  # Take the write lock up front
+        backend._depth += 1
+        return backend
+
+    def __exit__(self, exc_type, exc, tb):
+        backend = self._backend
+        try:
+            backend._depth -= 1
+            if backend._depth == 0:
+                backend._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            backend._lock.release()
+        return False
+
+
+class CredentialStore:
+    """
+    Verifies user passwords, with a fast path for repeat logins and
+    per-user throttling of failed attempts.
+
+    A successful check is remembered in a bounded LRU cache as a keyed digest
+    of the password (never the password itself), so logging in again with the
+    same credentials costs one HMAC instead of a full PBKDF2 hash. An entry
+    stops matching as soon as the user's stored hash changes. After
+    max_failures failed attempts within failure_window seconds, further
+    attempts for that user are refused without hashing until the window passes.
+    """
+
+    def __init__(self, iterations: int = None, cache_size: int = 1024, max_failures: int = 5,
+                 failure_window: float = 300.0):
+        self.iterations = iterations or PBKDF2_ITERATIONS
+        self.cache_size = cache_size
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self._cache_key = os.urandom(32)  # Digests are only meaningful within this process
+        self._verified: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()  # user ID -> (stored hash, digest)
+        self._failures: Dict[str, deque] = {}  # user ID -> times of recent failed attempts
+        self._lock = threading.Lock()
+
+    def hash_password(self, password: str) -> str:
+        return hash_password(password, self.iterations)
+
+    # True if password is right for user. Raises ValueError while the user is
+    # throttled. Plaintext or weaker hashes are upgraded in place on success;
+    # the caller persists the user if get_password() changed.
+    def verify(self, user: User, password: str) -> bool:
+        user_id = user.get_user_id()
+        stored = user._password
+        digest = hmac.new(self._cache_key, f"{user_id}\0{password}".encode(), hashlib.sha256).digest()
+        with self._lock:
+            self._check_throttle(user_id)
+            cached = self._verified.get(user_id)
+            if cached is not None and cached[0] == stored and hmac.compare_digest(cached[1], digest):
+                self._verified.move_to_end(user_id)
+                self._failures.pop(user_id, None)
+                return True
+
+        if not verify_password(password, stored):
+            with self._lock:
+                self._failures.setdefault(user_id, deque()).append(time.monotonic())
+            return False
+
+        if _hash_iterations(stored) < self.iterations:
+            stored = self.hash_password(password)
+            user.set_password_hash(stored)
+        with self._lock:
+            self._failures.pop(user_id, None)
+            if self.cache_size:
+                self._verified[user_id] = (stored, digest)
+                self._verified.move_to_end(user_id)
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        return True
+
+    # Caller must hold _lock
+    def _check_throttle(self, user_id: str):
+        failures = self._failures.get(user_id)
+        if not failures:
+            return
+        now = time.monotonic()
+        while failures and now - failures[0] > self.failure_window:
+            failures.popleft()
+        if len(failures) >= self.max_failures:
+            wait = self.failure_window - (now - failures[0])
+            raise AuthenticationError(f"Too many failed login attempts. Try again in {wait:.0f} seconds.")
+
+    # Drop a user's cached verification, e.g. after a password change or deletion
+    def forget(self, user_id: str):
+        with self._lock:
+            self._verified.pop(user_id, None)
+
+
+class Session:
+    __slots__ = ("token", "user", "created_at", "expires_at")
+
+    def __init__(self, token: str, user: User, expires_at: float):
+        self.token = token
+        self.user = user
+        self.created_at = time.monotonic()
+        self.expires_at = expires_at
+
+    def get_user(self) -> User:
+        return self.user
+
+
+class SessionManager:
+    """
+    Logged-in sessions keyed by an unguessable token, so one process can
+    serve many users at once.
+
+    Looking a session up is a single dictionary access. A session expires
+    after ttl seconds without use, and each successful lookup extends it.
+    Expired sessions are dropped when looked up and by a periodic sweep, so
+    abandoned ones do not pile up.
+    """
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, ttl: float = 1800.0):
+        self.ttl = ttl
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    def create(self, user: User) -> Session:
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        session = Session(token, user, now + self.ttl)
+        with self._lock:
+            self._sessions[token] = session
+            if now >= self._next_sweep:
+                self._sweep(now)
+        return session
+
+    # The live session for token; raises AuthenticationError if it is unknown or expired
+    def get(self, token: str) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None and session.expires_at <= now:
+                del self._sessions[token]
+                session = None
+            if session is None:
+                raise AuthenticationError("Session not found or expired. Please log in again.")
+            session.expires_at = now + self.ttl
+            return session
+
+    def end(self, token: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    # End every session of one user, e.g. when the account is deleted
+    def end_user(self, user_id: str) -> int:
+        with self._lock:
+            tokens = [token for token, session in self._sessions.items() if session.user.get_user_id() == user_id]
+            for token in tokens:
+                del self._sessions[token]
+            return len(tokens)
+
+    # Caller must hold _lock
+    def _sweep(self, now: float):
+        for token in [token for token, session in self._sessions.items() if session.expires_at <= now]:
+            del self._sessions[token]
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class AccountManagement:
+    def __init__(self, journal: bool = False, backend=None, data_manager: "DataManager" = None,
+                 credentials: CredentialStore = None, sessions: SessionManager = None):
         self._users: Dict[str, User] = {}  # Dictionary to store users by user ID
-        self._active_user: User = None  # Tracks the currently logged-in user
+        self._active_user: User = None  # The logged-in user for callers that do not pass a session
+        self.credentials = credentials or CredentialStore()
+        self.sessions = sessions or SessionManager()
+        self._data_manager = data_manager  # Shares its users instead of loading them again
+        if data_manager is not None:
+            self._store = data_manager._user_store
+        else:
+            backend = backend or PickleBackend(journal)
+            self._store = backend.open_store("users", self.USERS_FILE)
         self.load_users()  # Load users when initializing
 
     USERS_FILE = "users.pkl"
 
     # Load users from the pickle file
     def load_users(self):
-        try:
-            with open(self.USERS_FILE, 'rb') as file:
-                self._users = pickle.load(file)
-        except FileNotFoundError:
+        if self._data_manager is not None:
+            self._users = self._data_manager._users
+            return
+        if isinstance(self._store, PickleStore) and not os.path.exists(self.USERS_FILE):
             print("No existing user data found.")
-            self._users = {}  # Initialize to empty if file not found
+        self._users = self._store.load()
 
     # Save users to the pickle file
     def save_users(self):
-        with open(self.USERS_FILE, 'wb') as file:
-            pickle.dump(self._users, file)
+        self._store.save(self._users)
 
     # Create user (either Customer or Admin)
     def create_user(self, user_id: str, name: str, email: str, user_type: str, password: str):
@@ -325,28 +2102,32 @@ class AccountManagement:
             print("User ID already exists.")
             return
         if user_type == "Customer":
-            self._users[user_id] = Customer(user_id, name, email, password)
-            print(f"User '{name}' with role '{user_type}' created successfully.")
+            user = Customer(user_id, name, email, self.credentials.hash_password(password))
         elif user_type == "Admin":
-            self._users[user_id] = Admin(user_id, name, email, password)
-            print(f"User '{name}' with role '{user_type}' created successfully.")
+            user = Admin(user_id, name, email, self.credentials.hash_password(password))
         else:
             raise ValueError("Invalid user type.")
         
-        self.save_users()  # Save users after creation
+        self._store.put(self._users, user_id, user)  # Save the new user
+        print(f"User '{name}' with role '{user_type}' created successfully.")
+
+    # Check a user's password and start a session for them; raises AuthenticationError on failure
+    def authenticate(self, user_id: str, password: str) -> Session:
+        if user_id not in self._users:
+            raise AuthenticationError("User not found.")
+        user = self._users[user_id]
+        stored = user.get_password()
+        if not self.credentials.verify(user, password):
+            raise AuthenticationError("Invalid password.")
+        if user.get_password() != stored:
+            self._store.put(self._users, user_id, user)  # Save the upgraded hash
+        return self.sessions.create(user)
 
     # Login a user
     def login(self, user_id: str, password: str) -> bool:
         try:
-            if user_id in self._users:
-                user = self._users[user_id]
-                if user.get_password() == password:
-                    self._active_user = user
-                    return True
-                else:
-                    raise ValueError("Invalid password.")
-            else:
-                raise ValueError("User not found.")
+            self._active_user = self.authenticate(user_id, password).get_user()
+            return True
         except ValueError as e:
             print(e)
             return False
@@ -354,14 +2135,23 @@ class AccountManagement:
     def get_active_user(self):
         return self._active_user
 
-    # Logout the currently logged-in user
-    def logout(self):
-        if self._active_user:
+    # Logout the currently logged-in user, or end the given session
+    def logout(self, session: Session = None):
+        if session is not None:
+            self.sessions.end(session.token)
+        elif self._active_user:
             self._active_user = None
         else:
             print("No user is currently logged in.")
 
+    # The user an operation acts as: the session's, else the logged-in user
+    def _acting_user(self, session: Session = None) -> User:
+        return session.get_user() if session is not None else self._active_user
+
     # CRUD Operations for User
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._users
+
     def get_user(self, user_id: str) -> User:
         if user_id in self._users:
             return self._users[user_id]
@@ -369,36 +2159,39 @@ class AccountManagement:
             print("User not found.")
             return None
 
-    def delete_user(self, user_id: str):
-        if not self._active_user:
+    def delete_user(self, user_id: str, session: Session = None):
+        acting_user = self._acting_user(session)
+        if not acting_user:
             print("You must be logged in to delete a user.")
             return
         
-        if self._active_user.get_user_type() != "Admin":
+        if acting_user.get_user_type() != "Admin":
             print("Only admins can delete users.")
             return
         
         try:
             if user_id in self._users:
-                del self._users[user_id]
-                self.save_users()  # Save changes after deletion
+                self._store.delete(self._users, user_id)  # Save changes after deletion
+                self.credentials.forget(user_id)
+                self.sessions.end_user(user_id)
                 print(f"User {user_id} deleted successfully.")
             else:
-                raise ValueError("User not found.")
+                raise NotFoundError("User not found.")
         except ValueError as e:
             print(e)
 
-    def update_user(self, user_id: str, **kwargs):
-        if not self._active_user:
+    def update_user(self, user_id: str, session: Session = None, **kwargs):
+        acting_user = self._acting_user(session)
+        if not acting_user:
             print("You must be logged in to update your account.")
             return
         
-        if user_id != self._active_user.get_user_id():
+        if user_id != acting_user.get_user_id():
             print("You can only update your own account.")
             return
         
         if user_id not in self._users:
-            raise ValueError("User not found.")
+            raise NotFoundError("User not found.")
         
         user = self._users[user_id]
         
@@ -409,231 +2202,1097 @@ class AccountManagement:
                 user.set_email(value)
             elif key == 'password':
                 user.set_password(value)
+                self.credentials.forget(user_id)
             elif key == 'user_type':
                 user.set_user_type(value)
             else:
                 raise ValueError(f"Invalid attribute: {key}")
         
-        self.save_users()  # Save changes after update
+        self._store.put(self._users, user_id, user)  # Save changes after update
         print(f"User {user_id} updated successfully.")
 
-    def display_all_users(self):
+    # Up to `limit` users with IDs after `after`, for paging through large user bases
+    def page_users(self, after: str = None, limit: int = 50) -> List[User]:
+        return self._store.page(self._users, after, limit)
+
+    USER_SORT_KEYS = {
+        "id": None,
+        "name": lambda user: user.get_name(),
+        "type": lambda user: user.get_user_type(),
+    }
+
+    # Users a page at a time, optionally of one type, ordered by a USER_SORT_KEYS key
+    def list_users(self, user_type: str = None, sort_by: str = "id", descending: bool = False,
+                   page_size: int = 50) -> Iterator[List[User]]:
+        if sort_by not in self.USER_SORT_KEYS:
+            raise ValueError(f"Cannot sort users by {sort_by}.")
+        conditions = []
+        if user_type is not None:
+            conditions.append(lambda user: user.get_user_type() == user_type)
+        return self._store.pages(self._users, _all_of(conditions), self.USER_SORT_KEYS[sort_by], descending, page_size)
+
+    def display_all_users(self, user_type: str = None, sort_by: str = "id", page_size: int = 20):
         """
-        Display information for all users in the system.
-        Returns a list of user information strings.
+        Display information for the users in the system, a page at a time.
+        Returns the number of users shown.
         """
         if not self._users:
             print("No users found in the system.")
-            return []        
-        
-        for user_id, user in self._users.items():
-            user_info = user.display_info()
-            print(user_info)
-            
+            return 0
+
+        return print_pages(self.list_users(user_type, sort_by, page_size=page_size), lambda user: user.display_info())
+
+
+class RevenueAggregates:
+    """
+    Running revenue totals, updated as payments are created or change status
+    so that reads are O(1) instead of a pass over every payment.
+
+    Totals are broken down by payment method, ticket type, user type and day.
+    Failed payments are not counted. A payment's amount is split across
+    ticket types in proportion to its order's line totals.
+    """
+
+    DIMENSIONS = ("method", "ticket_type", "user_type", "day")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0.0
+        self._count = 0
+        self._totals: Dict[str, Dict] = {dimension: {} for dimension in self.DIMENSIONS}
+        # What each payment added, so a status change can take it back out
+        self._contributions: Dict[str, List[Tuple[str, object, float]]] = {}
+
+    # Add or refresh one payment's share; order and user may be None if unknown
+    def apply(self, payment: Payment, order: Order = None, user: User = None):
+        parts = self._parts(payment, order, user)
+        with self._lock:
+            self._withdraw(payment.get_payment_id())
+            if parts is None:
+                return
+            for dimension, key, amount in parts:
+                totals = self._totals[dimension]
+                totals[key] = totals.get(key, 0.0) + amount
+            self._contributions[payment.get_payment_id()] = parts
+            self._total += payment.get_amount()
+            self._count += 1
+
+    def discard(self, payment_id: str):
+        with self._lock:
+            self._withdraw(payment_id)
+
+    def _withdraw(self, payment_id: str):
+        parts = self._contributions.pop(payment_id, None)
+        if parts is None:
+            return
+        for dimension, key, amount in parts:
+            totals = self._totals[dimension]
+            remaining = totals[key] - amount
+            if abs(remaining) < 1e-9:
+                del totals[key]
+            else:
+                totals[key] = remaining
+        self._total -= parts[0][2]  # The method share is always the full amount
+        self._count -= 1
+
+    @staticmethod
+    def _parts(payment: Payment, order: Order, user: User):
+        if payment.get_status() == "Failed":
+            return None
+        amount = payment.get_amount()
+        payment_date = payment.get_payment_date() or (order.get_order_date() if order else None)
+        parts = [
+            ("method", payment.get_payment_method(), amount),
+            ("user_type", user.get_user_type() if user else "Unknown", amount),
+            ("day", payment_date.date() if payment_date else None, amount),
+        ]
+        lines = order.get_lines() if order else []
+        order_total = sum(line.get_total_price() for line in lines)
+        if order_total:
+            for line in lines:
+                parts.append(("ticket_type", line.ticket_type, amount * line.get_total_price() / order_total))
+        else:
+            parts.append(("ticket_type", "Unknown", amount))
+        return parts
+
+    # Reads
+    def get_total(self) -> float:
+        return self._total
+
+    def get_count(self) -> int:
+        return self._count
+
+    def get(self, dimension: str, key) -> float:
+        return self._totals[dimension].get(key, 0.0)
+
+    def breakdown(self, dimension: str) -> Dict:
+        with self._lock:
+            return dict(self._totals[dimension])
+
+    # Differences from other, as readable strings; empty when they agree to the cent
+    def compare(self, other: "RevenueAggregates") -> List[str]:
+        mismatches = []
+        if round(self._total - other._total, 2) or self._count != other._count:
+            mismatches.append(f"total: {self._total:.2f} ({self._count}) vs {other._total:.2f} ({other._count})")
+        for dimension in self.DIMENSIONS:
+            ours, theirs = self._totals[dimension], other._totals[dimension]
+            for key in ours.keys() | theirs.keys():
+                if round(ours.get(key, 0.0) - theirs.get(key, 0.0), 2):
+                    mismatches.append(
+                        f"{dimension} {key}: {ours.get(key, 0.0):.2f} vs {theirs.get(key, 0.0):.2f}"
+                    )
+        return mismatches
 
 
 class OrderPaymentManager:
     ORDERS_FILE = "orders.pkl"
     PAYMENTS_FILE = "payments.pkl"
+    ARCHIVE_DIR = "archive"
 
-    def __init__(self):
+    def __init__(self, journal: bool = False, backend=None, data_manager: "DataManager" = None,
+                 users: Dict[str, User] = None):
         self._orders: Dict[str, Order] = {}
         self._payments: Dict[str, Payment] = {}
+        self._users = users  # Used for the user type breakdown; taken from data_manager if not given
+        self._aggregates: RevenueAggregates = None  # Built on first use
+        self._data_manager = data_manager  # Shares its orders and payments instead of loading them again
+        if data_manager is not None:
+            self._order_store = data_manager._order_store
+            self._payment_store = data_manager._payment_store
+            self._archive = data_manager.archive
+        else:
+            backend = backend or PickleBackend(journal)
+            self._order_store = backend.open_store("orders", self.ORDERS_FILE)
+            self._payment_store = backend.open_store("payments", self.PAYMENTS_FILE)
+            self._archive = OrderArchive(self.ARCHIVE_DIR)  # Closed orders moved out by DataManager.archive_orders()
+        # Writes buffered by the calling thread's open transaction(). Each thread
+        # sees only its own; other threads wait on the store locks it holds.
+        self._unit = threading.local()
 
     # Load orders from the pickle file
     def load_orders(self):
-        try:
-            with open(self.ORDERS_FILE, 'rb') as file:
-                self._orders = pickle.load(file)
-        except FileNotFoundError:
+        if self._data_manager is not None:
+            self._orders = self._data_manager._orders
+            return
+        if isinstance(self._order_store, PickleStore) and not os.path.exists(self.ORDERS_FILE):
             print("No existing order data found.")
+        self._orders = self._order_store.load()
 
     # Save orders to the pickle file
     def save_orders(self):
-        with open(self.ORDERS_FILE, 'wb') as file:
-            pickle.dump(self._orders, file)
+        self._order_store.save(self._orders)
 
     # Load payments from the pickle file
     def load_payments(self):
-        try:
-            with open(self.PAYMENTS_FILE, 'rb') as file:
-                self._payments = pickle.load(file)
-        except FileNotFoundError:
+        if self._data_manager is not None:
+            self._payments = self._data_manager._payments
+            self._aggregates = None
+            return
+        if isinstance(self._payment_store, PickleStore) and not os.path.exists(self.PAYMENTS_FILE):
             print("No existing payment data found.")
+        self._payments = self._payment_store.load()
+        self._aggregates = None
 
     # Save payments to the pickle file
     def save_payments(self):
-        with open(self.PAYMENTS_FILE, 'wb') as file:
-            pickle.dump(self._payments, file)
+        self._payment_store.save(self._payments)
+
+    # The calling thread's transaction buffers, or None outside one
+    @property
+    def _pending_orders(self) -> Dict[str, Order]:
+        return getattr(self._unit, "orders", None)
+
+    @_pending_orders.setter
+    def _pending_orders(self, orders: Dict[str, Order]):
+        self._unit.orders = orders
+
+    @property
+    def _pending_payments(self) -> Dict[str, Payment]:
+        return getattr(self._unit, "payments", None)
+
+    @_pending_payments.setter
+    def _pending_payments(self, payments: Dict[str, Payment]):
+        self._unit.payments = payments
+
+    @property
+    def _undo(self) -> List[Callable[[], None]]:
+        return getattr(self._unit, "undo", [])
+
+    @_undo.setter
+    def _undo(self, undo: List[Callable[[], None]]):
+        self._unit.undo = undo
+
+    # Unit of work: orders and payments created or changed inside the block are
+    # validated as they are made but only written when it ends, with one write
+    # per store. If the block raises, nothing is written and changes are undone.
+    # Both writes are prepared before either is made: with SQLite they share one
+    # database transaction; with pickle files both new files (or journal
+    # batches) are written first and then swapped in, so a failure while
+    # writing leaves both stores as they were. Only a crash between the two
+    # final renames or appends can leave one without the other.
+    @contextmanager
+    def transaction(self):
+        if self._pending_orders is not None:
+            yield self  # This thread is already inside one; join it
+            return
+        with self._order_store.locked(self._orders), self._payment_store.locked(self._payments):
+            self._pending_orders, self._pending_payments, self._undo = {}, {}, []
+            try:
+                yield self
+                commits = [self._order_store.stage_many(self._orders, self._pending_orders),
+                           self._payment_store.stage_many(self._payments, self._pending_payments)]
+                for commit in commits:
+                    commit()
+                for payment in self._pending_payments.values():
+                    self._count_payment(payment)
+            except BaseException:
+                for undo in reversed(self._undo):
+                    undo()
+                raise
+            finally:
+                self._pending_orders, self._pending_payments, self._undo = None, None, []
+
+    # Inside a transaction buffer the write, otherwise persist it now
+    def _stage_order(self, order: Order):
+        if self._pending_orders is not None:
+            self._pending_orders[order.get_order_id()] = order
+        else:
+            self._order_store.put(self._orders, order.get_order_id(), order)
+
+    def _stage_payment(self, payment: Payment):
+        if self._pending_payments is not None:
+            self._pending_payments[payment.get_payment_id()] = payment
+        else:
+            self._payment_store.put(self._payments, payment.get_payment_id(), payment)
+            self._count_payment(payment)
+
+    # Keep the revenue aggregates in step with a payment that was just saved
+    def _count_payment(self, payment: Payment):
+        if self._aggregates is not None:
+            self._aggregates.apply(payment, self._orders.get(payment.get_order_id()), self._user(payment.get_user_id()))
+
+    def _user(self, user_id: str) -> User:
+        users = self._users
+        if users is None and self._data_manager is not None:
+            users = self._data_manager._users
+        return users.get(user_id) if users is not None else None
+
+    # Running revenue totals; built from the loaded payments the first time
+    @property
+    def aggregates(self) -> RevenueAggregates:
+        if self._aggregates is None:
+            self._aggregates = self._build_aggregates()
+        return self._aggregates
+
+    def _build_aggregates(self) -> RevenueAggregates:
+        aggregates = RevenueAggregates()
+        for payment in self._payments.values():
+            aggregates.apply(payment, self._orders.get(payment.get_order_id()), self._user(payment.get_user_id()))
+        for payment in self._archive.payments():
+            if payment.get_payment_id() not in self._payments:  # Still live after an interrupted archive run
+                aggregates.apply(payment, self._archive.get_order(payment.get_order_id()),
+                                 self._user(payment.get_user_id()))
+        return aggregates
+
+    # Recompute the aggregates from every payment and compare with the running
+    # ones. Returns the mismatches found (empty if they agree); pass
+    # rebuild=True to replace the running totals with the recomputed ones.
+    def verify_aggregates(self, rebuild: bool = False) -> List[str]:
+        fresh = self._build_aggregates()
+        mismatches = self.aggregates.compare(fresh)
+        if rebuild:
+            self._aggregates = fresh
+        return mismatches
+
+    # See reconcile_order_totals
+    def reconcile_totals(self) -> List[str]:
+        return reconcile_order_totals(self._orders, self._payments)
+
+    # Revenue per key of one of RevenueAggregates.DIMENSIONS
+    def revenue_breakdown(self, dimension: str) -> Dict:
+        return self.aggregates.breakdown(dimension)
+
+    def _has_order(self, order_id: str) -> bool:
+        return order_id in self._orders or (self._pending_orders is not None and order_id in self._pending_orders)
+
+    def _has_payment(self, payment_id: str) -> bool:
+        return payment_id in self._payments or (self._pending_payments is not None and payment_id in self._pending_payments)
 
     # Add an order
     def add_order(self, order: Order):
-        if order.get_order_id() in self._orders:
-            print(f"Order ID {order.get_order_id()} already exists.")
-            return
-        self._orders[order.get_order_id()] = order
-        self.save_orders()
+        with self._order_store.locked(self._orders):
+            if self._has_order(order.get_order_id()):
+                print(f"Order ID {order.get_order_id()} already exists.")
+                return
+            self._stage_order(order)
         print(f"Order {order.get_order_id()} added successfully.")
 
     # Add a payment
     def add_payment(self, payment: Payment):
-        if payment._payment_id in self._payments:
-            print(f"Payment ID {payment._payment_id} already exists.")
-            return
-        self._payments[payment._payment_id] = payment
-        self.save_payments()
+        with self._payment_store.locked(self._payments):
+            if self._has_payment(payment._payment_id):
+                print(f"Payment ID {payment._payment_id} already exists.")
+                return
+            self._stage_payment(payment)
         print(f"Payment {payment._payment_id} added successfully.")
 
-    # Display all orders
-    def display_all_orders(self):
+    ORDER_SORT_KEYS = {
+        "id": None,
+        "date": lambda order: order.get_order_date(),
+        "total": lambda order: order.get_total_price(),
+        "user": lambda order: order.get_user_id(),
+        "status": lambda order: order.get_status(),
+    }
+    PAYMENT_SORT_KEYS = {
+        "id": None,
+        "date": lambda payment: payment.get_payment_date() or datetime.min,
+        "amount": lambda payment: payment.get_amount(),
+        "method": lambda payment: payment.get_payment_method(),
+        "status": lambda payment: payment.get_status(),
+    }
+
+    # Orders a page at a time, filtered by status, user, user type and a
+    # [since, until) order date range, ordered by an ORDER_SORT_KEYS key
+    def list_orders(self, status: str = None, user_id: str = None, user_type: str = None,
+                    since: datetime = None, until: datetime = None, sort_by: str = "id",
+                    descending: bool = False, page_size: int = 50) -> Iterator[List[Order]]:
+        if sort_by not in self.ORDER_SORT_KEYS:
+            raise ValueError(f"Cannot sort orders by {sort_by}.")
+        conditions = self._common_conditions(status, user_id, user_type)
+        if since is not None or until is not None:
+            conditions.append(_in_range(lambda order: order.get_order_date(), since, until))
+        return self._order_store.pages(self._orders, _all_of(conditions), self.ORDER_SORT_KEYS[sort_by],
+                                       descending, page_size)
+
+    # Payments a page at a time, filtered like list_orders and by payment method
+    def list_payments(self, status: str = None, user_id: str = None, user_type: str = None,
+                      since: datetime = None, until: datetime = None, method: str = None, sort_by: str = "id",
+                      descending: bool = False, page_size: int = 50) -> Iterator[List[Payment]]:
+        if sort_by not in self.PAYMENT_SORT_KEYS:
+            raise ValueError(f"Cannot sort payments by {sort_by}.")
+        conditions = self._common_conditions(status, user_id, user_type)
+        if method is not None:
+            conditions.append(lambda payment: payment.get_payment_method() == method)
+        if since is not None or until is not None:
+            conditions.append(_in_range(lambda payment: payment.get_payment_date(), since, until))
+        return self._payment_store.pages(self._payments, _all_of(conditions), self.PAYMENT_SORT_KEYS[sort_by],
+                                         descending, page_size)
+
+    def _common_conditions(self, status: str, user_id: str, user_type: str) -> List[Callable]:
+        conditions = []
+        if status is not None:
+            conditions.append(lambda record: record.get_status() == status)
+        if user_id is not None:
+            conditions.append(lambda record: record.get_user_id() == user_id)
+        if user_type is not None:
+            def has_user_type(record) -> bool:
+                user = self._user(record.get_user_id())
+                return user is not None and user.get_user_type() == user_type
+            conditions.append(has_user_type)
+        return conditions
+
+    # Display orders a page at a time; takes the list_orders filters
+    def display_all_orders(self, page_size: int = 20, **filters) -> int:
         if not self._orders:
             print("No orders found.")
-        for order_id, order in self._orders.items():
-            print(order.display_order_details())
+            return 0
+        return print_pages(self.list_orders(page_size=page_size, **filters), lambda order: order.display_order_details())
 
-    # Display all payments
-    def display_all_payments(self):
+    # Display payments a page at a time; takes the list_payments filters
+    def display_all_payments(self, page_size: int = 20, **filters) -> int:
         if not self._payments:
             print("No payments found.")
-        for payment_id, payment in self._payments.items():
-            print(
+            return 0
+        return print_pages(
+            self.list_payments(page_size=page_size, **filters),
+            lambda payment: (
                 f"Payment ID: {payment._payment_id}, "
                 f"Order ID: {payment._order_id}, "
                 f"User ID: {payment._user_id}, "
                 f"Amount: {payment._amount:.2f}, "
                 f"Method: {payment._payment_method}"
-            )
+            ),
+        )
 
     # Add this new method
-    def create_order(self, order_id: str, user_id: str, tickets: List[Ticket]):
-        if order_id in self._orders:
-            print(f"Order ID {order_id} already exists.")
-            return
-        new_order = Order(order_id, user_id, tickets)
-        self._orders[order_id] = new_order
-        self.save_orders()
+    def create_order(self, order_id: str, user_id: str, tickets: List[Ticket] = None, lines: List[OrderLine] = None):
+        with self._order_store.locked(self._orders):
+            if self._has_order(order_id):
+                print(f"Order ID {order_id} already exists.")
+                return
+            new_order = Order(order_id, user_id, tickets, lines)
+            self._stage_order(new_order)
         print(f"Order {order_id} created successfully.")
 
+    # Create many orders from (order_id, user_id, lines) tuples with a single
+    # write. Raises ValueError, writing nothing, if any order ID is taken.
+    def create_orders(self, orders) -> List[Order]:
+        created = []
+        with self.transaction():
+            for order_id, user_id, lines in orders:
+                if self._has_order(order_id):
+                    raise ValueError(f"Order ID {order_id} already exists.")
+                new_order = Order(order_id, user_id, lines=lines)
+                self._stage_order(new_order)
+                created.append(new_order)
+        print(f"{len(created)} orders created successfully.")
+        return created
+
     # Add this new method
     def get_order(self, order_id: str) -> Order:
+        if self._pending_orders and order_id in self._pending_orders:
+            return self._pending_orders[order_id]
         if order_id not in self._orders:
-            raise ValueError(f"Order ID {order_id} not found.")
+            order = self._archive.get_order(order_id)
+            if order is None:
+                raise NotFoundError(f"Order ID {order_id} not found.")
+            return order
         return self._orders[order_id]
 
     # Add this method too since it's used later in the code
     def get_payment(self, payment_id: str) -> Payment:
+        if self._pending_payments and payment_id in self._pending_payments:
+            return self._pending_payments[payment_id]
         if payment_id not in self._payments:
-            raise ValueError(f"Payment ID {payment_id} not found.")
+            payment = self._archive.get_payment(payment_id)
+            if payment is None:
+                raise NotFoundError(f"Payment ID {payment_id} not found.")
+            return payment
         return self._payments[payment_id]
 
-    # And this method which is used in the test code
-    def update_order_status(self, order_id: str, status: str):
-        order = self.get_order(order_id)
-        order.set_status(status)
-        self.save_orders()
+    # And this method which is used in the test code. Pass the version the
+    # caller last saw to fail instead of overwriting someone else's change.
+    def update_order_status(self, order_id: str, status: str, expected_version: int = None):
+        with self._order_store.locked(self._orders):
+            order = self.get_order(order_id)
+            if order_id not in self._orders and self._archive.has_order(order_id):
+                raise ValueError(f"Order ID {order_id} is archived and cannot be changed.")
+            if expected_version is not None and order.get_version() != expected_version:
+                raise ConcurrentModificationError(f"Order ID {order_id} was changed by someone else.")
+            self._remember_state(order)
+            order.set_status(status)
+            self._stage_order(order)
+
+    def update_payment_status(self, payment_id: str, status: str, expected_version: int = None):
+        with self._payment_store.locked(self._payments):
+            payment = self.get_payment(payment_id)
+            if payment_id not in self._payments and self._archive.get_payment(payment_id) is not None:
+                raise ValueError(f"Payment ID {payment_id} is archived and cannot be changed.")
+            if expected_version is not None and payment.get_version() != expected_version:
+                raise ConcurrentModificationError(f"Payment ID {payment_id} was changed by someone else.")
+            self._remember_state(payment)
+            payment.set_status(status)
+            self._stage_payment(payment)
+
+    # Inside a transaction, note how to put a record's status back on rollback
+    def _remember_state(self, record):
+        if self._pending_orders is None:
+            return
+        status, version = record._status, record._version
+
+        def undo():
+            record._status, record._version = status, version
+        self._undo.append(undo)
+
+    # Paged and filtered lookups, e.g. find_orders(user_id="cust01", status="Pending")
+    def page_orders(self, after: str = None, limit: int = 50) -> List[Order]:
+        return self._order_store.page(self._orders, after, limit)
+
+    def find_orders(self, **filters) -> Iterator[Order]:
+        return self._order_store.find(self._orders, **filters)
+
+    def page_payments(self, after: str = None, limit: int = 50) -> List[Payment]:
+        return self._payment_store.page(self._payments, after, limit)
+
+    def find_payments(self, **filters) -> Iterator[Payment]:
+        return self._payment_store.find(self._payments, **filters)
 
     # And this method for calculating total revenue
     def calculate_total_revenue(self) -> float:
-        return sum(payment.get_amount() for payment in self._payments.values())
+        return self.aggregates.get_total()
 
     # Add this new method
     def create_payment(self, payment_id: str, order_id: str, user_id: str, amount: float, payment_method: str):
-        if payment_id in self._payments:
-            print(f"Payment ID {payment_id} already exists.")
-            return
-        new_payment = Payment(payment_id, order_id, user_id, amount, payment_method)
-        self._payments[payment_id] = new_payment
-        self.save_payments()
+        with self._payment_store.locked(self._payments):
+            if self._has_payment(payment_id):
+                print(f"Payment ID {payment_id} already exists.")
+                return
+            new_payment = Payment(payment_id, order_id, user_id, amount, payment_method)
+            self._stage_payment(new_payment)
         print(f"Payment {payment_id} created successfully.")
 
+    # Create many payments from (payment_id, order_id, user_id, amount,
+    # payment_method) tuples with a single write. Raises ValueError, writing
+    # nothing, if any payment ID is taken or any order does not exist.
+    def create_payments(self, payments) -> List[Payment]:
+        created = []
+        with self.transaction():
+            for payment_id, order_id, user_id, amount, payment_method in payments:
+                if self._has_payment(payment_id):
+                    raise ValueError(f"Payment ID {payment_id} already exists.")
+                if not self._has_order(order_id):
+                    raise NotFoundError(f"Order ID {order_id} not found.")
+                new_payment = Payment(payment_id, order_id, user_id, amount, payment_method)
+                self._stage_payment(new_payment)
+                created.append(new_payment)
+        print(f"{len(created)} payments created successfully.")
+        return created
+
+
+class _FixedColumn:
+    # Sequence view of one fixed-width bytes field across the rows of a mapping,
+    # so bisect can search it without copying the rows out
+    def __init__(self, buffer, start: int, stride: int, width: int, count: int):
+        self._buffer = buffer
+        self._start = start
+        self._stride = stride
+        self._width = width
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = self._start + index * self._stride
+        return self._buffer[offset:offset + self._width]
+
+
+def _fixed(text: str, width: int) -> bytes:
+    data = text.encode("utf-8")
+    if len(data) > width:
+        raise ValueError(f"{text!r} is longer than the archive's {width}-byte field.")
+    return data.ljust(width, b"\0")
+
+
+def _unfixed(data: bytes) -> str:
+    return data.rstrip(b"\0").decode("utf-8")
+
+
+_NO_DATE = -(2 ** 63)  # Stands for a missing datetime in the archive
+
+
+class _ArchiveSegment:
+    """One memory-mapped segment file of an OrderArchive."""
+
+    HEADER = struct.Struct("<4sBIII")  # Magic, format version, order, line and payment counts
+    ORDER = struct.Struct("<24s32sqiBdIHI")  # ID, user, date, visit day, status, total, first line, lines, version
+    LINE = struct.Struct("<32sId")  # Ticket type, quantity, unit price
+    BY_USER = struct.Struct("<32sI")  # User ID, order row
+    PAYMENT = struct.Struct("<24s24s32sd16sBqI")  # ID, order, user, amount, method, status, date, version
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.order_count, self.line_count, self.payment_count = self.HEADER.unpack_from(self._map)
+        if magic != OrderArchive.MAGIC or version > OrderArchive.VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not an order archive segment this program can read.")
+        self._orders_at = self.HEADER.size
+        self._lines_at = self._orders_at + self.order_count * self.ORDER.size
+        self._by_user_at = self._lines_at + self.line_count * self.LINE.size
+        self._payments_at = self._by_user_at + self.order_count * self.BY_USER.size
+        # Rows are sorted by these columns, so lookups are binary searches over the mapping
+        self._order_ids = _FixedColumn(self._map, self._orders_at, self.ORDER.size, 24, self.order_count)
+        self._user_ids = _FixedColumn(self._map, self._by_user_at, self.BY_USER.size, 32, self.order_count)
+        self._payment_ids = _FixedColumn(self._map, self._payments_at, self.PAYMENT.size, 24, self.payment_count)
+
+    @classmethod
+    def write(cls, path: str, orders: List[Order], payments: List[Payment]):
+        orders = sorted(orders, key=lambda order: _fixed(order.get_order_id(), 24))
+        payments = sorted(payments, key=lambda payment: _fixed(payment.get_payment_id(), 24))
+        order_rows, line_rows, by_user = [], [], []
+        for row, order in enumerate(orders):
+            visit_date = order.get_visit_date()
+            order_rows.append(cls.ORDER.pack(
+                _fixed(order.get_order_id(), 24), _fixed(order.get_user_id(), 32),
+                _encode_datetime(order.get_order_date()), visit_date.toordinal() if visit_date else 0,
+                Order.VALID_STATUSES.index(order.get_status()), order.get_total_price(),
+                len(line_rows), len(order.get_lines()), order.get_version(),
+            ))
+            for line in order.get_lines():
+                line_rows.append(cls.LINE.pack(_fixed(line.ticket_type, 32), line.quantity, line.unit_price))
+            by_user.append((_fixed(order.get_user_id(), 32), row))
+        by_user.sort()
+        payment_rows = []
+        for payment in payments:
+            payment_date = payment.get_payment_date()
+            payment_rows.append(cls.PAYMENT.pack(
+                _fixed(payment.get_payment_id(), 24), _fixed(payment.get_order_id(), 24),
+                _fixed(payment.get_user_id(), 32), payment.get_amount(), _fixed(payment.get_payment_method(), 16),
+                Payment.PAYMENT_STATUSES.index(payment.get_status()),
+                _NO_DATE if payment_date is None else _encode_datetime(payment_date), payment.get_version(),
+            ))
+        # Readers only ever see whole segments
+        _write_atomically(path, b"".join([
+            cls.HEADER.pack(OrderArchive.MAGIC, OrderArchive.VERSION, len(order_rows), len(line_rows),
+                            len(payment_rows)),
+            *order_rows, *line_rows, *(cls.BY_USER.pack(user_id, row) for user_id, row in by_user), *payment_rows,
+        ]))
+
+    # Row of order_id, or None
+    def find_order(self, order_id: str) -> int:
+        return self._find(self._order_ids, _fixed(order_id, 24))
+
+    def find_payment(self, payment_id: str) -> int:
+        return self._find(self._payment_ids, _fixed(payment_id, 24))
+
+    @staticmethod
+    def _find(column: _FixedColumn, key: bytes) -> int:
+        row = bisect.bisect_left(column, key)
+        return row if row < len(column) and column[row] == key else None
+
+    # Rows of the user's orders
+    def user_rows(self, user_id: str) -> List[int]:
+        key = _fixed(user_id, 32)
+        rows = []
+        index = bisect.bisect_left(self._user_ids, key)
+        while index < self.order_count and self._user_ids[index] == key:
+            rows.append(self.BY_USER.unpack_from(self._map, self._by_user_at + index * self.BY_USER.size)[1])
+            index += 1
+        return rows
+
+    def order_id(self, row: int) -> str:
+        return _unfixed(self._order_ids[row])
+
+    def payment_id(self, row: int) -> str:
+        return _unfixed(self._payment_ids[row])
+
+    # Status and total without building the Order
+    def order_summary(self, row: int) -> Tuple[str, str, float]:
+        fields = self.ORDER.unpack_from(self._map, self._orders_at + row * self.ORDER.size)
+        return _unfixed(fields[0]), Order.VALID_STATUSES[fields[4]], fields[5]
+
+    def order(self, row: int) -> Order:
+        order_id, user_id, order_date, visit_day, status, total, first_line, line_count, version = \
+            self.ORDER.unpack_from(self._map, self._orders_at + row * self.ORDER.size)
+        lines = []
+        for index in range(first_line, first_line + line_count):
+            ticket_type, quantity, unit_price = self.LINE.unpack_from(self._map, self._lines_at + index * self.LINE.size)
+            lines.append(OrderLine(_unfixed(ticket_type), quantity, unit_price))
+        order = Order.__new__(Order)
+        order._order_id = _unfixed(order_id)
+        order._user_id = _unfixed(user_id)
+        order._lines = lines
+        order._order_date = _decode_datetime(order_date)
+        order._visit_date = date.fromordinal(visit_day) if visit_day else None
+        order._status = Order.VALID_STATUSES[status]
+        order._total = total
+        order._version = version
+        return order
+
+    def payment(self, row: int) -> Payment:
+        payment_id, order_id, user_id, amount, method, status, payment_date, version = \
+            self.PAYMENT.unpack_from(self._map, self._payments_at + row * self.PAYMENT.size)
+        payment = Payment.__new__(Payment)
+        payment._payment_id = _unfixed(payment_id)
+        payment._order_id = _unfixed(order_id)
+        payment._user_id = _unfixed(user_id)
+        payment._amount = amount
+        payment._payment_method = _unfixed(method)
+        payment._status = Payment.PAYMENT_STATUSES[status]
+        payment._payment_date = None if payment_date == _NO_DATE else _decode_datetime(payment_date)
+        payment._version = version
+        return payment
+
+    def close(self):
+        self._map.close()
+
+
+class OrderArchive:
+    """
+    Read-only tier for closed orders and their payments.
+
+    Orders that are Confirmed or Cancelled and older than a season never
+    change again, so DataManager.archive_orders() moves them out of the live
+    store into segment files here. A segment holds fixed-width order, line
+    and payment rows sorted by ID, plus an offset index of order rows sorted
+    by user. It is memory-mapped, so a lookup is a binary search over the
+    mapping and builds only the records it returns; nothing is loaded when
+    the archive is opened. Segments are written once, beside their final
+    name, and never modified. Newer segments are searched first. Archived
+    orders and payments are read-only; OrderPaymentManager refuses to change
+    their status.
+
+    IDs, user IDs, ticket types and payment methods must fit their fixed
+    fields (24, 32, 32 and 16 bytes of UTF-8); orders that do not stay live.
+    """
+
+    MAGIC = b"APAR"
+    VERSION = 1
+    SEGMENT_PATTERN = "orders-{:04d}.seg"
+
+    def __init__(self, directory: str = "archive"):
+        self.directory = directory
+        self._segments: List[_ArchiveSegment] = None  # Newest first; opened on first use
+        self._lock = threading.Lock()
+
+    @property
+    def segments(self) -> List[_ArchiveSegment]:
+        if self._segments is None:
+            with self._lock:
+                if self._segments is None:
+                    self._segments = [_ArchiveSegment(path) for path in reversed(self._segment_paths())]
+        return self._segments
+
+    def _segment_paths(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith("orders-") and name.endswith(".seg"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    # Write orders and their payments as a new segment. Raises ValueError if
+    # a field does not fit the fixed-width rows.
+    def add(self, orders: List[Order], payments: List[Payment]):
+        if not orders:
+            return
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            paths = self._segment_paths()
+            number = int(os.path.basename(paths[-1])[7:11]) + 1 if paths else 1
+            path = os.path.join(self.directory, self.SEGMENT_PATTERN.format(number))
+            _ArchiveSegment.write(path, orders, payments)
+            if self._segments is not None:
+                self._segments.insert(0, _ArchiveSegment(path))
+
+    # Whether every field of a record fits the archive's rows
+    @staticmethod
+    def fits(order: Order, payments: List[Payment]) -> bool:
+        try:
+            _fixed(order.get_order_id(), 24)
+            _fixed(order.get_user_id(), 32)
+            for line in order.get_lines():
+                _fixed(line.ticket_type, 32)
+            for payment in payments:
+                _fixed(payment.get_payment_id(), 24)
+                _fixed(payment.get_user_id(), 32)
+                _fixed(payment.get_payment_method(), 16)
+        except ValueError:
+            return False
+        return True
+
+    def has_order(self, order_id: str) -> bool:
+        return any(segment.find_order(order_id) is not None for segment in self.segments)
+
+    def get_order(self, order_id: str) -> Order:
+        for segment in self.segments:
+            row = segment.find_order(order_id)
+            if row is not None:
+                return segment.order(row)
+        return None
+
+    def get_payment(self, payment_id: str) -> Payment:
+        for segment in self.segments:
+            row = segment.find_payment(payment_id)
+            if row is not None:
+                return segment.payment(row)
+        return None
+
+    # The user's archived orders, oldest first, optionally with one status
+    def user_orders(self, user_id: str, status: str = None) -> List[Order]:
+        orders = []
+        for segment in reversed(self.segments):
+            for row in segment.user_rows(user_id):
+                if status is None or segment.order_summary(row)[1] == status:
+                    orders.append(segment.order(row))
+        orders.sort(key=lambda order: order.get_order_date())
+        return orders
+
+    def order_ids(self) -> Iterator[str]:
+        for segment in self.segments:
+            for row in range(segment.order_count):
+                yield segment.order_id(row)
+
+    def payment_ids(self) -> Iterator[str]:
+        for segment in self.segments:
+            for row in range(segment.payment_count):
+                yield segment.payment_id(row)
+
+    def orders(self) -> Iterator[Order]:
+        for segment in self.segments:
+            for row in range(segment.order_count):
+                yield segment.order(row)
+
+    def payments(self) -> Iterator[Payment]:
+        for segment in self.segments:
+            for row in range(segment.payment_count):
+                yield segment.payment(row)
+
+    def __len__(self) -> int:
+        return sum(segment.order_count for segment in self.segments)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments or ():
+                segment.close()
+            self._segments = None
+
 
 class DataManager:
     USERS_FILE = "users.pkl"
     ORDERS_FILE = "orders.pkl"
     PAYMENTS_FILE = "payments.pkl"
     TICKETS_FILE = "tickets.pkl"
-
-    def __init__(self):
+    ARCHIVE_DIR = "archive"
+    ARCHIVE_AFTER_DAYS = 90  # Closed orders older than this move to the archive
+    ARCHIVE_STATUSES = ("Confirmed", "Cancelled")
+    # "immediate" writes every change before returning; "deferred" batches
+    # them through a PersistenceScheduler (pickle backend only)
+    DURABILITY_LEVELS = ("immediate", "deferred")
+
+    def __init__(self, journal: bool = False, backend=None, lazy: bool = False, durability: str = "immediate",
+                 flush_interval: float = 1.0, max_dirty: int = 500):
+        if durability not in self.DURABILITY_LEVELS:
+            raise ValueError(f"Durability must be one of {', '.join(self.DURABILITY_LEVELS)}.")
+        if durability == "deferred" and backend is not None:
+            raise ValueError("Deferred durability is only available with the default pickle backend.")
         self._users: Dict[str, User] = {}
         self._orders: Dict[str, Order] = {}
         self._payments: Dict[str, Payment] = {}
         self._tickets: Dict[str, Ticket] = {}
+        self.lazy = lazy  # Defer reading each file until its records are first used
+        self.load_timings: Dict[str, float] = {}  # Seconds spent loading each store
+        self.durability = durability
+        self.scheduler = PersistenceScheduler(flush_interval, max_dirty) if durability == "deferred" else None
+        self.backend = backend or PickleBackend(journal, self.scheduler)
+        self._user_store = self.backend.open_store("users", self.USERS_FILE)
+        self._order_store = self.backend.open_store("orders", self.ORDERS_FILE)
+        self._payment_store = self.backend.open_store("payments", self.PAYMENTS_FILE)
+        self._ticket_store = self.backend.open_store("tickets", self.TICKETS_FILE)
+        self.archive = OrderArchive(self.ARCHIVE_DIR)  # Segments are mapped on first lookup
 
     # Load users from the pickle file
     def load_users(self):
-        try:
-            with open(self.USERS_FILE, "rb") as f:  # Open in binary mode
-                self._users = pickle.load(f)
-        except (FileNotFoundError, EOFError):
-            self._users = {}  # Initialize to empty if file not found or empty
+        self._users = self._load_store(self._user_store, "users")  # Empty if file not found or empty
 
     # Save users to the pickle file
     def save_users(self):
-        with open(self.USERS_FILE, "wb") as f:  # Open in binary mode
-            pickle.dump(self._users, f)
+        self._user_store.save(self._users)
 
     # Load orders from the pickle file
     def load_orders(self):
-        try:
-            with open(self.ORDERS_FILE, "rb") as f:  # Open in binary mode
-                self._orders = pickle.load(f)
-        except (FileNotFoundError, EOFError):
-            self._orders = {}  # Initialize to empty if file not found or empty
+        self._orders = self._load_store(self._order_store, "orders")  # Empty if file not found or empty
 
     # Save orders to the pickle file
     def save_orders(self):
-        with open(self.ORDERS_FILE, "wb") as f:  # Open in binary mode
-            pickle.dump(self._orders, f)
+        self._order_store.save(self._orders)
 
     # Load payments from the pickle file
     def load_payments(self):
-        try:
-            with open(self.PAYMENTS_FILE, "rb") as f:  # Open in binary mode
-                self._payments = pickle.load(f)
-        except (FileNotFoundError, EOFError):
-            self._payments = {}  # Initialize to empty if file not found or empty
+        self._payments = self._load_store(self._payment_store, "payments")  # Empty if file not found or empty
 
     # Save payments to the pickle file
     def save_payments(self):
-        with open(self.PAYMENTS_FILE, "wb") as f:  # Open in binary mode
-            pickle.dump(self._payments, f)
+        self._payment_store.save(self._payments)
 
     # Load tickets from the pickle file
     def load_tickets(self):
-        try:
-            with open(self.TICKETS_FILE, "rb") as f:  # Open in binary mode
-                self._tickets = pickle.load(f)
-        except (FileNotFoundError, EOFError):
-            self._tickets = {}  # Initialize to empty if file not found or empty
+        self._tickets = self._load_store(self._ticket_store, "tickets")  # Empty if file not found or empty
 
     # Save tickets to the pickle file
     def save_tickets(self):
-        with open(self.TICKETS_FILE, "wb") as f:  # Open in binary mode
-            pickle.dump(self._tickets, f)
-
-class TicketBookingSystem:
-    def __init__(self):
-        self.data_manager = DataManager()  # Use DataManager for data handling
-        self.data_manager.load_users()  # Load users
-        self.data_manager.load_orders()  # Load orders
-        self.data_manager.load_payments()  # Load payments
-        self.data_manager.load_tickets()  # Load tickets
-
-        # Initialize orders as a list of Order objects
-        self.orders = list(self.data_manager._orders.values())  # Ensure this is a list of Order objects
+        self._ticket_store.save(self._tickets)
+
+    def _load_store(self, store, name: str):
+        def record_timing(seconds: float):
+            self.load_timings[name] = seconds
+        if self.lazy:
+            return store.load(lazy=True, on_load=record_timing)
+        started = time.perf_counter()
+        records = store.load()
+        record_timing(time.perf_counter() - started)
+        return records
+
+    # Persist a single new or changed record; in journal mode this appends
+    # one log entry instead of rewriting the whole file
+    def save_user(self, user: User):
+        self._user_store.put(self._users, user.get_user_id(), user)
 
-        # Check if tickets are loaded, if not load default tickets
-        if not self.data_manager._tickets:
-            self.tickets = self.load_default_tickets()
-            self.data_manager._tickets = self.tickets  # Save default tickets to DataManager
-            self.data_manager.save_tickets()  # Save tickets to the file
-        else:
-            self.tickets = self.data_manager._tickets  # Use loaded tickets
-
-        self.current_user = None  # Track the currently logged-in user
-        self.account_management = AccountManagement()  # Initialize AccountManagement
-
-    def load_default_tickets(self):
+    def delete_user(self, user_id: str):
+        self._user_store.delete(self._users, user_id)
+
+    def save_order(self, order: Order):
+        self._order_store.put(self._orders, order.get_order_id(), order)
+
+    def save_payment(self, payment: Payment):
+        self._payment_store.put(self._payments, payment.get_payment_id(), payment)
+
+    def save_ticket(self, ticket: Ticket):
+        self._ticket_store.put(self._tickets, ticket.get_ticket_type(), ticket)
+
+    def delete_ticket(self, ticket_type: str):
+        self._ticket_store.delete(self._tickets, ticket_type)
+
+    # Pick up orders saved by other processes; only stats the file if nothing changed
+    def refresh_orders(self):
+        self._order_store.refresh(self._orders)
+
+    # See PickleStore.subscribe; False if the backend cannot report changes
+    def subscribe_orders(self, listener: Callable[[str, Order], None]) -> bool:
+        return self._order_store.subscribe(listener)
+
+    # Pick up tickets saved by other processes; only stats the file if nothing changed
+    def refresh_tickets(self):
+        self._ticket_store.refresh(self._tickets)
+
+    # Fold every journal into a fresh snapshot
+    def compact(self):
+        self._user_store.compact(self._users)
+        self._order_store.compact(self._orders)
+        self._payment_store.compact(self._payments)
+        self._ticket_store.compact(self._tickets)
+
+    # Write out changes held back by deferred durability
+    def flush(self):
+        if self.scheduler is not None:
+            self.scheduler.flush()
+
+    # Check every store's snapshots without loading them; returns the problems found
+    def verify(self) -> List[str]:
+        problems = []
+        for store in (self._user_store, self._order_store, self._payment_store, self._ticket_store):
+            problems.extend(store.verify())
+        return problems
+
+    # Wait for background compactions to finish
+    def close(self):
+        for store in (self._user_store, self._order_store, self._payment_store, self._ticket_store):
+            store.close()
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self.archive.close()
+
+    # Move closed orders placed before `before` (default: ARCHIVE_AFTER_DAYS
+    # ago), with their payments, from the live stores into a new archive
+    # segment. The segment is written before anything is removed, so a crash
+    # in between leaves the orders in both places, and the live copy wins.
+    # Returns how many orders were archived.
+    def archive_orders(self, before: datetime = None, statuses: Tuple[str, ...] = ARCHIVE_STATUSES) -> int:
+        if before is None:
+            before = datetime.now() - timedelta(days=self.ARCHIVE_AFTER_DAYS)
+        with self.locked_orders(), self._payment_store.locked(self._payments):
+            payments_by_order: Dict[str, List[Payment]] = {}
+            for payment in self._payments.values():
+                payments_by_order.setdefault(payment.get_order_id(), []).append(payment)
+            closed, already_archived = [], []
+            for order in self._orders.values():
+                if order.get_status() not in statuses or order.get_order_date() >= before:
+                    continue
+                payments = payments_by_order.get(order.get_order_id(), [])
+                if self.archive.has_order(order.get_order_id()):
+                    already_archived.append(order)  # Left behind by an interrupted run
+                elif OrderArchive.fits(order, payments):
+                    closed.append(order)
+            self.archive.add(closed, [payment for order in closed
+                                      for payment in payments_by_order.get(order.get_order_id(), [])])
+            moved = closed + already_archived
+            self._order_store.delete_many(self._orders, [order.get_order_id() for order in moved])
+            self._payment_store.delete_many(self._payments, [payment.get_payment_id() for order in moved
+                                                             for payment in payments_by_order.get(order.get_order_id(), [])])
+        return len(closed)
+
+    # Hold the order store's locks, with orders refreshed from disk, so a
+    # check-then-update inside cannot interleave with another writer
+    def locked_orders(self):
+        return self._order_store.locked(self._orders)
+
+    # Paged and filtered lookups that the SQLite backend answers from its indexes
+    def get_order(self, order_id: str) -> Order:
+        order = self._orders.get(order_id)
+        return order if order is not None else self.archive.get_order(order_id)
+
+    def page_users(self, after: str = None, limit: int = 50) -> List[User]:
+        return self._user_store.page(self._users, after, limit)
+
+    def page_orders(self, after: str = None, limit: int = 50) -> List[Order]:
+        return self._order_store.page(self._orders, after, limit)
+
+    def find_orders(self, **filters) -> Iterator[Order]:
+        return self._order_store.find(self._orders, **filters)
+
+    def page_payments(self, after: str = None, limit: int = 50) -> List[Payment]:
+        return self._payment_store.page(self._payments, after, limit)
+
+    def find_payments(self, **filters) -> Iterator[Payment]:
+        return self._payment_store.find(self._payments, **filters)
+
+
+# Import the pickle files into an SQLite database for use with SQLiteBackend
+def migrate_pickles_to_sqlite(db_path: str = "aparksystem.db") -> Dict[str, int]:
+    source = DataManager()
+    source.load_users()
+    source.load_orders()
+    source.load_payments()
+    source.load_tickets()
+
+    target = DataManager(backend=SQLiteBackend(db_path))
+    with target.backend.transaction():
+        target._users = source._users
+        target.save_users()
+        target._orders = source._orders
+        target.save_orders()
+        target._payments = source._payments
+        target.save_payments()
+        target._tickets = source._tickets
+        target.save_tickets()
+    target.backend.close()
+    return {
+        "users": len(source._users),
+        "orders": len(source._orders),
+        "payments": len(source._payments),
+        "tickets": len(source._tickets),
+    }
+
+
+# Check the totals frozen on orders: each must match the sum of its line
+# prices, and the payments against an order (other than Failed ones) must add
+# up to its total. Returns the mismatches as readable strings; empty if none.
+def reconcile_order_totals(orders: dict, payments: dict) -> List[str]:
+    mismatches = []
+    paid: Dict[str, float] = {}
+    for payment in payments.values():
+        if payment.get_status() == "Failed":
+            continue
+        order_id = payment.get_order_id()
+        if order_id not in orders:
+            mismatches.append(f"payment {payment.get_payment_id()}: order {order_id} not found")
+            continue
+        paid[order_id] = paid.get(order_id, 0.0) + payment.get_amount()
+    for order_id, order in orders.items():
+        lines_total = order.calculate_total_price()
+        if round(order.get_total_price() - lines_total, 2):
+            mismatches.append(f"order {order_id}: stored total {order.get_total_price():.2f} vs lines {lines_total:.2f}")
+        if order_id in paid and round(paid[order_id] - order.get_total_price(), 2):
+            mismatches.append(f"order {order_id}: paid {paid[order_id]:.2f} vs total {order.get_total_price():.2f}")
+    return mismatches
+
+
+class TicketCatalog:
+    """
+    The park's ticket types, shared by the CLI, the GUI and the booking service.
+
+    Tickets are read through the data manager's ticket store on first use,
+    seeded with default_tickets() if the store is empty, and then served from
+    memory. The version goes up whenever a ticket is added, changed or removed
+    through the catalog, or when refresh() finds tickets edited in place or
+    saved by another process; refresh() only stats the file unless it changed.
+    Front-ends keep the version their views and price tables were built from
+    and rebuild only when it differs, or subscribe() to be called back.
+    """
+
+    def __init__(self, data_manager: "DataManager" = None):
+        if data_manager is None:
+            data_manager = DataManager(lazy=True)
+            data_manager.load_tickets()
+        self._data_manager = data_manager
+        self._tickets: Dict[str, Ticket] = None  # Read on first use
+        self._stamps: Dict[str, Tuple[int, int]] = {}  # Ticket type -> (id, version) as of self._version
+        self._version = 0
+        self._listeners: List[Callable[[int], None]] = []
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def default_tickets() -> Dict[str, Ticket]:
         return {
             "Single-Day Pass": Ticket(
                 "Single-Day Pass", 275, "1 day", "Access to the park for one day", "Valid only on selected date", 0.0
@@ -658,6 +3317,801 @@ class TicketBookingSystem:
             ),
         }
 
+    def get_version(self) -> int:
+        return self._version
+
+    # Ticket type -> Ticket; treat as read-only and change tickets through put/update/remove
+    def tickets(self) -> Dict[str, Ticket]:
+        if self._tickets is None:
+            with self._lock:
+                if self._tickets is None:
+                    data_manager = self._data_manager
+                    if not data_manager._tickets:
+                        data_manager._tickets = self.default_tickets()
+                        data_manager.save_tickets()
+                    self._tickets = _materialize(data_manager._tickets)
+                    self._stamps = self._stamp()
+        return self._tickets
+
+    def get(self, ticket_type: str) -> Ticket:
+        return self.tickets().get(ticket_type)
+
+    # The version and a copy of the tickets, taken together under the lock so
+    # a refresh on another thread cannot change them while they are read
+    def snapshot(self) -> Tuple[int, Dict[str, Ticket]]:
+        with self._lock:
+            return self._version, dict(self.tickets())
+
+    # Add a ticket type or replace one
+    def put(self, ticket: Ticket):
+        with self._lock:
+            self.tickets()
+            self._data_manager.save_ticket(ticket)
+            self._check()
+
+    # Change fields of a ticket type through its setters, e.g. update("Child Ticket", price=190)
+    def update(self, ticket_type: str, **fields) -> Ticket:
+        with self._lock:
+            ticket = self.get(ticket_type)
+            if ticket is None:
+                raise ValueError("Invalid ticket name.")
+            for name in fields:
+                if not hasattr(ticket, "set_" + name):
+                    raise ValueError(f"Tickets have no field {name}.")
+            for name, value in fields.items():
+                getattr(ticket, "set_" + name)(value)
+            self._data_manager.save_ticket(ticket)
+            self._check()
+            return ticket
+
+    def remove(self, ticket_type: str):
+        with self._lock:
+            if ticket_type not in self.tickets():
+                raise ValueError("Invalid ticket name.")
+            self._data_manager.delete_ticket(ticket_type)
+            self._check()
+
+    # Pick up tickets edited in place or saved by another process. Returns
+    # True if the catalog changed, in which case the version has gone up.
+    def refresh(self) -> bool:
+        with self._lock:
+            if self._tickets is None:
+                return False  # Will be read fresh when first used
+            self._data_manager.refresh_tickets()
+            return self._check()
+
+    # Call listener(version) after every change; it runs on the changing thread
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[int], None]):
+        self._listeners.remove(listener)
+
+    def _stamp(self) -> Dict[str, Tuple[int, int]]:
+        return {ticket_type: (id(ticket), ticket.get_version()) for ticket_type, ticket in self._tickets.items()}
+
+    # Bump the version if any ticket was added, replaced, edited or removed.
+    # Caller must hold _lock.
+    def _check(self) -> bool:
+        stamps = self._stamp()
+        if stamps == self._stamps:
+            return False
+        self._stamps = stamps
+        self._version += 1
+        for listener in list(self._listeners):
+            listener(self._version)
+        return True
+
+
+class OrderIndex:
+    """
+    Orders indexed by order ID, by user and by (user, status).
+
+    The index is updated as orders are added, change status or are removed, so
+    per-user views cost O(that user's orders) instead of a scan of every order.
+    It is safe to share between threads.
+    """
+
+    def __init__(self, orders=()):
+        self._by_id: Dict[str, Order] = {}
+        self._by_user: Dict[str, Dict[str, Order]] = {}
+        self._by_user_status: Dict[Tuple[str, str], Dict[str, Order]] = {}
+        self._indexed_status: Dict[str, str] = {}  # Status each order is filed under
+        self._lock = threading.RLock()
+        for order in orders:
+            self.add(order)
+
+    def add(self, order: Order):
+        with self._lock:
+            order_id = order.get_order_id()
+            if order_id in self._by_id:
+                self.remove(order_id)
+            user_id = order.get_user_id()
+            status = order.get_status()
+            self._by_id[order_id] = order
+            self._by_user.setdefault(user_id, {})[order_id] = order
+            self._by_user_status.setdefault((user_id, status), {})[order_id] = order
+            self._indexed_status[order_id] = status
+
+    def remove(self, order_id: str):
+        with self._lock:
+            order = self._by_id.pop(order_id, None)
+            if order is None:
+                return
+            user_id = order.get_user_id()
+            status = self._indexed_status.pop(order_id)
+            self._discard(self._by_user, user_id, order_id)
+            self._discard(self._by_user_status, (user_id, status), order_id)
+
+    # Set an order's status and move it to the matching (user, status) bucket
+    def update_status(self, order: Order, status: str):
+        with self._lock:
+            order.set_status(status)
+            order_id = order.get_order_id()
+            old_status = self._indexed_status.get(order_id)
+            if old_status is None or old_status == status:
+                return
+            user_id = order.get_user_id()
+            self._discard(self._by_user_status, (user_id, old_status), order_id)
+            self._by_user_status.setdefault((user_id, status), {})[order_id] = order
+            self._indexed_status[order_id] = status
+
+    def get(self, order_id: str) -> Order:
+        return self._by_id.get(order_id)
+
+    # A user's orders, oldest first, optionally only those with one status
+    def for_user(self, user_id: str, status: str = None) -> List[Order]:
+        with self._lock:
+            if status is None:
+                return list(self._by_user.get(user_id, {}).values())
+            return list(self._by_user_status.get((user_id, status), {}).values())
+
+    # The most recently added order, or None
+    def last(self) -> Order:
+        with self._lock:
+            return next(reversed(self._by_id.values()), None)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Order]:
+        with self._lock:
+            return iter(list(self._by_id.values()))
+
+    @staticmethod
+    def _discard(buckets: dict, key, order_id: str):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.pop(order_id, None)
+            if not bucket:
+                del buckets[key]
+
+
+class _Hold:
+    __slots__ = ("visit_date", "items", "expires_at", "confirmed")
+
+    def __init__(self, visit_date: date, items: List[Tuple[str, int]], expires_at: float):
+        self.visit_date = visit_date
+        self.items = items  # (ticket_type, quantity) pairs
+        self.expires_at = expires_at
+        self.confirmed = False
+
+
+class InventoryManager:
+    """
+    Ticket capacity per (ticket type, visit date).
+
+    Booking reserves stock for the order's lines as a hold. Paying confirms
+    the hold and cancelling releases it. A hold that is not confirmed within
+    hold_seconds expires and its stock goes back on sale; confirming the order
+    later has to reserve again and fails if the stock is gone by then.
+
+    Every check-and-update happens under one lock and costs O(1) per order
+    line (expiry is amortized through a heap), so concurrent bookings can
+    never oversell. Counts live in memory and are rebuilt from the stored
+    orders on start, so all bookings for the park should go through one
+    process (e.g. booking_service.py) for the limits to hold across clients.
+    """
+
+    DEFAULT_CAPACITIES = {"VIP Experience Pass": 50}  # Per visit date; other types are unlimited
+    HOLD_SECONDS = 900.0
+
+    def __init__(self, capacities: Dict[str, int] = None, hold_seconds: float = None):
+        self._capacities: Dict[str, int] = dict(self.DEFAULT_CAPACITIES if capacities is None else capacities)
+        self._date_capacities: Dict[Tuple[str, date], int] = {}  # Overrides for single days
+        self.hold_seconds = self.HOLD_SECONDS if hold_seconds is None else hold_seconds
+        self._held: Dict[Tuple[str, date], int] = {}
+        self._sold: Dict[Tuple[str, date], int] = {}
+        self._holds: Dict[str, _Hold] = {}  # By order ID
+        self._expiry: List[Tuple[float, str]] = []  # Heap of (expires_at, order ID)
+        self._lock = threading.Lock()
+
+    # Capacity for a ticket type on every day, or on one visit_date; None for unlimited
+    def set_capacity(self, ticket_type: str, capacity: int, visit_date: date = None):
+        if capacity is not None and capacity < 0:
+            raise ValueError("Capacity cannot be negative.")
+        with self._lock:
+            if visit_date is not None:
+                self._date_capacities[(ticket_type, visit_date)] = capacity
+            elif capacity is None:
+                self._capacities.pop(ticket_type, None)
+            else:
+                self._capacities[ticket_type] = capacity
+
+    def get_capacity(self, ticket_type: str, visit_date: date = None) -> int:
+        key = (ticket_type, visit_date)
+        if key in self._date_capacities:
+            return self._date_capacities[key]
+        return self._capacities.get(ticket_type)
+
+    # Tickets still on sale, or None if the type is unlimited
+    def available(self, ticket_type: str, visit_date: date = None) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._available((ticket_type, visit_date))
+
+    # Caller must hold _lock
+    def _available(self, key: Tuple[str, date]) -> int:
+        capacity = self.get_capacity(*key)
+        if capacity is None:
+            return None
+        return max(0, capacity - self._held.get(key, 0) - self._sold.get(key, 0))
+
+    def get_held(self, ticket_type: str, visit_date: date = None) -> int:
+        return self._held.get((ticket_type, visit_date), 0)
+
+    def get_sold(self, ticket_type: str, visit_date: date = None) -> int:
+        return self._sold.get((ticket_type, visit_date), 0)
+
+    # Hold stock for every line of order, or none of it. Raises ValueError if
+    # any ticket type does not have enough left on the visit date.
+    def reserve(self, order: Order):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._reserve(order, now)
+
+    # Caller must hold _lock
+    def _reserve(self, order: Order, now: float) -> _Hold:
+        order_id = order.get_order_id()
+        if order_id in self._holds:
+            return self._holds[order_id]
+        visit_date = order.get_visit_date()
+        items = [(line.ticket_type, line.quantity) for line in order.get_lines()]
+        needed: Dict[Tuple[str, date], int] = {}
+        for ticket_type, quantity in items:
+            needed[(ticket_type, visit_date)] = needed.get((ticket_type, visit_date), 0) + quantity
+        for key, quantity in needed.items():
+            left = self._available(key)
+            if left is not None and quantity > left:
+                when = f" on {visit_date}" if visit_date else ""
+                raise ValueError(f"Only {left} {key[0]} tickets left{when}.")
+        for key, quantity in needed.items():
+            self._held[key] = self._held.get(key, 0) + quantity
+        hold = _Hold(visit_date, items, now + self.hold_seconds)
+        self._holds[order_id] = hold
+        heapq.heappush(self._expiry, (hold.expires_at, order_id))
+        return hold
+
+    # Turn the order's hold into sold stock, reserving again if it expired.
+    # Raises ValueError if the stock has gone in the meantime.
+    def confirm(self, order: Order):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            hold = self._reserve(order, now)
+            if hold.confirmed:
+                return
+            for key in self._keys(hold):
+                self._move(key, hold, self._held, self._sold)
+            hold.confirmed = True
+
+    # Give the order's stock back, whether held or sold
+    def release(self, order: Order):
+        with self._lock:
+            hold = self._holds.pop(order.get_order_id(), None)
+            if hold is None:
+                return
+            counts = self._sold if hold.confirmed else self._held
+            for key in self._keys(hold):
+                self._move(key, hold, counts, None)
+
+    # Record an existing order's stock as its status says, without checking
+    # capacity; used to rebuild the counts from stored orders
+    def track(self, order: Order):
+        if order.get_status() == "Cancelled":
+            return
+        with self._lock:
+            hold = _Hold(order.get_visit_date(), [(line.ticket_type, line.quantity) for line in order.get_lines()],
+                         time.monotonic() + self.hold_seconds)
+            self._holds[order.get_order_id()] = hold
+            for key in self._keys(hold):
+                self._move(key, hold, None, self._held)
+            if order.get_status() == "Confirmed":
+                for key in self._keys(hold):
+                    self._move(key, hold, self._held, self._sold)
+                hold.confirmed = True
+            else:
+                heapq.heappush(self._expiry, (hold.expires_at, order.get_order_id()))
+
+    @staticmethod
+    def _keys(hold: _Hold):
+        return {(ticket_type, hold.visit_date) for ticket_type, _ in hold.items}
+
+    @staticmethod
+    def _move(key, hold: _Hold, source: dict, target: dict):
+        quantity = sum(q for ticket_type, q in hold.items if ticket_type == key[0])
+        if source is not None:
+            remaining = source.get(key, 0) - quantity
+            if remaining:
+                source[key] = remaining
+            else:
+                source.pop(key, None)
+        if target is not None:
+            target[key] = target.get(key, 0) + quantity
+
+    # Drop holds whose time is up. Caller must hold _lock.
+    def _expire(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, order_id = heapq.heappop(self._expiry)
+            hold = self._holds.get(order_id)
+            if hold is None or hold.confirmed or hold.expires_at != expires_at:
+                continue  # Already confirmed, released or re-reserved
+            del self._holds[order_id]
+            for key in self._keys(hold):
+                self._move(key, hold, self._held, None)
+
+
+class _PriceTable:
+    __slots__ = ("ticket", "version", "minimum", "tier_prices")
+
+    def __init__(self, ticket: Ticket, version: int, minimum: int, tier_prices: List[float]):
+        self.ticket = ticket
+        self.version = version  # Ticket.get_version() when the table was compiled
+        self.minimum = minimum  # Fewest tickets one line may hold
+        self.tier_prices = tier_prices  # Unit price by quantity; the last entry covers every larger quantity
+
+
+def _check_percent(percent: float):
+    if percent < 0 or percent > 100:
+        raise ValueError("Percent must be between 0 and 100.")
+
+
+class PricingEngine:
+    """
+    Unit prices by ticket type, quantity, visit date and promo code.
+
+    Rules are compiled into one price table per ticket type that holds the
+    unit price at every group-tier quantity, so a quote at checkout is a list
+    index plus two dict lookups. On top of the ticket's own discount:
+    - group tiers take a percent off once a line reaches a quantity, for one
+      ticket type or for all of them; the largest tier reached applies
+    - minimum quantities reject smaller lines (Group Ticket (10+) needs 10)
+    - peak pricing adds a percent on given dates or weekdays
+    - promo codes take a percent off, optionally for some ticket types only
+
+    Child and adult rates stay separate ticket types with their own discount.
+    A ticket's table is rebuilt only once one of its setters has run (its
+    version changes), and every table is dropped when a rule changes.
+    """
+
+    DEFAULT_MINIMUMS = {"Group Ticket (10+)": 10}
+
+    def __init__(self, minimums: Dict[str, int] = None):
+        self._minimums: Dict[str, int] = dict(self.DEFAULT_MINIMUMS if minimums is None else minimums)
+        self._group_tiers: Dict[str, Dict[int, float]] = {}  # Ticket type (None for all) -> {quantity: percent}
+        self._peak_dates: Dict[date, float] = {}  # Visit date -> price multiplier
+        self._peak_weekdays: Dict[int, float] = {}  # date.weekday() -> price multiplier
+        self._promos: Dict[str, Tuple[float, frozenset]] = {}  # Code -> (multiplier, ticket types; empty for all)
+        self._tables: Dict[str, _PriceTable] = {}
+        self._lock = threading.Lock()
+
+    # Rules
+    def add_group_tier(self, min_quantity: int, percent: float, ticket_type: str = None):
+        if min_quantity < 1:
+            raise ValueError("Quantity must be greater than zero.")
+        _check_percent(percent)
+        with self._lock:
+            self._group_tiers.setdefault(ticket_type, {})[min_quantity] = percent
+            self._tables.clear()
+
+    # Fewest tickets of ticket_type one order line may hold; None removes the limit
+    def set_minimum(self, ticket_type: str, quantity: int):
+        with self._lock:
+            if quantity is None:
+                self._minimums.pop(ticket_type, None)
+            else:
+                self._minimums[ticket_type] = quantity
+            self._tables.clear()
+
+    def get_minimum(self, ticket_type: str) -> int:
+        return self._minimums.get(ticket_type, 1)
+
+    # Surcharge for one visit date, overriding any weekday surcharge; 0 makes it off-peak
+    def add_peak_date(self, visit_date: date, percent: float):
+        _check_percent(percent)
+        self._peak_dates[visit_date] = 1 + percent / 100
+
+    # Surcharge for a weekday, 0 for Monday to 6 for Sunday
+    def add_peak_weekday(self, weekday: int, percent: float):
+        if weekday not in range(7):
+            raise ValueError("Weekday must be between 0 (Monday) and 6 (Sunday).")
+        _check_percent(percent)
+        self._peak_weekdays[weekday] = 1 + percent / 100
+
+    def add_promo_code(self, code: str, percent: float, ticket_types=()):
+        _check_percent(percent)
+        self._promos[code.strip().upper()] = (1 - percent / 100, frozenset(ticket_types))
+
+    def remove_promo_code(self, code: str):
+        self._promos.pop(code.strip().upper(), None)
+
+    # Quotes
+    # Price of one ticket in a line of quantity. Raises ValueError for a line
+    # under the ticket type's minimum or a promo code that does not apply.
+    def quote(self, ticket: Ticket, quantity: int, visit_date: date = None, promo_code: str = None) -> float:
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero.")
+        table = self._table(ticket)
+        if quantity < table.minimum:
+            raise ValueError(f"{ticket.get_ticket_type()} must be booked for at least {table.minimum} people.")
+        prices = table.tier_prices
+        price = prices[quantity] if quantity < len(prices) else prices[-1]
+        if visit_date is not None:
+            multiplier = self._peak_dates.get(visit_date)
+            if multiplier is None:
+                multiplier = self._peak_weekdays.get(visit_date.weekday(), 1.0)
+            price *= multiplier
+        if promo_code:
+            promo = self._promos.get(promo_code.strip().upper())
+            if promo is None or (promo[1] and ticket.get_ticket_type() not in promo[1]):
+                raise ValueError("Invalid promo code.")
+            price *= promo[0]
+        return round(price, 2)
+
+    def quote_line(self, ticket: Ticket, quantity: int, visit_date: date = None, promo_code: str = None) -> OrderLine:
+        return OrderLine(ticket.get_ticket_type(), quantity, self.quote(ticket, quantity, visit_date, promo_code))
+
+    def _table(self, ticket: Ticket) -> _PriceTable:
+        table = self._tables.get(ticket.get_ticket_type())
+        if table is None or table.ticket is not ticket or table.version != ticket.get_version():
+            table = self._compile(ticket)
+        return table
+
+    def _compile(self, ticket: Ticket) -> _PriceTable:
+        with self._lock:
+            version = ticket.get_version()  # Read first, so a concurrent setter forces another rebuild
+            ticket_type = ticket.get_ticket_type()
+            tiers = dict(self._group_tiers.get(None, {}))
+            for quantity, percent in self._group_tiers.get(ticket_type, {}).items():
+                tiers[quantity] = max(percent, tiers.get(quantity, 0.0))
+            base = ticket.calculate_discounted_price()
+            prices = []
+            percent = 0.0
+            for quantity in range(max(tiers, default=0) + 1):
+                percent = max(percent, tiers.get(quantity, 0.0))
+                prices.append(base * (1 - percent / 100))
+            table = _PriceTable(ticket, version, self._minimums.get(ticket_type, 1), prices)
+            self._tables[ticket_type] = table
+            return table
+
+
+class IdAllocator:
+    """
+    Issues increasing IDs such as ORD001 without a disk write per ID.
+
+    The highest reserved number is kept in a counter file. A process reserves
+    BLOCK_SIZE numbers at a time under a file lock and then hands them out from
+    memory, so concurrent booking processes never issue the same ID. Numbers
+    left in a block when a process exits are skipped, never reused.
+    """
+    BLOCK_SIZE = 100
+
+    def __init__(self, prefix: str, counter_file: str, block_size: int = None, width: int = 3,
+                 seed_from: Callable[[], Iterator[str]] = None):
+        self.prefix = prefix
+        self.counter_file = counter_file
+        self.block_size = block_size or self.BLOCK_SIZE
+        self.width = width  # Zero-padded digits, e.g. 3 for ORD001
+        self._seed_from = seed_from  # Existing IDs to start after when there is no counter file yet
+        self._next = 0
+        self._limit = 0  # One past the last number of the reserved block
+        self._lock = threading.Lock()
+
+    def next_id(self) -> str:
+        with self._lock:
+            if self._next >= self._limit:
+                self._reserve_block()
+            number = self._next
+            self._next += 1
+        return f"{self.prefix}{number:0{self.width}d}"
+
+    def _reserve_block(self):
+        with _FileLock(self.counter_file):
+            try:
+                with open(self.counter_file, "r") as f:
+                    reserved = int(f.read().strip() or 0)
+            except FileNotFoundError:
+                reserved = self._highest_existing()
+            # Durable before any number of the block is handed out
+            _write_atomically(self.counter_file, str(reserved + self.block_size).encode())
+        self._next = reserved + 1
+        self._limit = reserved + self.block_size + 1
+
+    def _highest_existing(self) -> int:
+        highest = 0
+        for existing_id in (self._seed_from() if self._seed_from else ()):
+            digits = existing_id[len(self.prefix):]
+            if existing_id.startswith(self.prefix) and digits.isdigit():
+                highest = max(highest, int(digits))
+        return highest
+
+
+class TicketBookingSystem:
+    ORDER_ID_FILE = "order_ids.counter"
+    PAYMENT_ID_FILE = "payment_ids.counter"
+
+    def __init__(self, journal: bool = False, backend=None, durability: str = "immediate"):
+        self.startup_timings: Dict[str, float] = {}  # Seconds spent in each startup stage
+        started = time.perf_counter()
+
+        # Users, orders and payments are only read from disk when first needed
+        self.data_manager = DataManager(journal, backend, lazy=True, durability=durability)  # Use DataManager for data handling
+        self.data_manager.load_users()  # Load users
+        self.data_manager.load_orders()  # Load orders
+        self.data_manager.load_payments()  # Load payments
+        self.data_manager.load_tickets()  # Load tickets
+        self.catalog = TicketCatalog(self.data_manager)  # Ticket types shared with the GUI and the service
+        # Shares the data manager's stores; its transactions write an order and its payment together
+        self.order_payment_manager = OrderPaymentManager(data_manager=self.data_manager)
+        self.order_payment_manager.load_orders()
+        self.order_payment_manager.load_payments()
+        self._order_index: OrderIndex = None  # Built from the data manager on first use
+        self._inventory: InventoryManager = None  # Built from the orders on first use
+        # Orders other processes save reach the index as the store picks them up
+        self._index_follows_store = self.data_manager.subscribe_orders(self._adopt_order)
+        self.pricing = PricingEngine()  # Group, peak and promo rules compiled into price tables
+        stage_started = self._record_startup_stage("data manager", started)
+
+        # Read the tickets, saving the default ones if there are none yet
+        self.catalog.tickets()
+        stage_started = self._record_startup_stage("tickets", stage_started)
+
+        self.session_token: str = None  # Session of the user logged in at this terminal
+        # Existing IDs are only scanned if the counter file does not exist yet
+        self.order_ids = IdAllocator("ORD", self.ORDER_ID_FILE, seed_from=lambda: itertools.chain(
+            self.data_manager._orders, self.data_manager.archive.order_ids()))
+        self.payment_ids = IdAllocator("PAY", self.PAYMENT_ID_FILE, seed_from=lambda: itertools.chain(
+            self.data_manager._payments, self.data_manager.archive.payment_ids()))
+        # Share the data manager's users rather than unpickling users.pkl again
+        self.account_management = AccountManagement(data_manager=self.data_manager)
+        self._record_startup_stage("account management", stage_started)
+        self.startup_timings["total"] = time.perf_counter() - started
+
+    # Ticket type -> Ticket, from the shared catalog
+    @property
+    def tickets(self) -> Dict[str, Ticket]:
+        return self.catalog.tickets()
+
+    # Orders indexed by ID, user and status, loaded on first access
+    @property
+    def order_index(self) -> OrderIndex:
+        if self._order_index is None:
+            self._order_index = OrderIndex(self.data_manager._orders.values())
+        return self._order_index
+
+    # All orders as a list of Order objects, oldest first
+    @property
+    def orders(self) -> List[Order]:
+        return list(self.order_index)
+
+    # Stock held by Pending orders and sold to Confirmed ones, per ticket type and visit date
+    @property
+    def inventory(self) -> InventoryManager:
+        if self._inventory is None:
+            inventory = InventoryManager()
+            for order in self.order_index:
+                inventory.track(order)
+            self._inventory = inventory
+        return self._inventory
+
+    # The user logged in at this terminal, or None once logged out or expired
+    @property
+    def current_user(self) -> User:
+        if self.session_token is None:
+            return None
+        try:
+            return self.session_user(self.session_token)
+        except ValueError:
+            self.session_token = None
+            return None
+
+    # Service operations. Each takes the token of a session from open_session
+    # rather than relying on who is logged in at the terminal, so one process
+    # can serve many clients at once. Failures raise ValueError.
+
+    def open_session(self, user_id: str, password: str) -> str:
+        return self.account_management.authenticate(user_id, password).token
+
+    def close_session(self, token: str):
+        self.account_management.sessions.end(token)
+
+    def session_user(self, token: str) -> User:
+        return self.account_management.sessions.get(token).get_user()
+
+    # Book tickets for visit_date (today if not given) at the pricing engine's
+    # quote; the stock is held until the order is paid or cancelled. Raises
+    # ValueError if it is sold out or the quantity or promo code is not valid.
+    def book(self, token: str, ticket_type: str, quantity: int, visit_date: date = None,
+             promo_code: str = None) -> Order:
+        user = self.session_user(token)
+        self.catalog.refresh()  # Price from tickets edited since; a stat when nothing changed
+        if ticket_type not in self.tickets:
+            raise ValueError("Invalid ticket name.")
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero.")
+        visit_date = visit_date or date.today()
+        if visit_date < date.today():
+            raise ValueError("Visit date cannot be in the past.")
+        lines = [self.pricing.quote_line(self.tickets[ticket_type], quantity, visit_date, promo_code)]
+        order = Order(self.order_ids.next_id(), user.get_user_id(), lines=lines, visit_date=visit_date)
+        self.inventory.reserve(order)
+        try:
+            self.data_manager.save_order(order)
+        except BaseException:
+            self.inventory.release(order)
+            raise
+        self.order_index.add(order)
+        return order
+
+    # Pay for a Pending order in full. The order's new status and the payment
+    # are written in one transaction, so neither is saved without the other.
+    # Raises ConcurrentModificationError if another client changed the order first.
+    def pay(self, token: str, order_id: str, payment_method: str = "Credit Card") -> Payment:
+        user = self.session_user(token)
+        order, staged = None, False
+        try:
+            # Holds both stores' locks, so two clients cannot both pay
+            with self.order_payment_manager.transaction() as manager:
+                order = self._own_pending_order(user, order_id, "pay for")
+                self.inventory.confirm(order)  # Fails if an expired hold's stock has been sold
+                self._change_status(order, "Confirmed")
+                staged = True
+                payment = Payment(self.payment_ids.next_id(), order_id, user.get_user_id(),
+                                  order.get_total_price(), payment_method)
+                payment.set_status("Completed")
+                manager._stage_payment(payment)
+        except BaseException:
+            if staged:
+                # The transaction put the order back to Pending; file and count it that way again
+                self.order_index.add(order)
+                self.inventory.release(order)
+                self.inventory.track(order)
+            raise
+        return payment
+
+    # Cancel a Pending order and put its tickets back on sale
+    def cancel(self, token: str, order_id: str) -> Order:
+        user = self.session_user(token)
+        with self.data_manager.locked_orders():
+            order = self._own_pending_order(user, order_id, "cancel")
+            self._change_status(order, "Cancelled")
+            self.inventory.release(order)
+        return order
+
+    # The order from the index or, if another process booked it, from the store
+    def _find_order(self, order_id: str) -> Order:
+        order = self.order_index.get(order_id)
+        if order is None:
+            with self.data_manager.locked_orders():  # Refreshed, which may already index it
+                order = self.order_index.get(order_id)
+                if order is None:
+                    order = self.data_manager._orders.get(order_id)
+                    if order is not None:
+                        self._adopt_order(order_id, order)
+        return order
+
+    # Bring the index and the inventory in line with an order read from the
+    # store, or with its removal if order is None
+    def _adopt_order(self, order_id: str, order: Order):
+        if self._order_index is None:
+            return  # Will be built from the refreshed orders on first use
+        old = self._order_index.get(order_id)
+        if self._inventory is not None and old is not None:
+            self._inventory.release(old)
+        if order is None:
+            self._order_index.remove(order_id)
+            return
+        self._order_index.add(order)
+        if self._inventory is not None:
+            self._inventory.track(order)
+
+    def _own_pending_order(self, user: User, order_id: str, action: str) -> Order:
+        order = self._find_order(order_id)
+        if order is None or order.get_user_id() != user.get_user_id():
+            raise NotFoundError("Order not found.")
+        if order.get_status() != "Pending":
+            raise ValueError(f"You can only {action} orders with a status of 'Pending'.")
+        return order
+
+    # _set_order_status, bringing the inventory in line with the stored order
+    # if another client got there first
+    def _change_status(self, order: Order, status: str):
+        try:
+            self._set_order_status(order, status)
+        except ConcurrentModificationError:
+            self.inventory.release(order)
+            self.inventory.track(self.order_index.get(order.get_order_id()))
+            raise
+
+    # Pass include_archived to also read the user's orders from the archive,
+    # oldest first, ahead of the live ones
+    def user_orders(self, token: str, status: str = None, include_archived: bool = False) -> List[Order]:
+        user_id = self.session_user(token).get_user_id()
+        index = self.order_index
+        if self._index_follows_store:
+            self.data_manager.refresh_orders()  # Only stats the file unless another process saved
+        else:
+            for order in self.data_manager.find_orders(user_id=user_id):
+                indexed = index.get(order.get_order_id())
+                if indexed is None or order.get_version() > indexed.get_version():
+                    self._adopt_order(order.get_order_id(), order)
+        orders = index.for_user(user_id, status)
+        if include_archived:
+            orders = self.data_manager.archive.user_orders(user_id, status) + orders
+        return orders
+
+    def create_account(self, user_id: str, name: str, email: str, user_type: str, password: str) -> User:
+        if self.account_management.has_user(user_id):
+            raise ValueError("User ID already exists.")
+        self.account_management.create_user(user_id, name, email, user_type, password)
+        return self.account_management.get_user(user_id)
+
+    def update_account(self, token: str, **updates) -> User:
+        session = self.account_management.sessions.get(token)
+        self.account_management.update_user(session.get_user().get_user_id(), session, **updates)
+        return session.get_user()
+
+    def delete_account(self, token: str, user_id: str):
+        session = self.account_management.sessions.get(token)
+        if session.get_user().get_user_type() != "Admin":
+            raise ValueError("Only admins can delete users.")
+        if not self.account_management.has_user(user_id):
+            raise NotFoundError("User not found.")
+        self.account_management.delete_user(user_id, session)
+
+    # Change an order's status, keeping the index and the stored copy in step.
+    # Raises ConcurrentModificationError if another client changed it first.
+    def _set_order_status(self, order: Order, status: str):
+        version = order.get_version()
+        with self.data_manager.locked_orders():
+            stored = self.data_manager.get_order(order.get_order_id())
+            if stored is not None and stored.get_version() != version:
+                self.order_index.add(stored)  # Show the other client's change from now on
+                raise ConcurrentModificationError(f"Order ID {order.get_order_id()} was changed by someone else.")
+            manager = self.order_payment_manager
+            manager._remember_state(order)  # Undone if an enclosing transaction fails
+            self.order_index.update_status(order, status)
+            manager._stage_order(order)  # Buffered inside a transaction, otherwise saved now
+
+    def _record_startup_stage(self, stage: str, started: float) -> float:
+        now = time.perf_counter()
+        self.startup_timings[stage] = now - started
+        return now
+
+    def startup_report(self) -> str:
+        lines = ["--- Startup Report ---"]
+        for stage, seconds in self.startup_timings.items():
+            lines.append(f"{stage}: {seconds * 1000:.1f} ms")
+        for name in ("users", "orders", "payments", "tickets"):
+            seconds = self.data_manager.load_timings.get(name)
+            status = "not loaded yet" if seconds is None else f"{seconds * 1000:.1f} ms"
+            lines.append(f"load {name}: {status}")
+        return "\n".join(lines)
+
+    def load_default_tickets(self):
+        return TicketCatalog.default_tickets()
+
     def main_menu(self):
         while True:
             print("\n--- Main Menu ---")
@@ -700,7 +4154,8 @@ class TicketBookingSystem:
             print("1. View Orders")
             print("2. Pay for Order")
             print("3. View Order History")
-            print("4. Back to Main Menu")
+            print("4. Cancel Order")
+            print("5. Back to Main Menu")
             choice = input("Choose an option: ")
 
             if choice == '1':
@@ -710,12 +4165,15 @@ class TicketBookingSystem:
             elif choice == '3':
                 self.view_order_history()
             elif choice == '4':
+                self.cancel_order()
+            elif choice == '5':
                 break  # Go back to the main menu
             else:
                 print("Invalid option. Please try again.")
 
     def view_tickets(self):
         print("\n--- Available Tickets ---")
+        self.catalog.refresh()
         for ticket_name, ticket in self.tickets.items():
             print(
                 f"{ticket_name}: ${ticket.get_price():.2f} - {ticket.get_description()} "
@@ -742,25 +4200,32 @@ class TicketBookingSystem:
             print(f"Error: {e}")
             return
 
-        ticket = self.tickets[ticket_name]
-        discounted_price = ticket.calculate_discounted_price()
-        total_price = discounted_price * quantity
-        print(f"Total price: ${total_price:.2f}")
+        try:
+            answer = input("Enter the visit date (YYYY-MM-DD, blank for today): ").strip()
+            visit_date = datetime.strptime(answer, "%Y-%m-%d").date() if answer else date.today()
+        except ValueError:
+            print("Error: Please enter the date as YYYY-MM-DD.")
+            return
+        left = self.inventory.available(ticket_name, visit_date)
+        if left is not None:
+            print(f"{left} {ticket_name} tickets left on {visit_date}.")
+
+        promo_code = input("Enter a promo code (leave blank to skip): ").strip() or None
+        try:
+            unit_price = self.pricing.quote(self.tickets[ticket_name], quantity, visit_date, promo_code)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print(f"Total price: ${unit_price * quantity:.2f}")
 
         confirmation = input("Confirm booking? (y/n): ").strip().lower()
         if confirmation == 'y':
-            # Generate a unique order ID with 'ORD' prefix
-            if self.orders:
-                # Extract the numeric part of the last order ID
-                last_order_id = self.orders[-1].get_order_id()  # Get the last order ID
-                numeric_part = int(last_order_id[3:])  # Extract numeric part after 'ORD'
-                order_id = f"ORD{numeric_part + 1:03d}"  # Increment and format with leading zeros
-            else:
-                order_id = "ORD001"  # Start with the first order ID
-
-            order = Order(order_id, self.current_user.get_user_id(), [ticket] * quantity)
-            self.orders.append(order)  # Append the new order to the orders list
-            print(f"Booking successful! Order ID: {order_id}")
+            try:
+                order = self.book(self.session_token, ticket_name, quantity, visit_date, promo_code)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            print(f"Booking successful! Order ID: {order.get_order_id()}")
         else:
             print("Booking canceled.")
 
@@ -770,18 +4235,22 @@ class TicketBookingSystem:
             return
         
         print("\n--- View Orders ---")
-        user_orders = [order for order in self.orders if order.get_user_id() == self.current_user.get_user_id()]
+        user_orders = self.user_orders(self.session_token)
         if not user_orders:
             print("No orders found.")
             return
 
         for order in user_orders:
-            print(f"Order ID: {order.get_order_id()}, Tickets: {len(order.get_tickets())}, "
+            print(f"Order ID: {order.get_order_id()}, Tickets: {order.get_ticket_count()}, "
                   f"Date: {order.get_order_date()}, Status: {order.get_status()}")
 
     def manage_accounts(self):
         print("\n--- Account Management ---")
-        if self.account_management.get_active_user().get_user_type() != "Admin":
+        user = self.current_user
+        if user is None:
+            print("Your session has expired. Please log in again.")
+            return
+        if user.get_user_type() != "Admin":
             self.account_management.display_all_users()#
         
         print("1. Create User")
@@ -799,38 +4268,44 @@ class TicketBookingSystem:
             password = input("Enter Password: ")
             self.account_management.create_user(user_id, name, email, user_type, password)
         elif choice == '2':
-            if not self.account_management.get_active_user():
+            if not self.current_user:
                 print("You must be logged in to delete a user.")
                 return
             user_id = input("Enter User ID to delete: ")
-            self.account_management.delete_user(user_id)  # This will now check for admin
+            try:
+                self.delete_account(self.session_token, user_id)  # This will now check for admin
+            except ValueError as e:
+                print(f"Error: {e}")
         elif choice == '3':
-            if not self.account_management.get_active_user():
+            if not self.current_user:
                 print("You must be logged in to update your account.")
                 return
-            user_id = self.account_management.get_active_user().get_user_id()  # Get the current user's ID
             updates = {}
             updates['name'] = input("Enter new name (leave blank to skip): ").strip() or None
             updates['email'] = input("Enter new email (leave blank to skip): ").strip() or None
             updates['password'] = input("Enter new password (leave blank to skip): ").strip() or None
             updates = {k: v for k, v in updates.items() if v}
-            self.account_management.update_user(user_id, **updates)  # Update own account
+            try:
+                self.update_account(self.session_token, **updates)  # Update own account
+            except ValueError as e:
+                print(f"Error: {e}")
 
     def login(self):
         print("\n--- Login ---")
         user_id = input("Enter User ID: ")
         password = input("Enter Password: ")
-        success = self.account_management.login(user_id, password)  # Call the login method
-        if success:
-            self.current_user = self.account_management.get_user(user_id)  # Get the user object
+        try:
+            self.session_token = self.open_session(user_id, password)
             print(f"Login successful. Welcome, {self.current_user.get_name()}.")
-        else:
+        except ValueError as e:
+            print(e)
             print("Login failed. Please try again.")
 
     def logout(self):
         if self.current_user:
             print(f"Goodbye, {self.current_user.get_name()}.")
-            self.current_user = None
+            self.close_session(self.session_token)
+            self.session_token = None
         else:
             print("No user is logged in.")
 
@@ -840,20 +4315,20 @@ class TicketBookingSystem:
             return
 
         print("\n--- Pay for Order ---")
-        user_orders = [order for order in self.orders if order.get_user_id() == self.current_user.get_user_id()]
+        user_orders = self.user_orders(self.session_token)
 
         if not user_orders:
             print("No orders found for your account.")
             return
 
         for order in user_orders:
-            total_price = sum(ticket.get_price() for ticket in order.get_tickets())  # Calculate total price
-            print(f"Order ID: {order.get_order_id()}, Status: {order.get_status()}, Total Price: ${total_price:.2f}")
+            print(f"Order ID: {order.get_order_id()}, Status: {order.get_status()}, "
+                  f"Total Price: ${order.get_total_price():.2f}")
 
         order_id = input("Enter the Order ID you want to pay for: ")
-        order = next((o for o in user_orders if o.get_order_id() == order_id), None)
+        order = self._find_order(order_id)
 
-        if order is None:
+        if order is None or order.get_user_id() != self.current_user.get_user_id():
             print("Order not found.")
             return
 
@@ -861,27 +4336,60 @@ class TicketBookingSystem:
             print("You can only pay for orders with a status of 'Pending'.")
             return
 
-        # Calculate total price for the selected order
-        total_price = sum(ticket.get_price() for ticket in order.get_tickets())
-        print(f"Total amount due for Order ID {order_id}: ${total_price:.2f}")
+        print(f"Total amount due for Order ID {order_id}: ${order.get_total_price():.2f}")
+
+        payment_method = input("Enter payment method (Credit Card/PayPal/M-PESA): ").strip() or "Credit Card"
 
         # Simulate payment processing
         confirmation = input("Confirm payment? (y/n): ").strip().lower()
         if confirmation == 'y':
             print(f"Current status before payment: {order.get_status()}")  # Debugging line
-            order.set_status("Confirmed")  # Update order status to confirmed
+            try:
+                self.pay(self.session_token, order_id, payment_method)  # Confirms the order and records the payment
+            except ConcurrentModificationError as e:
+                print(f"{e} Please try again.")
+                return
+            except ValueError as e:
+                print(e)
+                return
             print(f"New status after payment: {order.get_status()}")  # Debugging line
             print(f"Payment successful! Order ID: {order_id} is now confirmed.")
         else:
             print("Payment canceled.")
 
+    def cancel_order(self):
+        if not self.current_user:
+            print("You must be logged in to cancel an order.")
+            return
+
+        print("\n--- Cancel Order ---")
+        pending_orders = self.user_orders(self.session_token, "Pending")
+        if not pending_orders:
+            print("No pending orders to cancel.")
+            return
+
+        for order in pending_orders:
+            print(f"Order ID: {order.get_order_id()}, Visit Date: {order.get_visit_date()}, "
+                  f"Tickets: {order.get_ticket_count()}")
+
+        order_id = input("Enter the Order ID you want to cancel: ")
+        if input("Confirm cancellation? (y/n): ").strip().lower() != 'y':
+            print("Cancellation aborted.")
+            return
+        try:
+            self.cancel(self.session_token, order_id)
+        except ValueError as e:
+            print(e)
+            return
+        print(f"Order {order_id} cancelled.")
+
     def view_user_orders(self):
         if not self.current_user:
             print("You must be logged in to view your orders.")
             return
 
         print("\n--- Your Orders ---")
-        user_orders = [order for order in self.orders if order.get_user_id() == self.current_user.get_user_id()]
+        user_orders = self.user_orders(self.session_token)
 
         if not user_orders:
             print("No orders found for your account.")
@@ -896,28 +4404,58 @@ class TicketBookingSystem:
             return
 
         print("\n--- Order History ---")
-        confirmed_orders = [order for order in self.orders if order.get_status() == "Confirmed" and order.get_user_id() == self.current_user.get_user_id()]
+        confirmed_orders = self.user_orders(self.session_token, "Confirmed", include_archived=True)
 
         if not confirmed_orders:
             print("No confirmed orders found.")
             return
 
         for order in confirmed_orders:
-            print(f"Order ID: {order.get_order_id()}, Status: {order.get_status()}, Tickets: {len(order.get_tickets())}, Date: {order.get_order_date()}")
+            print(f"Order ID: {order.get_order_id()}, Status: {order.get_status()}, Tickets: {order.get_ticket_count()}, Date: {order.get_order_date()}")
 
     def run(self):
         try:
             while True:
                 self.main_menu()
         finally:
-            self.data_manager.save_users()  # Save users on exit
-            self.data_manager.save_orders()  # Save orders on exit
-            self.data_manager.save_payments()  # Save payments on exit
+            # Every change was saved as it was made; only deferred ones are left
+            self.data_manager.flush()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-sqlite":
+        # python aparksystem.py migrate-sqlite [db_path]
+        counts = migrate_pickles_to_sqlite(*sys.argv[2:3])
+        print(", ".join(f"{count} {name}" for name, count in counts.items()) + " migrated.")
+        sys.exit()
+    if len(sys.argv) > 1 and sys.argv[1] == "reconcile":
+        # python aparksystem.py reconcile
+        manager = OrderPaymentManager()
+        manager.load_orders()
+        manager.load_payments()
+        mismatches = manager.reconcile_totals()
+        print("\n".join(mismatches) or "All order totals reconcile.")
+        sys.exit(1 if mismatches else 0)
+    if len(sys.argv) > 1 and sys.argv[1] == "verify":
+        # python aparksystem.py verify
+        problems = DataManager().verify()
+        print("\n".join(problems) or "All snapshots pass their checksums.")
+        sys.exit(1 if problems else 0)
+    if len(sys.argv) > 1 and sys.argv[1] == "archive":
+        # python aparksystem.py archive [days]
+        manager = DataManager()
+        manager.load_orders()
+        manager.load_payments()
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else DataManager.ARCHIVE_AFTER_DAYS
+        count = manager.archive_orders(before=datetime.now() - timedelta(days=days))
+        manager.close()
+        print(f"{count} orders archived; {len(manager.archive)} in the archive.")
+        sys.exit()
+
     # Initialize the ticket booking system
     booking_system = TicketBookingSystem()
+    if "--startup-report" in sys.argv:
+        print(booking_system.startup_report())
     
     # Run the system
     booking_system.run()
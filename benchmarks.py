@@ -0,0 +1,545 @@
+# Micro-benchmarks for aparksystem. Run one with: python benchmarks.py <name> [args]
+import contextlib
+import io
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from aparksystem import (
+    AccountManagement, CredentialStore, DataManager, IdAllocator, InventoryManager, Order, OrderArchive, OrderColumns, OrderLine, OrderPaymentManager, Payment, PaymentColumns, PricingEngine, RecordCodec, Ticket,
+)
+
+
+# Payment and Order with the same fields as the real ones but without
+# __slots__, as they were stored before, for comparison
+class LegacyPayment:
+    def __init__(self, payment_id, order_id, user_id, amount, payment_method):
+        self._payment_id = payment_id
+        self._order_id = order_id
+        self._user_id = user_id
+        self._amount = amount
+        self._payment_method = payment_method
+        self._status = "Pending"
+        self._version = 0
+        self._payment_date = datetime.now()
+
+
+class LegacyOrder:
+    def __init__(self, order_id, user_id, lines, visit_date=None):
+        self._order_id = order_id
+        self._user_id = user_id
+        self._lines = list(lines)
+        self._order_date = datetime.now()
+        self._status = "Pending"
+        self._version = 0
+        self._visit_date = visit_date
+        self._total = sum(line.get_total_price() for line in self._lines)
+
+
+def _measure(build) -> int:
+    # Bytes allocated by build() that are still alive when it returns
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def bench_memory(count: int = 100_000, seats: int = 4):
+    """Compare the per-record footprint of the old and new payment and order models."""
+    ticket = Ticket("Single-Day Pass", 275.0, "1 day", "Access to the park for one day", "Valid only on selected date")
+    line = OrderLine.for_ticket(ticket, seats)
+    # IDs are built outside the measured section so every variant pays the same for them
+    ids = [(f"PAY{i:07d}", f"ORD{i:07d}", f"cust{i % 1000:04d}") for i in range(count)]
+
+    results = {
+        "legacy payments": _measure(lambda: [LegacyPayment(p, o, u, 275.0, "M-PESA") for p, o, u in ids]),
+        "slotted payments": _measure(lambda: [Payment(p, o, u, 275.0, "M-PESA") for p, o, u in ids]),
+        "payment columns": _measure(lambda: PaymentColumns(Payment(p, o, u, 275.0, "M-PESA") for p, o, u in ids)),
+        "legacy orders": _measure(lambda: [LegacyOrder(o, u, [line]) for _, o, u in ids]),
+        "slotted orders": _measure(lambda: [Order(o, u, lines=[line]) for _, o, u in ids]),
+        "order columns": _measure(lambda: OrderColumns(Order(o, u, lines=[line]) for _, o, u in ids)),
+    }
+    print(f"--- Memory per record ({count} records, {seats} seats per order) ---")
+    for name, total in results.items():
+        print(f"{name:<18} {total / count:8.1f} bytes")
+    return results
+
+
+def _book_and_pay(manager: OrderPaymentManager, bookings: int, client: str):
+    # One booking client: create an order, pay for it, then confirm it
+    order_ids = IdAllocator("ORD", "order_ids.counter")
+    payment_ids = IdAllocator("PAY", "payment_ids.counter")
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    for _ in range(bookings):
+        order_id = order_ids.next_id()
+        manager.create_order(order_id, client, lines=[line])
+        version = manager.get_order(order_id).get_version()
+        manager.create_payment(payment_ids.next_id(), order_id, client, 550.0, "M-PESA")
+        manager.update_order_status(order_id, "Confirmed", expected_version=version)
+
+
+def _booking_process(directory: str, bookings: int, client: str, journal: bool):
+    os.chdir(directory)
+    manager = OrderPaymentManager(journal)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.load_orders()
+        manager.load_payments()
+        _book_and_pay(manager, bookings, client)
+
+
+def bench_concurrent_booking(workers: int = 8, bookings: int = 200, use_processes: int = 0, journal: int = 1):
+    """N threads (or processes) book and pay at once; check no update is lost and report throughput."""
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(directory)
+        try:
+            started = time.perf_counter()
+            if use_processes:
+                context = multiprocessing.get_context("spawn")
+                clients = [context.Process(target=_booking_process, args=(directory, bookings, f"client{i}", bool(journal)))
+                           for i in range(workers)]
+            else:
+                manager = OrderPaymentManager(bool(journal))
+                manager.load_orders()
+                manager.load_payments()
+                clients = [threading.Thread(target=_book_and_pay, args=(manager, bookings, f"client{i}"))
+                           for i in range(workers)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - started
+
+            check = OrderPaymentManager()
+            check.load_orders()
+            check.load_payments()
+            expected = workers * bookings
+            confirmed = sum(1 for order in check._orders.values() if order.get_status() == "Confirmed")
+        finally:
+            os.chdir(previous_dir)
+
+    kind = "processes" if use_processes else "threads"
+    mode = "journal" if journal else "snapshot"
+    print(f"--- Concurrent booking ({workers} {kind}, {bookings} bookings each, {mode} mode) ---")
+    print(f"orders: {len(check._orders)}/{expected}, confirmed: {confirmed}, payments: {len(check._payments)}/{expected}")
+    print(f"lost updates: {2 * expected - confirmed - len(check._payments)}")
+    print(f"throughput: {expected / elapsed:.0f} bookings/s")
+
+
+def bench_bulk_booking(count: int = 2000, journal: int = 0):
+    """Import the same orders and payments one call at a time and as one batch."""
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    orders = [(f"ORD{i:06d}", f"cust{i % 100:02d}", [line]) for i in range(count)]
+    payments = [(f"PAY{i:06d}", f"ORD{i:06d}", f"cust{i % 100:02d}", 550.0, "M-PESA") for i in range(count)]
+    timings = {}
+    previous_dir = os.getcwd()
+    for name in ("one at a time", "batched"):
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(directory)
+            try:
+                manager = OrderPaymentManager(bool(journal))
+                manager.load_orders()
+                manager.load_payments()
+                started = time.perf_counter()
+                if name == "batched":
+                    manager.create_orders(orders)
+                    manager.create_payments(payments)
+                else:
+                    for order_id, user_id, lines in orders:
+                        manager.create_order(order_id, user_id, lines=lines)
+                    for payment in payments:
+                        manager.create_payment(*payment)
+                timings[name] = time.perf_counter() - started
+            finally:
+                os.chdir(previous_dir)
+
+    mode = "journal" if journal else "snapshot"
+    print(f"--- Bulk booking ({count} orders and payments, {mode} mode) ---")
+    for name, elapsed in timings.items():
+        print(f"{name:<14} {elapsed:8.3f} s  {count / elapsed:10.0f} orders/s")
+    return timings
+
+
+def bench_write_coalescing(count: int = 2000, journal: int = 0):
+    """Status updates in a burst: written one at a time against batched by the persistence scheduler."""
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    timings = {}
+    previous_dir = os.getcwd()
+    mode = "journal" if journal else "snapshot"
+    print(f"--- Write coalescing ({count} status updates, {mode} mode) ---")
+    for durability in DataManager.DURABILITY_LEVELS:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                manager = DataManager(bool(journal), durability=durability)
+                manager.load_orders()
+                orders = [Order(f"ORD{i:06d}", f"cust{i % 100:02d}", lines=[line]) for i in range(count)]
+                manager._order_store.put_many(manager._orders, {order.get_order_id(): order for order in orders})
+                manager.flush()
+                started = time.perf_counter()
+                for order in orders:
+                    order.set_status("Confirmed")
+                    manager.save_order(order)
+                manager.flush()
+                timings[durability] = time.perf_counter() - started
+                flushes = manager.scheduler.flushes - 1 if manager.scheduler else count
+                manager.close()
+                reloaded = DataManager(bool(journal))
+                reloaded.load_orders()
+                assert all(order.get_status() == "Confirmed" for order in reloaded._orders.values())
+            finally:
+                os.chdir(previous_dir)
+        print(f"{durability:<10} {timings[durability]:8.3f} s  {count / timings[durability]:10.0f} updates/s  "
+              f"{flushes} writes")
+    return timings
+
+
+def bench_revenue_polling(count: int = 100_000, polls: int = 1000):
+    """Time revenue reads: a full pass over every payment against the running aggregates."""
+    manager = OrderPaymentManager()
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    for i in range(count):
+        order = Order(f"ORD{i:07d}", f"cust{i % 1000:04d}", lines=[line])
+        manager._orders[order.get_order_id()] = order
+        payment = Payment(f"PAY{i:07d}", order.get_order_id(), order.get_user_id(), 550.0, "M-PESA")
+        manager._payments[payment.get_payment_id()] = payment
+
+    started = time.perf_counter()
+    for _ in range(polls):
+        full_pass = sum(payment.get_amount() for payment in manager._payments.values())
+    full_pass_elapsed = (time.perf_counter() - started) / polls
+    started = time.perf_counter()
+    manager.aggregates  # Built once, then kept up to date
+    build_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(polls):
+        running = manager.calculate_total_revenue()
+    running_elapsed = (time.perf_counter() - started) / polls
+
+    assert round(full_pass - running, 2) == 0
+    print(f"--- Revenue polling ({count} payments, {polls} polls) ---")
+    print(f"full pass per poll   {full_pass_elapsed * 1e6:12.1f} us")
+    print(f"aggregates per poll  {running_elapsed * 1e6:12.3f} us (one-off build {build_elapsed:.3f} s)")
+
+
+def _naive_report(orders, payments, tickets) -> dict:
+    # The same figures as ReportingEngine.summary(), one object at a time
+    by_method, by_type, by_day, discount_cost = {}, {}, {}, {}
+    baskets = []
+    for payment in payments.values():
+        if payment.get_status() == "Failed":
+            continue
+        amount = payment.get_amount()
+        by_method[payment.get_payment_method()] = by_method.get(payment.get_payment_method(), 0.0) + amount
+        order = orders.get(payment.get_order_id())
+        day = (payment.get_payment_date() or order.get_order_date()).date()
+        by_day[day] = by_day.get(day, 0.0) + amount
+        order_total = sum(line.get_total_price() for line in order.get_lines())
+        for line in order.get_lines():
+            share = amount * line.get_total_price() / order_total
+            by_type[line.ticket_type] = by_type.get(line.ticket_type, 0.0) + share
+    for order in orders.values():
+        if order.get_status() == "Cancelled":
+            continue
+        baskets.append(order.get_ticket_count())
+        for line in order.get_lines():
+            discount = tickets[line.ticket_type].get_discount()
+            cost = line.get_total_price() * discount / (100 - discount)
+            discount_cost[line.ticket_type] = discount_cost.get(line.ticket_type, 0.0) + cost
+    baskets.sort()
+    return {
+        "revenue_by_method": by_method,
+        "revenue_by_ticket_type": by_type,
+        "revenue_by_day": by_day,
+        "discount_cost": discount_cost,
+        "average_basket_size": sum(baskets) / len(baskets),
+        "median_basket_size": baskets[len(baskets) // 2],
+    }
+
+
+def bench_reporting(count: int = 200_000, scale: int = 10_000_000):
+    """Time reports over count orders: a per-object loop against reporting.py, then reporting.py on scale rows."""
+    import reporting
+    if reporting.np is None:
+        print("--- Reporting: skipped, NumPy is not installed ---")
+        return
+    np = reporting.np
+
+    tickets = {
+        "Single-Day Pass": Ticket("Single-Day Pass", 275.0, "1 day", "", "", 10),
+        "Two-Day Pass": Ticket("Two-Day Pass", 480.0, "2 days", "", "", 0),
+        "Annual Membership": Ticket("Annual Membership", 1840.0, "1 year", "", "", 15),
+    }
+    types = list(tickets)
+    methods = ["M-PESA", "Credit Card", "PayPal"]
+    orders, payments = {}, {}
+    for i in range(count):
+        ticket = tickets[types[i % 3]]
+        order = Order(f"ORD{i:08d}", f"cust{i % 1000:04d}", lines=[OrderLine.for_ticket(ticket, 1 + i % 5)])
+        order._order_date = datetime.fromtimestamp(1.7e9 + i * 60)
+        orders[order.get_order_id()] = order
+        payment = Payment(f"PAY{i:08d}", order.get_order_id(), order.get_user_id(),
+                          order.get_lines()[0].get_total_price(), methods[i % 3])
+        payment._payment_date = order.get_order_date()
+        payments[payment.get_payment_id()] = payment
+
+    started = time.perf_counter()
+    naive = _naive_report(orders, payments, tickets)
+    naive_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    columns = reporting.ReportColumns.from_records(orders, payments)
+    export_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    summary = reporting.ReportingEngine(columns, tickets).summary()
+    vectorized_elapsed = time.perf_counter() - started
+    for name in ("revenue_by_method", "revenue_by_ticket_type", "revenue_by_day", "discount_cost"):
+        assert all(abs(naive[name][key] - summary[name].get(key, 0.0)) < 1e-6 * max(1.0, abs(naive[name][key]))
+                   for key in naive[name]), name
+    assert abs(naive["average_basket_size"] - summary["average_basket_size"]) < 1e-9
+
+    print(f"--- Reporting ({count} orders and payments) ---")
+    print(f"per-object loop     {naive_elapsed:8.3f} s")
+    print(f"columnar export     {export_elapsed:8.3f} s (once per snapshot)")
+    print(f"vectorized reports  {vectorized_elapsed:8.3f} s")
+
+    # Larger volumes are generated straight into arrays; building that many
+    # objects would measure the object model rather than the reports
+    rng = np.random.default_rng(0)
+    type_codes = rng.integers(0, 3, scale)
+    quantities = rng.integers(1, 6, scale).astype(np.float64)
+    unit_prices = np.array([tickets[t].calculate_discounted_price() for t in types])[type_codes]
+    dates = 1.7e9 + rng.uniform(0, 365 * 86400, scale)
+    rows = np.arange(scale)
+    columns = reporting.ReportColumns(
+        order_ids=rows, order_dates=dates, order_status_codes=rng.integers(0, 3, scale),
+        order_status_names=Order.VALID_STATUSES, line_order_index=rows, line_type_codes=type_codes,
+        line_quantities=quantities, line_unit_prices=unit_prices, ticket_type_names=types,
+        payment_order_index=rows, payment_amounts=quantities * unit_prices, payment_dates=dates,
+        payment_method_codes=rng.integers(0, 3, scale), payment_method_names=methods,
+        payment_status_codes=rng.integers(0, 3, scale), payment_status_names=Payment.PAYMENT_STATUSES,
+        payment_user_type_codes=rng.integers(0, 2, scale), user_type_names=["Customer", "Admin"],
+    )
+    started = time.perf_counter()
+    reporting.ReportingEngine(columns, tickets).summary()
+    print(f"vectorized reports  {time.perf_counter() - started:8.3f} s for {scale} orders and payments")
+
+
+def bench_logins(users: int = 50, attempts: int = 2000, invalid_percent: int = 20, iterations: int = 100_000):
+    """Logins/sec for a mix of valid and invalid attempts, with and without the verified-credential cache."""
+    previous_dir = os.getcwd()
+    results = {}
+    for name, cache_size in (("no cache", 0), ("cached", 1024)):
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(directory)
+            try:
+                accounts = AccountManagement(credentials=CredentialStore(iterations, cache_size=cache_size))
+                for i in range(users):
+                    accounts.create_user(f"cust{i:03d}", "Customer", f"cust{i}@example.com", "Customer", f"secret{i}")
+                # Deterministic mix: every invalid_percent-th slot in each hundred is a wrong password
+                outcomes = {True: 0, False: 0}
+                started = time.perf_counter()
+                for attempt in range(attempts):
+                    i = attempt % users
+                    password = "wrong-password" if attempt % 100 < invalid_percent else f"secret{i}"
+                    outcomes[accounts.login(f"cust{i:03d}", password)] += 1
+                elapsed = time.perf_counter() - started
+            finally:
+                os.chdir(previous_dir)
+        results[name] = (attempts / elapsed, outcomes[True], outcomes[False])
+
+    print(f"--- Logins ({users} users, {attempts} attempts, {invalid_percent}% invalid, {iterations} iterations) ---")
+    for name, (rate, accepted, rejected) in results.items():
+        print(f"{name:<9} {rate:10.0f} logins/s  accepted: {accepted}, rejected or throttled: {rejected}")
+    return results
+
+
+def bench_service(clients: int = 50, bookings: int = 20, workers: int = 8):
+    """Load the asyncio booking service with concurrent HTTP clients; see booking_service.py."""
+    import booking_service
+    return booking_service.load_test(clients, bookings, workers)
+
+
+def bench_inventory(workers: int = 8, attempts: int = 5000, capacity: int = 10000):
+    """Threads race to reserve, confirm and cancel the same (ticket type, date); check nothing is oversold."""
+    inventory = InventoryManager({"VIP Experience Pass": capacity})
+    visit_date = date.today()
+    outcomes = {"confirmed": 0, "cancelled": 0, "sold out": 0}
+    outcomes_lock = threading.Lock()
+
+    def client(worker: int):
+        counts = dict.fromkeys(outcomes, 0)
+        for i in range(attempts):
+            order = Order(f"ORD{worker:02d}{i:07d}", f"client{worker}",
+                          lines=[OrderLine("VIP Experience Pass", 1 + i % 3, 522.5)], visit_date=visit_date)
+            try:
+                inventory.reserve(order)
+            except ValueError:
+                counts["sold out"] += 1
+                continue
+            if i % 4 == 0:
+                inventory.release(order)  # Abandoned booking
+                counts["cancelled"] += 1
+            else:
+                inventory.confirm(order)
+                counts["confirmed"] += 1
+        with outcomes_lock:
+            for name, count in counts.items():
+                outcomes[name] += count
+
+    threads = [threading.Thread(target=client, args=(worker,)) for worker in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    sold = inventory.get_sold("VIP Experience Pass", visit_date)
+    held = inventory.get_held("VIP Experience Pass", visit_date)
+    print(f"--- Inventory contention ({workers} threads, {attempts} bookings each, capacity {capacity}) ---")
+    print(f"confirmed: {outcomes['confirmed']}, cancelled: {outcomes['cancelled']}, sold out: {outcomes['sold out']}")
+    print(f"tickets sold: {sold}/{capacity}, still held: {held}, oversold: {max(0, sold + held - capacity)}")
+    print(f"throughput: {workers * attempts / elapsed:.0f} bookings/s")
+    return outcomes
+
+
+def bench_pricing(quotes: int = 200_000, rules: int = 1):
+    """Quotes per second: recomputing the discount on every call against the compiled price tables."""
+    ticket = Ticket("Group Ticket (10+)", 220.0, "1 day", "Special rate for groups of 10 or more", "", 20.0)
+    engine = PricingEngine()
+    if rules:
+        engine.add_group_tier(20, 5.0)
+        engine.add_group_tier(50, 10.0, "Group Ticket (10+)")
+        engine.add_peak_weekday(5, 15.0)
+        engine.add_promo_code("SUMMER", 10.0)
+    visit_date = date.today()
+
+    started = time.perf_counter()
+    for i in range(quotes):
+        ticket.calculate_discounted_price() * (10 + i % 40)
+    recompute_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(quotes):
+        engine.quote(ticket, 10 + i % 40, visit_date, "SUMMER" if rules else None)
+    engine_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(quotes // 100):
+        ticket.set_price(220.0)  # Every setter call invalidates the ticket's table
+        engine.quote(ticket, 10 + i % 40, visit_date)
+    rebuild_elapsed = time.perf_counter() - started
+
+    print(f"--- Pricing ({quotes} quotes, rules {'on' if rules else 'off'}) ---")
+    print(f"static discount      {quotes / recompute_elapsed:12.0f} quotes/s")
+    print(f"price tables         {quotes / engine_elapsed:12.0f} quotes/s")
+    print(f"after a ticket edit  {quotes // 100 / rebuild_elapsed:12.0f} quotes/s")
+
+
+def _timed(action):
+    started = time.perf_counter()
+    result = action()
+    return time.perf_counter() - started, result
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def bench_serialization(max_count: int = 10_000_000):
+    """Save/load time and file size of orders and payments: pickle against the RecordCodec format, at 10k, 1M and 10M records."""
+    codec = RecordCodec()
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    for count in (10_000, 1_000_000, 10_000_000):
+        if count > max_count:
+            break
+        stores = {
+            "orders": {f"ORD{i:08d}": Order(f"ORD{i:08d}", f"cust{i % 1000:04d}", lines=[line], visit_date=date.today())
+                       for i in range(count)},
+            "payments": {f"PAY{i:08d}": Payment(f"PAY{i:08d}", f"ORD{i:08d}", f"cust{i % 1000:04d}", 550.0, "M-PESA")
+                         for i in range(count)},
+        }
+        print(f"--- Serialization ({count} records) ---")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, records in stores.items():
+                for format_name, dump, load in (
+                    ("pickle", lambda r: pickle.dumps(r, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+                    ("record", codec.dumps, codec.loads),
+                ):
+                    path = os.path.join(directory, f"{name}.{format_name}")
+                    save_elapsed, _ = _timed(lambda: _write_file(path, dump(records)))
+                    load_elapsed, loaded = _timed(lambda: load(_read_file(path)))
+                    assert len(loaded) == count
+                    del loaded
+                    print(f"{name:<9} {format_name:<7} save {save_elapsed:8.3f} s  load {load_elapsed:8.3f} s  "
+                          f"{os.path.getsize(path) / 1e6:9.1f} MB")
+        del stores
+
+
+def bench_archive(count: int = 1_000_000, lookups: int = 10_000):
+    """Opening closed orders and looking them up: the whole pickled store against a memory-mapped OrderArchive."""
+    line = OrderLine("Single-Day Pass", 2, 275.0)
+    orders = {}
+    for i in range(count):
+        order = Order(f"ORD{i:08d}", f"cust{i % 1000:04d}", lines=[line], visit_date=date.today())
+        order.set_status("Confirmed")
+        orders[order.get_order_id()] = order
+    payments = [Payment(f"PAY{i:08d}", f"ORD{i:08d}", f"cust{i % 1000:04d}", 550.0, "M-PESA") for i in range(count)]
+    wanted = [f"ORD{i * 7919 % count:08d}" for i in range(lookups)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "orders.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(orders, f, protocol=pickle.HIGHEST_PROTOCOL)
+        archive = OrderArchive(os.path.join(directory, "archive"))
+        archive.add(list(orders.values()), payments)
+        archive.close()
+        del orders, payments
+
+        print(f"--- Archive ({count} orders, {lookups} lookups) ---")
+        open_elapsed, loaded = _timed(lambda: pickle.loads(_read_file(path)))
+        lookup_elapsed, _ = _timed(lambda: [loaded[order_id] for order_id in wanted])
+        history_elapsed, _ = _timed(lambda: [order for order in loaded.values() if order.get_user_id() == "cust0042"])
+        print(f"pickle   open {open_elapsed:8.3f} s  lookups {lookup_elapsed:8.3f} s  history {history_elapsed:8.3f} s")
+        del loaded
+
+        archive = OrderArchive(os.path.join(directory, "archive"))
+        open_elapsed, _ = _timed(lambda: len(archive))
+        lookup_elapsed, _ = _timed(lambda: [archive.get_order(order_id) for order_id in wanted])
+        history_elapsed, _ = _timed(lambda: archive.user_orders("cust0042"))
+        print(f"archive  open {open_elapsed:8.3f} s  lookups {lookup_elapsed:8.3f} s  history {history_elapsed:8.3f} s")
+        archive.close()
+
+
+BENCHMARKS = {
+    "memory": bench_memory,
+    "concurrency": bench_concurrent_booking,
+    "bulk": bench_bulk_booking,
+    "coalescing": bench_write_coalescing,
+    "revenue": bench_revenue_polling,
+    "reporting": bench_reporting,
+    "logins": bench_logins,
+    "service": bench_service,
+    "inventory": bench_inventory,
+    "pricing": bench_pricing,
+    "serialization": bench_serialization,
+    "archive": bench_archive,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:2] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name](*[int(arg) for arg in sys.argv[2:]])
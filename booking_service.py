@@ -0,0 +1,424 @@
+# Asyncio HTTP/JSON front-end for TicketBookingSystem.
+#
+#   python booking_service.py serve [--host 127.0.0.1] [--port 8080]
+#   python booking_service.py load [--clients 50] [--requests 20] [--host H --port P]
+#
+# Requests are JSON over HTTP/1.1 with keep-alive. Operations on behalf of a
+# user send the token from POST /sessions as "Authorization: Bearer <token>".
+#
+#   POST   /sessions               {"user_id", "password"}          log in
+#   DELETE /sessions                                                log out
+#   GET    /tickets
+#   POST   /users                  {"user_id", "name", "email", "user_type", "password"}
+#   PATCH  /account                {"name", "email", "password"}    any subset
+#   DELETE /users/<user_id>                                         admins only
+#   GET    /orders[?status=...]                                     the caller's orders
+#   POST   /orders                 {"ticket_type", "quantity", "visit_date": "YYYY-MM-DD", "promo_code"}
+#   POST   /orders/<order_id>/pay  {"payment_method"}
+#   POST   /orders/<order_id>/cancel
+#
+# Every TicketBookingSystem call runs in a thread pool, so the event loop never
+# waits on pickling, disk I/O or password hashing.
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from aparksystem import (
+    AuthenticationError, ConcurrentModificationError, DataManager, NotFoundError, Order, Payment, TicketBookingSystem, User,
+)
+
+MAX_BODY = 64 * 1024
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# body[name] as a string, or default if it is missing or null; 400 if it is anything else
+def _text(body: dict, name: str, default: str = "") -> str:
+    value = body.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise HTTPError(400, f"{name} must be a string.")
+    return value
+
+
+def _order_json(order: Order) -> dict:
+    return {
+        "order_id": order.get_order_id(),
+        "user_id": order.get_user_id(),
+        "status": order.get_status(),
+        "order_date": order.get_order_date().isoformat(),
+        "visit_date": order.get_visit_date().isoformat() if order.get_visit_date() else None,
+        "lines": [line._asdict() for line in order.get_lines()],
+        "total": order.get_total_price(),
+        "version": order.get_version(),
+    }
+
+
+def _payment_json(payment: Payment) -> dict:
+    return {
+        "payment_id": payment.get_payment_id(),
+        "order_id": payment.get_order_id(),
+        "amount": payment.get_amount(),
+        "payment_method": payment.get_payment_method(),
+        "status": payment.get_status(),
+    }
+
+
+def _user_json(user: User) -> dict:
+    return {"user_id": user.get_user_id(), "name": user.get_name(), "email": user.get_email(),
+            "user_type": user.get_user_type()}
+
+
+class BookingService:
+    """
+    Serves TicketBookingSystem's session-based operations over HTTP.
+
+    Each connection is handled by a coroutine; the system calls themselves are
+    blocking, so they are handed to a thread pool and awaited.
+    """
+
+    def __init__(self, system: TicketBookingSystem = None, workers: int = 8):
+        self.system = system or TicketBookingSystem()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="booking")
+        self._routes: List[Tuple[str, re.Pattern, str]] = [
+            ("POST", re.compile(r"/sessions"), "login"),
+            ("DELETE", re.compile(r"/sessions"), "logout"),
+            ("GET", re.compile(r"/tickets"), "tickets"),
+            ("POST", re.compile(r"/users"), "create_user"),
+            ("PATCH", re.compile(r"/account"), "update_account"),
+            ("DELETE", re.compile(r"/users/(?P<user_id>[^/]+)"), "delete_user"),
+            ("GET", re.compile(r"/orders"), "orders"),
+            ("POST", re.compile(r"/orders"), "book"),
+            ("POST", re.compile(r"/orders/(?P<order_id>[^/]+)/pay"), "pay"),
+            ("POST", re.compile(r"/orders/(?P<order_id>[^/]+)/cancel"), "cancel"),
+        ]
+
+    async def _call(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: function(*args, **kwargs))
+
+    # Handlers: (body, query, token, path parameters) -> (status, response)
+    async def login(self, body, query, token, params):
+        return 201, {"token": await self._call(self.system.open_session, _text(body, "user_id"), _text(body, "password"))}
+
+    async def logout(self, body, query, token, params):
+        await self._call(self.system.close_session, token)
+        return 200, {}
+
+    async def tickets(self, body, query, token, params):
+        return 200, [
+            {"ticket_type": name, "price": ticket.get_price(), "discount": ticket.get_discount(),
+             "description": ticket.get_description(), "min_quantity": self.system.pricing.get_minimum(name)}
+            for name, ticket in self.system.tickets.items()
+        ]
+
+    async def create_user(self, body, query, token, params):
+        fields = [_text(body, name) for name in ("user_id", "name", "email", "user_type", "password")]
+        return 201, _user_json(await self._call(self.system.create_account, *fields))
+
+    async def update_account(self, body, query, token, params):
+        updates = {key: _text(body, key) for key in ("name", "email", "password") if _text(body, key)}
+        return 200, _user_json(await self._call(self.system.update_account, token, **updates))
+
+    async def delete_user(self, body, query, token, params):
+        await self._call(self.system.delete_account, token, params["user_id"])
+        return 200, {}
+
+    async def orders(self, body, query, token, params):
+        status = query.get("status", [None])[0]
+        return 200, [_order_json(order) for order in await self._call(self.system.user_orders, token, status)]
+
+    async def book(self, body, query, token, params):
+        quantity = body.get("quantity", 0)
+        if isinstance(quantity, str) and quantity.strip().lstrip("-").isdigit():
+            quantity = int(quantity)
+        if isinstance(quantity, bool) or not isinstance(quantity, int):
+            raise HTTPError(400, "Quantity must be a whole number.")
+        try:
+            visit_date = date.fromisoformat(_text(body, "visit_date")) if body.get("visit_date") else None
+        except ValueError:
+            raise HTTPError(400, "visit_date must be YYYY-MM-DD.")
+        order = await self._call(self.system.book, token, _text(body, "ticket_type"), quantity, visit_date,
+                                 _text(body, "promo_code") or None)
+        return 201, _order_json(order)
+
+    async def pay(self, body, query, token, params):
+        method = _text(body, "payment_method") or "Credit Card"
+        return 201, _payment_json(await self._call(self.system.pay, token, params["order_id"], method))
+
+    async def cancel(self, body, query, token, params):
+        return 200, _order_json(await self._call(self.system.cancel, token, params["order_id"]))
+
+    async def dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, object]:
+        url = urlsplit(target)
+        allowed = False
+        for route_method, pattern, name in self._routes:
+            match = pattern.fullmatch(url.path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "Body must be JSON.")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Body must be a JSON object.")
+            authorization = headers.get("authorization", "")
+            token = authorization[7:] if authorization.startswith("Bearer ") else None
+            handler = getattr(self, name)
+            try:
+                return await handler(payload, parse_qs(url.query), token, match.groupdict())
+            except ConcurrentModificationError as e:
+                raise HTTPError(409, str(e))
+            except AuthenticationError as e:
+                raise HTTPError(401, str(e))
+            except NotFoundError as e:
+                raise HTTPError(404, str(e))
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+        if allowed:
+            raise HTTPError(405, f"{method} is not supported on {url.path}.")
+        raise HTTPError(404, f"No such resource: {url.path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                try:
+                    if length > MAX_BODY:
+                        raise HTTPError(413, "Request body too large.")
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = await self.dispatch(method.upper(), target, headers, body)
+                except HTTPError as e:
+                    status, response = e.status, {"error": str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception:
+                    traceback.print_exc()  # A bug, not a bad request; keep serving the connection
+                    status, response = 500, {"error": "Internal server error."}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, response, keep_alive))
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.system.data_manager.close()
+
+
+def _response(status: int, payload, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+class _Client:
+    # Minimal keep-alive HTTP/JSON client for the load generator
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.token: str = None
+
+    async def request(self, method: str, path: str, payload: dict = None) -> Tuple[int, object]:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: booking\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+
+async def _run_client(host: str, port: int, user_id: str, password: str, bookings: int,
+                      latencies: List[float], failures: List[int]):
+    reader, writer = await asyncio.open_connection(host, port)
+    client = _Client(reader, writer)
+
+    async def timed(method, path, payload=None):
+        started = time.perf_counter()
+        status, response = await client.request(method, path, payload)
+        latencies.append(time.perf_counter() - started)
+        if status >= 400:
+            failures.append(status)
+        return status, response
+
+    try:
+        status, response = await timed("POST", "/sessions", {"user_id": user_id, "password": password})
+        if status != 201:
+            return
+        client.token = response["token"]
+        for _ in range(bookings):
+            status, order = await timed("POST", "/orders", {"ticket_type": "Single-Day Pass", "quantity": 2})
+            if status == 201:
+                await timed("POST", f"/orders/{order['order_id']}/pay", {"payment_method": "M-PESA"})
+            await timed("GET", "/orders?status=Pending")
+        await timed("DELETE", "/sessions")
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(host: str, port: int, clients: int, bookings: int, users: List[Tuple[str, str]]) -> dict:
+    latencies: List[float] = []
+    failures: List[int] = []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _run_client(host, port, *users[i % len(users)], bookings, latencies, failures) for i in range(clients)
+    ])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "failures": len(failures),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def print_load_report(clients: int, bookings: int, report: dict):
+    print(f"--- Booking service load ({clients} clients, {bookings} bookings each) ---")
+    print(f"requests: {report['requests']} in {report['seconds']:.2f} s, failures: {report['failures']}")
+    print(f"throughput: {report['requests_per_second']:.0f} requests/s")
+    print(f"latency p50: {report['p50_ms']:.2f} ms, p99: {report['p99_ms']:.2f} ms")
+
+
+# Start a service on fresh data in a temporary directory and load it
+async def _self_contained_load(clients: int, bookings: int, workers: int, journal: bool,
+                               durability: str = "immediate") -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = TicketBookingSystem(journal, durability=durability)
+        system.account_management.credentials.iterations = 1000  # Measure the service, not the hashing
+        users = []
+        for i in range(min(clients, 100)):
+            system.create_account(f"load{i:03d}", f"Load {i}", f"load{i}@example.com", "Customer", "loadtest")
+            users.append((f"load{i:03d}", "loadtest"))
+    service = BookingService(system, workers)
+    server = await service.serve("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await run_load("127.0.0.1", port, clients, bookings, users)
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+def load_test(clients: int = 50, bookings: int = 20, workers: int = 8, journal: bool = True,
+              durability: str = "immediate") -> dict:
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            report = asyncio.run(_self_contained_load(clients, bookings, workers, journal, durability))
+        finally:
+            os.chdir(previous_dir)
+    print_load_report(clients, bookings, report)
+    return report
+
+
+async def _serve_forever(host: str, port: int, workers: int, journal: bool, durability: str = "immediate"):
+    service = BookingService(TicketBookingSystem(journal, durability=durability), workers)
+    server = await service.serve(host, port)
+    print(f"Booking service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio HTTP/JSON booking service")
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="Threads for persistence and hashing")
+    parser.add_argument("--snapshot", dest="journal", action="store_false",
+                        help="Rewrite whole pickle files on each change instead of appending to journals")
+    parser.add_argument("--durability", choices=DataManager.DURABILITY_LEVELS, default="immediate",
+                        help="Write each change at once, or batch changes and flush them about once a second")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Bookings per load client")
+    parser.add_argument("--user", action="append", default=[], help="user_id:password for load against --host")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(_serve_forever(args.host or "127.0.0.1", args.port, args.workers, args.journal,
+                                       args.durability))
+        except KeyboardInterrupt:
+            pass
+    elif args.host is None:
+        load_test(args.clients, args.requests, args.workers, args.journal, args.durability)
+    else:
+        if not args.user:
+            parser.error("--user user_id:password is needed to load an existing service")
+        users = [tuple(user.split(":", 1)) for user in args.user]
+        report = asyncio.run(run_load(args.host, args.port, args.clients, args.requests, users))
+        print_load_report(args.clients, args.requests, report)
+
+
+if __name__ == "__main__":
+    main()
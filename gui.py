@@ -2,65 +2,260 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 import datetime
-import random
-import pickle  # Ensure this import is at the top
-
-class Ticket:
-    def __init__(self, ticket_type: str, price: float, validity: str, description: str, restrictions: str, discount: float = 0.0):
-        self._ticket_type = ticket_type
-        self._price = price
-        self._validity = validity
-        self._description = description
-        self._restrictions = restrictions
-        self._discount = discount  # Default discount is 0.0
-
-    # Getters
-    def get_ticket_type(self) -> str:
-        return self._ticket_type
-
-    def get_price(self) -> float:
-        return self._price
-
-    def get_validity(self) -> str:
-        return self._validity
-
-    def get_description(self) -> str:
-        return self._description
-
-    def get_restrictions(self) -> str:
-        return self._restrictions
-
-    def get_discount(self) -> float:
-        return self._discount
-
-    # Setters
-    def set_ticket_type(self, ticket_type: str):
-        self._ticket_type = ticket_type
+import queue
+import threading
+from aparksystem import DataManager, IdAllocator, InventoryManager, Order, PricingEngine, TicketBookingSystem, TicketCatalog
+
+class VirtualTable:
+    """
+    Treeview that only holds items for the rows on screen.
+
+    Rows live in a dict keyed by row ID. The Treeview keeps a fixed set of
+    `height` items that are refilled from the visible window as it scrolls,
+    so rendering costs the same however many rows there are. Rows are added,
+    changed and removed one at a time or by diffing a whole new set, redraws
+    are coalesced into one per idle cycle, and set_filter() narrows the rows
+    incrementally as a search is typed.
+    """
+
+    def __init__(self, parent, columns, widths, height=10):
+        self.height = height
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=height, selectmode='browse')
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=widths[col])
+
+        # The vertical scrollbar moves the window over the rows, not the Treeview
+        self.y_scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.scroll)
+        self.x_scrollbar = ttk.Scrollbar(parent, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.x_scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+        self.y_scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.x_scrollbar.pack(side=tk.BOTTOM, fill="x")
+
+        self._rows = {}  # Row ID -> values
+        self._search_text = {}  # Row ID -> lower-cased values, for set_filter
+        self._view = []  # Row IDs that pass the filter, in insertion order
+        self._in_view = set()
+        self._query = ""
+        self._offset = 0  # Index in _view of the top visible row
+        self._selected = None
+        self._render_pending = False
+
+        # One item per visible line, detached while there is no row for it
+        self._slots = [self.tree.insert('', 'end', values=()) for _ in range(height)]
+        self.tree.detach(*self._slots)
+        self._shown = [None] * height  # Row ID in each slot, None if detached
+        self._shown_values = [None] * height
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', self._on_wheel)
+        self.tree.bind('<Button-5>', self._on_wheel)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, key, values):
+        """Add a row or replace its values."""
+        self._put(key, values)
+        self._schedule()
+
+    def remove(self, key):
+        """Remove a row if it is present."""
+        if self._drop(key) and key in self._in_view:
+            self._view.remove(key)
+            self._in_view.discard(key)
+        self._schedule()
+
+    def set_rows(self, rows):
+        """Make the table hold exactly rows (row ID -> values), touching only rows that differ."""
+        removed = [key for key in self._rows if key not in rows]
+        for key in removed:
+            self._drop(key)
+        if removed:
+            self._view = [key for key in self._view if key in self._rows]
+            self._in_view = set(self._view)
+        for key, values in rows.items():
+            if self._rows.get(key) != tuple(values):
+                self._put(key, values)
+        self._schedule()
+
+    def set_filter(self, query):
+        """Show only rows containing query in any column, narrowing the last matches when possible."""
+        query = query.strip().lower()
+        source = self._view if query.startswith(self._query) else self._rows
+        self._query = query
+        self._view = [key for key in source if query in self._search_text[key]]
+        self._in_view = set(self._view)
+        self._offset = 0
+        self._schedule()
+
+    def selected_key(self):
+        """Row ID of the selected row, or None."""
+        return self._selected if self._selected in self._rows else None
+
+    def see(self, key):
+        """Scroll so that the row is visible."""
+        if key in self._in_view:
+            index = self._view.index(key)
+            if not self._offset <= index < self._offset + self.height:
+                self._offset = index - self.height + 1 if index >= self._offset else index
+            self._schedule()
+
+    def scroll(self, action, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll count units|pages'."""
+        if action == 'moveto':
+            self._offset = int(float(args[0]) * len(self._view))
+        elif action == 'scroll':
+            step = self.height if args[1] == 'pages' else 1
+            self._offset += int(args[0]) * step
+        self.render()
+
+    def render(self):
+        """Fill the visible items from the current window over the rows."""
+        self._render_pending = False
+        total = len(self._view)
+        self._offset = max(0, min(self._offset, total - self.height))
+        window = self._view[self._offset:self._offset + self.height]
+        for i, slot in enumerate(self._slots):
+            if i >= len(window):
+                if self._shown[i] is not None:
+                    self.tree.detach(slot)
+                    self._shown[i] = self._shown_values[i] = None
+                continue
+            key = window[i]
+            values = self._rows[key]
+            if self._shown[i] is None:
+                self.tree.move(slot, '', i)
+            if self._shown_values[i] is not values:
+                self.tree.item(slot, values=values)
+            self._shown[i] = key
+            self._shown_values[i] = values
+
+        # Keep the highlight on the selected row, not on the item it used to fill
+        selection = self.tree.selection()
+        if self._selected in window:
+            slot = self._slots[window.index(self._selected)]
+            if selection != (slot,):
+                self.tree.selection_set(slot)
+        elif selection:
+            self.tree.selection_remove(*selection)
+
+        if total:
+            self.y_scrollbar.set(self._offset / total, (self._offset + len(window)) / total)
+        else:
+            self.y_scrollbar.set(0.0, 1.0)
+
+    def _put(self, key, values):
+        values = tuple(values)
+        is_new = key not in self._rows
+        self._rows[key] = values
+        text = " ".join(str(value) for value in values).lower()
+        self._search_text[key] = text
+        matches = self._query in text
+        if is_new:
+            if matches:
+                self._view.append(key)
+                self._in_view.add(key)
+        elif matches != (key in self._in_view):
+            # A changed row entered or left the filter; rebuild to keep row order
+            self._view = [k for k in self._rows if self._query in self._search_text[k]]
+            self._in_view = set(self._view)
+
+    def _drop(self, key):
+        self._search_text.pop(key, None)
+        return self._rows.pop(key, None) is not None
+
+    def _schedule(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.tree.after_idle(self.render)
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self._selected = self._shown[self._slots.index(selection[0])]
+        elif self._selected in self._shown:
+            self._selected = None  # Deselected by the user rather than scrolled out of view
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.scroll('scroll', -3, 'units')
+        else:
+            self.scroll('scroll', 3, 'units')
+        return 'break'
 
-    def set_price(self, price: float):
-        if price < 0:
-            raise ValueError("Price cannot be negative.")
-        self._price = price
 
-    def set_validity(self, validity: str):
-        self._validity = validity
+class IOWorker:
+    """
+    Runs the GUI's disk loads and saves on one background thread.
 
-    def set_description(self, description: str):
-        self._description = description
+    Jobs queued with submit() run in order on the worker. Their results, or
+    the exceptions they raise, are handed back to callbacks on the Tk thread
+    by polling with after(), so no Tk call is ever made from the worker.
+    on_busy is called on the Tk thread with True when work starts and False
+    once every job has finished; quiet jobs such as polls do not count.
+    """
 
-    def set_restrictions(self, restrictions: str):
-        self._restrictions = restrictions
+    POLL_MS = 50
 
-    def set_discount(self, discount: float):
-        if discount < 0 or discount > 100:
-            raise ValueError("Discount must be between 0 and 100.")
-        self._discount = discount
+    def __init__(self, master, on_busy=None):
+        self.master = master
+        self.on_busy = on_busy
+        self._jobs = queue.Queue()  # Jobs in submission order; None stops the worker
+        self._done = queue.Queue()  # (callback, argument, quiet) waiting for the Tk thread
+        self._outstanding = 0  # Jobs submitted but not yet reported back; Tk thread only
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="gui-io", daemon=True)
+        self._thread.start()
+        self.master.after(self.POLL_MS, self._poll)
+
+    def submit(self, func, on_done=None, on_error=None, quiet=False):
+        """Run func() on the worker, then on_done(result) or on_error(exception) on the Tk thread."""
+        self._jobs.put((func, on_done, on_error, quiet))
+        if quiet:
+            return
+        self._outstanding += 1
+        if self._outstanding == 1 and self.on_busy:
+            self.on_busy(True)
+
+    def close(self):
+        """Let every queued job finish and stop the worker; results are not reported back."""
+        self._closing = True
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            func, on_done, on_error, quiet = job
+            try:
+                self._done.put((on_done, func(), quiet))
+            except Exception as e:
+                self._done.put((on_error, e, quiet))
+
+    def _poll(self):
+        while True:
+            try:
+                callback, argument, quiet = self._done.get_nowait()
+            except queue.Empty:
+                break
+            if not quiet:
+                self._outstanding -= 1
+            if callback is not None:
+                callback(argument)
+            if not quiet and self._outstanding == 0 and self.on_busy:
+                self.on_busy(False)
+        if not self._closing:
+            self.master.after(self.POLL_MS, self._poll)
 
-    # Calculate discounted price
-    def calculate_discounted_price(self) -> float:
-        return self._price * (1 - self._discount / 100)
 
 class TicketBookingGUI:
+    CATALOG_POLL_MS = 5000  # How often to look for ticket changes made elsewhere
+
     def __init__(self, master):
         self.master = master
         master.title("Ticket Booking System")
@@ -68,28 +263,77 @@ class TicketBookingGUI:
         # Center the main window
         self.center_window(master, 1000, 600)  # Adjust width and height as needed
         
-        self.ticket_types = {
-            "Single-Day Pass": Ticket("Single-Day Pass", 275.0, "1 day", 
-                "Access to the park for one day", "Valid only on selected date"),
-            "Two-Day Pass": Ticket("Two-Day Pass", 480.0, "2 days", 
-                "Access to the park for two consecutive days", "Cannot be split over multiple trips", 10.0),
-            "Annual Membership": Ticket("Annual Membership", 1840.0, "1 year", 
-                "Unlimited access for one year", "Must be used by the same person", 15.0),
-            "Child Ticket": Ticket("Child Ticket", 185.0, "1 day", 
-                "Discounted ticket for children (ages 3-12)", "Valid only on selected date, accompanied by an adult"),
-            "Group Ticket (10+)": Ticket("Group Ticket (10+)", 220.0, "1 day", 
-                "Special rate for groups of 10 or more", "Must be booked in advance", 20.0),
-            "VIP Experience Pass": Ticket("VIP Experience Pass", 550.0, "1 day", 
-                "Includes expedited access and reserved seating", "Limited availability, must be purchased in advance")
-        }
+        # Ticket types come from the catalog shared with the CLI; read on the I/O worker
+        self.catalog = TicketCatalog()
+        self.catalog_version = None  # Catalog version the tickets table shows
+        self.tickets = {}  # Snapshot of the catalog taken on the I/O worker; Tk thread only
+        self.pricing = PricingEngine()  # Same pricing rules as the CLI
+        # Shares the counter file with the CLI, so order IDs never collide
+        self.order_ids = IdAllocator("ORD", TicketBookingSystem.ORDER_ID_FILE, seed_from=self.existing_order_ids)
+        self.inventory = InventoryManager()  # Capacity per ticket type and visit date
+        self.inventory_orders = {}  # Order ID -> Order holding stock, to release it on cancel
+        self.orders = {}  # Order ID -> row shown in My Orders
+        self.stored_order_ids = None  # Read along with the inventory, in case the ID counter file is missing
         self.create_widgets()
 
+        # All disk reads and writes run on the I/O worker
+        self.io = IOWorker(master, on_busy=self.show_busy)
+        self.load_inventory()
+        self.load_tickets()
+        self.master.after(self.CATALOG_POLL_MS, self.poll_catalog)
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Bind tab change event to refresh orders
         self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_change)
 
-        self.orders = []  # List to store booked orders
+    def load_inventory(self):
+        """Count stock already taken by orders on disk, reading them on the I/O worker."""
+        def read_orders():
+            data_manager = DataManager()
+            data_manager.load_orders()
+            return dict(data_manager._orders)
+
+        def track_orders(orders):
+            for order in orders.values():
+                self.inventory.track(order)
+            self.stored_order_ids = list(orders)
+            self.inventory_loaded = True
+
+        self.inventory_loaded = False
+        self.io.submit(read_orders, track_orders,
+                       lambda e: self.show_message("Error", f"Failed to load orders: {str(e)}", "error"))
+
+    def existing_order_ids(self):
+        """Order IDs already on disk; only read if the ID counter file is missing."""
+        if self.stored_order_ids is not None:
+            return iter(self.stored_order_ids)
+        data_manager = DataManager()
+        data_manager.load_orders()
+        return iter(data_manager._orders)
+
+    def show_busy(self, busy):
+        """Show or hide the busy indicator while the I/O worker has jobs."""
+        if busy:
+            self.status_label.configure(text="Working...")
+            self.busy_bar.start(10)
+        else:
+            self.status_label.configure(text="")
+            self.busy_bar.stop()
+
+    def on_close(self):
+        """Finish pending saves before the window goes away."""
+        self.io.close()
+        self.master.destroy()
 
     def create_widgets(self):
+        # Status bar with the busy indicator
+        status_frame = ttk.Frame(self.master)
+        status_frame.pack(side=tk.BOTTOM, fill="x")
+        self.busy_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=100)
+        self.busy_bar.pack(side=tk.RIGHT, padx=10, pady=2)
+        self.status_label = ttk.Label(status_frame, text="")
+        self.status_label.pack(side=tk.RIGHT)
+
         self.notebook = ttk.Notebook(self.master)
         self.notebook.pack(fill="both", expand=True)
 
@@ -115,16 +359,12 @@ class TicketBookingGUI:
 
 
     def create_ticket_selection_tab(self):
-        # Load tickets from the .pkl file
-        self.load_tickets()
-
         # Create frame for the table
         table_frame = ttk.Frame(self.ticket_selection_tab)
         table_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
-        # Create Treeview
+        # Create the table; only the visible rows become Treeview items
         columns = ('Ticket Type', 'Price', 'Validity', 'Description', 'Restrictions')
-        self.ticket_tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=8)
 
         # Define column headings and widths
         widths = {
@@ -134,34 +374,8 @@ class TicketBookingGUI:
             'Description': 250,
             'Restrictions': 300
         }
-
-        for col in columns:
-            self.ticket_tree.heading(col, text=col)
-            self.ticket_tree.column(col, width=widths[col])
-
-        # Add scrollbars
-        y_scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.ticket_tree.yview)
-        x_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=self.ticket_tree.xview)
-        self.ticket_tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-
-        # Insert ticket data
-        for ticket in self.ticket_types.values():
-            price_display = f"${ticket.calculate_discounted_price():.2f}"
-            if ticket.get_discount() > 0:
-                price_display += f" (-{ticket.get_discount()}%)"
-                
-            self.ticket_tree.insert('', 'end', values=(
-                ticket.get_ticket_type(),
-                price_display,
-                ticket.get_validity(),
-                ticket.get_description(),
-                ticket.get_restrictions()
-            ))
-
-        # Pack the Treeview and scrollbars
-        self.ticket_tree.pack(side=tk.LEFT, fill="both", expand=True)
-        y_scrollbar.pack(side=tk.RIGHT, fill="y")
-        x_scrollbar.pack(side=tk.BOTTOM, fill="x")
+        self.ticket_table = VirtualTable(table_frame, columns, widths, height=8)
+        self.ticket_tree = self.ticket_table.tree  # Rows are filled in by load_tickets
 
         # Create booking controls frame
         booking_frame = ttk.LabelFrame(self.ticket_selection_tab, text="Booking Details")
@@ -200,12 +414,33 @@ class TicketBookingGUI:
         self.book_button.grid(row=0, column=4, padx=20, pady=5)
 
         # Bind selection event
-        self.ticket_tree.bind('<<TreeviewSelect>>', self.on_ticket_select)
+        self.ticket_tree.bind('<<TreeviewSelect>>', self.on_ticket_select, add='+')
+
+    def refresh_tickets(self, snapshot):
+        """Show a catalog snapshot if its version is new, updating only rows that differ"""
+        version, tickets = snapshot
+        if self.catalog_version == version:
+            return
+        self.catalog_version = version
+        self.tickets = tickets
+        rows = {}
+        for ticket in tickets.values():
+            price_display = f"${ticket.calculate_discounted_price():.2f}"
+            if ticket.get_discount() > 0:
+                price_display += f" (-{ticket.get_discount()}%)"
+
+            rows[ticket.get_ticket_type()] = (
+                ticket.get_ticket_type(),
+                price_display,
+                ticket.get_validity(),
+                ticket.get_description(),
+                ticket.get_restrictions()
+            )
+        self.ticket_table.set_rows(rows)
 
     def on_ticket_select(self, event):
         """Handle ticket selection"""
-        selected_items = self.ticket_tree.selection()
-        if not selected_items:
+        if self.ticket_table.selected_key() is None:
             self.book_button.configure(state='disabled')
             return
         
@@ -213,56 +448,67 @@ class TicketBookingGUI:
 
     def book_ticket(self):
         """Handle ticket booking"""
-        selected_items = self.ticket_tree.selection()
-        if not selected_items:
+        ticket_type = self.ticket_table.selected_key()
+        if ticket_type is None:
             self.show_message("Selection Required", "Please select a ticket type first.", "warning")
             return
 
+        if not self.inventory_loaded:
+            self.show_message("Please Wait", "Ticket availability is still loading.", "warning")
+            return
+
         try:
-            selected_item = self.ticket_tree.item(selected_items[0])
-            ticket_type = selected_item['values'][0]
             quantity = int(self.quantity_var.get())
             visit_date = self.date_picker.get_date()
             
-            ticket = self.ticket_types[ticket_type]
-            total_price = ticket.calculate_discounted_price() * quantity
+            ticket = self.tickets.get(ticket_type)
+            line = self.pricing.quote_line(ticket, quantity, visit_date)  # Raises ValueError below a minimum
+            total_price = line.get_total_price()
 
             # Include discount information in the message if applicable
             discount_info = f"\nDiscount Applied: {ticket.get_discount()}%" if ticket.get_discount() > 0 else ""
+            left = self.inventory.available(ticket_type, visit_date)
+            if left is not None and quantity > left:
+                self.show_message("Sold Out", f"Only {left} {ticket_type} tickets left on {visit_date}.", "warning")
+                return
+            availability_info = f" ({left} left)" if left is not None else ""
             
             message = f"Booking Summary:\n\n" \
                      f"Ticket Type: {ticket_type}\n" \
                      f"Quantity: {quantity}\n" \
-                     f"Visit Date: {visit_date}\n" \
+                     f"Visit Date: {visit_date}{availability_info}\n" \
                      f"Original Price: ${ticket.get_price():.2f}{discount_info}\n" \
                      f"Total Price: ${total_price:.2f}\n\n" \
                      f"Proceed with booking?"
 
             if self.show_message("Confirm Booking", message, "question"):
-                # Generate a simple order ID (in a real app, this would come from a database)
-                order_id = f"ORD{random.randint(1000, 9999)}"
-                
-                # Add to orders list
-                self.orders.append((order_id, visit_date.strftime("%Y-%m-%d"), ticket_type, str(quantity), f"${total_price:.2f}", "Confirmed"))
-                
-                # Add to orders tree
-                self.orders_tree.insert('', 'end', values=(
-                    order_id,
-                    visit_date.strftime("%Y-%m-%d"),
-                    ticket_type,
-                    str(quantity),
-                    f"${total_price:.2f}",
-                    "Confirmed"
-                ))
-
-                # Save tickets after booking
-                self.save_tickets()
-                
-                self.show_message("Success", "Booking completed successfully!", "info")
+                # Reserving a new block of IDs writes the counter file, so allocate on the I/O worker
+                self.io.submit(self.order_ids.next_id,
+                               lambda order_id: self.finish_booking(order_id, line, visit_date),
+                               lambda e: self.show_message("Error", f"An error occurred: {str(e)}", "error"))
                 
         except Exception as e:
             self.show_message("Error", f"An error occurred: {str(e)}", "error")
 
+    def finish_booking(self, order_id, line, visit_date):
+        """Take the stock and show the order once its ID has been allocated"""
+        order = Order(order_id, "guest", lines=[line], visit_date=visit_date)
+        try:
+            self.inventory.confirm(order)  # Raises ValueError if someone took the last tickets meanwhile
+        except ValueError as e:
+            self.show_message("Error", f"An error occurred: {str(e)}", "error")
+            return
+        self.inventory_orders[order_id] = order
+        
+        # Add to orders list and table
+        row = (order_id, visit_date.strftime("%Y-%m-%d"), line.ticket_type, str(line.quantity),
+               f"${line.get_total_price():.2f}", "Confirmed")
+        self.orders[order_id] = row
+        self.orders_table.upsert(order_id, row)
+        self.orders_table.see(order_id)
+
+        self.show_message("Success", "Booking completed successfully!", "info")
+
     def create_account_tab(self):
         #Login/Registration widgets
         login_button = ttk.Button(self.account_tab, text="Login", command=self.show_login)
@@ -343,13 +589,20 @@ class TicketBookingGUI:
         return dialog
 
     def create_my_orders_tab(self):
+        # Search box; each keystroke narrows the rows already matched
+        search_frame = ttk.Frame(self.my_orders_tab)
+        search_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=5)
+        self.order_search_var = tk.StringVar()
+        self.order_search_var.trace_add('write', lambda *args: self.orders_table.set_filter(self.order_search_var.get()))
+        ttk.Entry(search_frame, textvariable=self.order_search_var, width=30).pack(side=tk.LEFT, padx=5)
+
         # Create frame for the orders table
         table_frame = ttk.Frame(self.my_orders_tab)
         table_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
-        # Create Treeview for orders
+        # Create the orders table; only the visible rows become Treeview items
         columns = ('Order ID', 'Date', 'Ticket Type', 'Quantity', 'Total Price', 'Status')
-        self.orders_tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=10)
 
         # Define column headings and widths
         widths = {
@@ -361,19 +614,8 @@ class TicketBookingGUI:
             'Status': 100
         }
 
-        for col in columns:
-            self.orders_tree.heading(col, text=col)
-            self.orders_tree.column(col, width=widths[col])
-
-        # Add scrollbars
-        y_scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.orders_tree.yview)
-        x_scrollbar = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=self.orders_tree.xview)
-        self.orders_tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-
-        # Pack the Treeview and scrollbars
-        self.orders_tree.pack(side=tk.LEFT, fill="both", expand=True)
-        y_scrollbar.pack(side=tk.RIGHT, fill="y")
-        x_scrollbar.pack(side=tk.BOTTOM, fill="x")
+        self.orders_table = VirtualTable(table_frame, columns, widths, height=10)
+        self.orders_tree = self.orders_table.tree
 
         # Add buttons frame
         button_frame = ttk.Frame(self.my_orders_tab)
@@ -397,31 +639,26 @@ class TicketBookingGUI:
 
     def refresh_orders(self):
         """Refresh the orders list"""
-        # Clear existing items
-        for item in self.orders_tree.get_children():
-            self.orders_tree.delete(item)
-
-        # Add booked orders to the orders tree
-        for order in self.orders:
-            self.orders_tree.insert('', 'end', values=order)
+        # Only rows that changed since the last refresh are touched
+        self.orders_table.set_rows(self.orders)
 
     def cancel_order(self):
         """Cancel the selected order"""
-        selected_items = self.orders_tree.selection()
-        if not selected_items:
+        order_id = self.orders_table.selected_key()
+        if order_id is None:
             self.show_message("Selection Required", "Please select an order to cancel.", "warning")
             return
 
-        selected_item = self.orders_tree.item(selected_items[0])
-        order_id = selected_item['values'][0]
-        
         # Confirm cancellation
         if self.show_message("Confirm Cancellation", 
                            f"Are you sure you want to cancel order {order_id}?", 
                            "question"):
             # Here you would typically update the database
-            # For now, just remove from the tree
-            self.orders_tree.delete(selected_items[0])
+            # For now, just remove from the table and put the tickets back on sale
+            self.orders.pop(order_id, None)
+            self.orders_table.remove(order_id)
+            if order_id in self.inventory_orders:
+                self.inventory.release(self.inventory_orders.pop(order_id))
             self.show_message("Success", "Order cancelled successfully!", "info")
 
     def on_tab_change(self, event):
@@ -432,29 +669,22 @@ class TicketBookingGUI:
         if tab_name == "My Orders":
             self.refresh_orders()
 
-    def save_tickets(self):
-        """Save tickets to a .pkl file."""
-        try:
-            with open('tickets.pkl', 'wb') as file:
-                # Save only unique tickets
-                unique_tickets = {ticket.get_ticket_type(): ticket for ticket in self.ticket_types.values()}
-                pickle.dump(unique_tickets, file)
-        except Exception as e:
-            self.show_message("Error", f"Failed to save tickets: {str(e)}", "error")
-
     def load_tickets(self):
-        """Load tickets from a .pkl file."""
-        try:
-            with open('tickets.pkl', 'rb') as file:
-                loaded_tickets = pickle.load(file)
-                for ticket_type, ticket in loaded_tickets.items():
-                    if ticket_type not in self.ticket_types:
-                        self.ticket_types[ticket_type] = ticket
-        except FileNotFoundError:
-            # If the file does not exist, we can ignore it
-            pass
-        except Exception as e:
-            self.show_message("Error", f"Failed to load tickets: {str(e)}", "error")
+        """Read the ticket catalog on the I/O worker and show it when it arrives."""
+        self.io.submit(self.catalog.snapshot, self.refresh_tickets,
+                       lambda e: self.show_message("Error", f"Failed to load tickets: {str(e)}", "error"))
+
+    def poll_catalog(self):
+        """Look for ticket changes saved by the CLI or another window; a file stat unless something changed."""
+        def poll():
+            return self.catalog.snapshot() if self.catalog.refresh() else None
+
+        def done(snapshot):
+            if snapshot is not None:
+                self.refresh_tickets(snapshot)
+            self.master.after(self.CATALOG_POLL_MS, self.poll_catalog)
+
+        self.io.submit(poll, done, lambda e: done(None), quiet=True)
 
 # When creating the main window
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+# Columnar booking and payment reports. Run with: python reporting.py
+#
+# Orders, order lines and payments are exported once into NumPy arrays and
+# every report is then a few vectorized passes over them, rather than a Python
+# loop over the record objects. Needs NumPy; the rest of the package does not.
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Sequence
+
+from aparksystem import DataManager, OrderColumns, PaymentColumns, Ticket, User
+
+try:
+    import numpy as np
+except ImportError:  # Reporting is optional
+    np = None
+
+SECONDS_PER_DAY = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class ReportColumns:
+    """
+    Orders, order lines and payments held as NumPy arrays.
+
+    Repeated strings (ticket types, payment methods, statuses, user types) are
+    integer codes into the matching *_names list. Each line refers to its order
+    by row number in the order arrays, and so does each payment, with -1 for
+    payments whose order is unknown. Dates are POSIX timestamps, NaN if unknown.
+    """
+
+    def __init__(self, order_ids, order_dates, order_status_codes, order_status_names,
+                 line_order_index, line_type_codes, line_quantities, line_unit_prices, ticket_type_names,
+                 payment_order_index, payment_amounts, payment_dates, payment_method_codes, payment_method_names,
+                 payment_status_codes, payment_status_names, payment_user_type_codes, user_type_names):
+        if np is None:
+            raise ImportError("Reporting needs NumPy (pip install numpy).")
+        self.order_ids = order_ids
+        self.order_dates = order_dates
+        self.order_status_codes = order_status_codes
+        self.order_status_names: List[str] = list(order_status_names)
+        self.line_order_index = line_order_index
+        self.line_type_codes = line_type_codes
+        self.line_quantities = line_quantities
+        self.line_unit_prices = line_unit_prices
+        self.ticket_type_names: List[str] = list(ticket_type_names)
+        self.payment_order_index = payment_order_index
+        self.payment_amounts = payment_amounts
+        self.payment_dates = payment_dates
+        self.payment_method_codes = payment_method_codes
+        self.payment_method_names: List[str] = list(payment_method_names)
+        self.payment_status_codes = payment_status_codes
+        self.payment_status_names: List[str] = list(payment_status_names)
+        self.payment_user_type_codes = payment_user_type_codes
+        self.user_type_names: List[str] = list(user_type_names)
+
+    # Export from the columnar containers in aparksystem
+    @classmethod
+    def from_columns(cls, order_columns: OrderColumns, payment_columns: PaymentColumns,
+                     users: Dict[str, User] = None) -> "ReportColumns":
+        if np is None:
+            raise ImportError("Reporting needs NumPy (pip install numpy).")
+        orders = order_columns.columns()
+        payments = payment_columns.columns()
+
+        # np.array copies, so the source arrays stay free to grow
+        order_ids = np.array(orders["order_ids"], dtype=str)
+        line_starts = np.array(orders["line_starts"], dtype=np.int64)
+        line_order_index = np.repeat(np.arange(len(order_ids)), np.diff(line_starts))
+
+        payment_user_type_codes, user_type_names = _user_type_codes(payments["user_ids"], users or {})
+        return cls(
+            order_ids=order_ids,
+            order_dates=np.array(orders["order_dates"], dtype=np.float64),
+            order_status_codes=np.array(orders["status_codes"], dtype=np.int64),
+            order_status_names=orders["statuses"],
+            line_order_index=line_order_index,
+            line_type_codes=np.array(orders["line_type_codes"], dtype=np.int64),
+            line_quantities=np.array(orders["line_quantities"], dtype=np.float64),
+            line_unit_prices=np.array(orders["line_unit_prices"], dtype=np.float64),
+            ticket_type_names=orders["ticket_types"],
+            payment_order_index=_order_rows(order_ids, np.array(payments["order_ids"], dtype=str)),
+            payment_amounts=np.array(payments["amounts"], dtype=np.float64),
+            payment_dates=np.array(payments["payment_dates"], dtype=np.float64),
+            payment_method_codes=np.array(payments["method_codes"], dtype=np.int64),
+            payment_method_names=payments["methods"],
+            payment_status_codes=np.array(payments["status_codes"], dtype=np.int64),
+            payment_status_names=payments["statuses"],
+            payment_user_type_codes=payment_user_type_codes,
+            user_type_names=user_type_names,
+        )
+
+    # Export from order and payment dictionaries, as held by DataManager
+    @classmethod
+    def from_records(cls, orders: dict, payments: dict, users: Dict[str, User] = None) -> "ReportColumns":
+        return cls.from_columns(OrderColumns(orders.values()), PaymentColumns(payments.values()), users)
+
+
+# Row of each payment's order in order_ids, or -1 where there is none
+def _order_rows(order_ids, payment_order_ids):
+    rows = np.full(len(payment_order_ids), -1, dtype=np.int64)
+    if len(order_ids) == 0 or len(payment_order_ids) == 0:
+        return rows
+    sorter = np.argsort(order_ids)
+    positions = np.searchsorted(order_ids, payment_order_ids, sorter=sorter)
+    candidates = sorter[np.minimum(positions, len(order_ids) - 1)]
+    found = order_ids[candidates] == payment_order_ids
+    rows[found] = candidates[found]
+    return rows
+
+
+# Code each payment by its user's type, looking up every distinct user once
+def _user_type_codes(user_ids: Sequence[str], users: Dict[str, User]):
+    distinct, inverse = np.unique(np.array(user_ids, dtype=str), return_inverse=True)
+    names: List[str] = []
+    codes: Dict[str, int] = {}
+    distinct_codes = np.empty(len(distinct), dtype=np.int64)
+    for i, user_id in enumerate(distinct):
+        user = users.get(str(user_id))
+        user_type = user.get_user_type() if user else "Unknown"
+        if user_type not in codes:
+            codes[user_type] = len(names)
+            names.append(user_type)
+        distinct_codes[i] = codes[user_type]
+    return distinct_codes[inverse].astype(np.int64), names
+
+
+class ReportingEngine:
+    """
+    Revenue, discount and basket reports over a ReportColumns export.
+
+    Revenue follows RevenueAggregates: Failed payments are left out, and a
+    payment is split across ticket types in proportion to its order's line
+    totals. Discount and basket figures cover orders that were not Cancelled.
+    """
+
+    def __init__(self, columns: ReportColumns, tickets: Dict[str, Ticket] = None):
+        if np is None:
+            raise ImportError("Reporting needs NumPy (pip install numpy).")
+        self.columns = columns
+        self.tickets = tickets or {}
+        c = columns
+        order_count = len(c.order_ids)
+
+        failed = _code(c.payment_status_names, "Failed")
+        self._counted = c.payment_status_codes != failed
+        linked = self._counted & (c.payment_order_index >= 0)
+        self._paid_per_order = np.bincount(c.payment_order_index[linked], weights=c.payment_amounts[linked],
+                                           minlength=order_count)
+        self._unlinked_revenue = float(c.payment_amounts[self._counted & ~linked].sum())
+
+        self._line_totals = c.line_quantities * c.line_unit_prices
+        self._order_totals = np.bincount(c.line_order_index, weights=self._line_totals, minlength=order_count)
+        self._tickets_per_order = np.bincount(c.line_order_index, weights=c.line_quantities, minlength=order_count)
+        cancelled = _code(c.order_status_names, "Cancelled")
+        self._live_orders = c.order_status_codes != cancelled
+        self._live_lines = self._live_orders[c.line_order_index]
+
+    # Total of counted payments
+    def total_revenue(self) -> float:
+        return float(self.columns.payment_amounts[self._counted].sum())
+
+    def revenue_by_method(self) -> Dict[str, float]:
+        c = self.columns
+        return _totals_by_code(c.payment_method_codes[self._counted], c.payment_amounts[self._counted],
+                               c.payment_method_names)
+
+    def revenue_by_user_type(self) -> Dict[str, float]:
+        c = self.columns
+        return _totals_by_code(c.payment_user_type_codes[self._counted], c.payment_amounts[self._counted],
+                               c.user_type_names)
+
+    def revenue_by_ticket_type(self) -> Dict[str, float]:
+        c = self.columns
+        order_totals = self._order_totals[c.line_order_index]
+        paid = self._paid_per_order[c.line_order_index]
+        shares = np.divide(self._line_totals * paid, order_totals,
+                           out=np.zeros(len(paid)), where=order_totals != 0)
+        revenue = _totals_by_code(c.line_type_codes, shares, c.ticket_type_names,
+                                  keep=(paid != 0) & (order_totals != 0))
+        # Payments with no order, or for an order worth nothing, cannot be split
+        unknown = self._unlinked_revenue + float(self._paid_per_order[self._order_totals == 0].sum())
+        if unknown:
+            revenue["Unknown"] = revenue.get("Unknown", 0.0) + unknown
+        return revenue
+
+    # Keyed by local calendar date; payments saved without a date use their order's
+    def revenue_by_day(self) -> Dict[date, float]:
+        c = self.columns
+        order_dates = np.full(len(c.payment_order_index), np.nan)
+        linked = c.payment_order_index >= 0
+        order_dates[linked] = c.order_dates[c.payment_order_index[linked]]
+        dates = np.where(np.isnan(c.payment_dates), order_dates, c.payment_dates)
+        keep = self._counted & ~np.isnan(dates)
+        days = _local_days(dates[keep])
+        if len(days) == 0:
+            return {}
+        first = int(days.min())
+        totals = np.bincount(days - first, weights=c.payment_amounts[keep])
+        counts = np.bincount(days - first)
+        return {date.fromordinal(_EPOCH_ORDINAL + first + int(day)): float(totals[day])
+                for day in np.flatnonzero(counts)}
+
+    # Money given away through Ticket discounts, by ticket type. Lines store the
+    # discounted unit price, so the full price is worked back from the current
+    # discount of that ticket type; a 100% discount costs the list price.
+    def discount_cost(self) -> Dict[str, float]:
+        c = self.columns
+        discounts = np.zeros(len(c.ticket_type_names))
+        prices = np.zeros(len(c.ticket_type_names))
+        for code, ticket_type in enumerate(c.ticket_type_names):
+            ticket = self.tickets.get(ticket_type)
+            if ticket is not None:
+                discounts[code] = ticket.get_discount()
+                prices[code] = ticket.get_price()
+        line_discounts = discounts[c.line_type_codes]
+        partial = np.divide(self._line_totals * line_discounts, 100 - line_discounts,
+                            out=np.zeros_like(self._line_totals), where=line_discounts < 100)
+        cost = np.where(line_discounts >= 100, c.line_quantities * prices[c.line_type_codes], partial)
+        return _totals_by_code(c.line_type_codes, cost, c.ticket_type_names, keep=self._live_lines & (cost != 0))
+
+    # Mean tickets per order
+    def average_basket_size(self) -> float:
+        baskets = self._tickets_per_order[self._live_orders]
+        return float(baskets.mean()) if len(baskets) else 0.0
+
+    # Percentiles of tickets per order and of order value
+    def basket_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Dict[float, float]]:
+        baskets = self._tickets_per_order[self._live_orders]
+        values = self._order_totals[self._live_orders]
+        if len(baskets) == 0:
+            return {"tickets": {}, "value": {}}
+        return {
+            "tickets": dict(zip(percentiles, np.percentile(baskets, percentiles).tolist())),
+            "value": dict(zip(percentiles, np.percentile(values, percentiles).tolist())),
+        }
+
+    def summary(self) -> dict:
+        discount_cost = self.discount_cost()
+        return {
+            "total_revenue": self.total_revenue(),
+            "revenue_by_day": self.revenue_by_day(),
+            "revenue_by_ticket_type": self.revenue_by_ticket_type(),
+            "revenue_by_method": self.revenue_by_method(),
+            "revenue_by_user_type": self.revenue_by_user_type(),
+            "discount_cost": discount_cost,
+            "total_discount_cost": sum(discount_cost.values()),
+            "average_basket_size": self.average_basket_size(),
+            "basket_percentiles": self.basket_percentiles(),
+        }
+
+
+def _code(names: List[str], name: str) -> int:
+    return names.index(name) if name in names else -1
+
+
+# Sum weights per code; only codes with at least one kept row appear
+def _totals_by_code(codes, weights, names: List[str], keep=None) -> Dict[str, float]:
+    if keep is not None:
+        codes, weights = codes[keep], weights[keep]
+    totals = np.bincount(codes, weights=weights, minlength=len(names))
+    counts = np.bincount(codes, minlength=len(names))
+    return {names[code]: float(totals[code]) for code in np.flatnonzero(counts)}
+
+
+# Days since the epoch in local time (at today's UTC offset)
+def _local_days(timestamps):
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    return np.floor((timestamps + offset) / SECONDS_PER_DAY).astype(np.int64)
+
+
+# Report on the data files in the current directory
+def main():
+    data_manager = DataManager()
+    data_manager.load_users()
+    data_manager.load_orders()
+    data_manager.load_payments()
+    data_manager.load_tickets()
+    columns = ReportColumns.from_records(data_manager._orders, data_manager._payments, data_manager._users)
+    for name, value in ReportingEngine(columns, data_manager._tickets).summary().items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    if np is None:
+        sys.exit("Reporting needs NumPy (pip install numpy).")
+    main()